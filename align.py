@@ -0,0 +1,163 @@
+'''
+Vision-assisted auto-align for hatch and cargo placement.
+
+While the driver holds an align button, the robot turns toward the vision
+target and drives up to it, stopping when the ultrasonic reads in placing
+range. Vision samples are old by the time they arrive (capture, processing
+and NetworkTables), so the target angle is applied to the robot heading at
+the moment the frame was captured, taken from a short heading history,
+instead of to the current heading. The capture time is worked out in robot
+time: a NetworkTables listener stamps each sample with the robot clock as
+it arrives, and the latency vision.py measured up to publishing is taken
+off that.
+'''
+
+from array import array
+
+# Vision/target fields, see vision.py
+FOUND, ANGLE, DISTANCE, CAPTURE_TIME, LATENCY = range(5)
+
+# vision samples captured longer ago than this are ignored (s)
+MAX_AGE = 0.5
+
+# tunable (params.py): ultrasonic voltage windows that are in placing range
+PARAMETERS = (
+    ('playerStationRange', (0.142, 0.146)),     # ultrasonic
+    ('hatchRange', (0.70, 1.56)),               # cargoUltrasonic
+)
+
+
+class AutoAlign(object):
+    ''' Turns to and approaches the vision target. '''
+
+    def __init__(self, drive, visionTable, clock, kTurn=0.03, kForward=0.015, maxTurn=0.5, maxForward=0.45,
+                 minForward=0.15, standoff=18.0, aimTolerance=2.0, historySize=64):
+        '''
+            :param drive: DifferentialDrive
+            :param visionTable: the 'Vision' NetworkTable
+            :param clock: function returning the robot time (s) that update() is given, e.g. the FPGA time
+            :param kTurn: turn output per degree of heading error
+            :param kForward: forward output per inch of vision distance beyond the standoff
+            :param standoff: vision distance (in) below which only the ultrasonic decides when to stop
+            :param aimTolerance: heading error (deg) under which the robot drives forward at full allowed speed
+            :param historySize: heading samples kept for latency compensation
+        '''
+        self.drive = drive
+        self.visionTable = visionTable
+        self.kTurn = kTurn
+        self.kForward = kForward
+        self.maxTurn = maxTurn
+        self.maxForward = maxForward
+        self.minForward = minForward
+        self.standoff = standoff
+        self.aimTolerance = aimTolerance
+
+        # heading history ring buffer
+        self.size = historySize
+        self.times = array('d', bytes(8 * historySize))
+        self.headings = array('d', bytes(8 * historySize))
+        self.cursor = 0
+        self.count = 0
+
+        # latest vision sample and its arrival time, set by the NetworkTables listener thread
+        self.clock = clock
+        self.received = None
+        self.used = None
+        visionTable.addEntryListener(self._onVision, key='target')
+
+        self.lastSample = 0.0
+        self.targetHeading = None
+        self.targetDistance = None
+        self.status = "Off"
+
+    def recordHeading(self, timestamp, heading):
+        ''' Stores the robot heading (deg, clockwise positive) for this loop. '''
+        self.times[self.cursor] = timestamp
+        self.headings[self.cursor] = heading
+        self.cursor = (self.cursor + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def headingAt(self, timestamp):
+        ''' Heading at a past time, interpolated between the recorded samples. '''
+        newer = None
+        for i in range(1, self.count + 1):
+            index = (self.cursor - i) % self.size
+            if self.times[index] <= timestamp:
+                if newer is None:
+                    return self.headings[index]
+                t0, t1 = self.times[index], self.times[newer]
+                h0, h1 = self.headings[index], self.headings[newer]
+                if t1 == t0:
+                    return h1
+                return h0 + (h1 - h0) * (timestamp - t0) / (t1 - t0)
+            newer = index
+        # older than the whole history: best guess is the oldest sample
+        return self.headings[newer] if newer is not None else 0.0
+
+    def reset(self):
+        self.targetHeading = None
+        self.targetDistance = None
+        self.status = "Off"
+
+    def _onVision(self, source, key, value, isNew):
+        ''' NetworkTables listener: stamps a new vision sample with its arrival time. '''
+        self.received = (value, self.clock())
+
+    def _readVision(self):
+        received = self.received
+        if received is None or received is self.used:
+            return
+        self.used = received
+        sample, arrival = received
+        if len(sample) < 5 or not sample[FOUND]:
+            return
+
+        # when the frame was taken, in robot time
+        captured = arrival - sample[LATENCY]
+        self.targetHeading = self.headingAt(captured) + sample[ANGLE]
+        self.targetDistance = sample[DISTANCE]
+        self.lastSample = captured
+
+    def update(self, now, heading, rangeVoltage, rangeWindow):
+        '''
+            One assisted drive step.
+
+            :param now: FPGA time of this loop
+            :param heading: current heading (deg)
+            :param rangeVoltage: ultrasonic voltage of the mechanism being placed
+            :param rangeWindow: (low, high) voltage window that is in placing range
+            :returns: True once the robot is lined up and in range
+        '''
+        self._readVision()
+
+        low, high = rangeWindow
+        if rangeVoltage <= high:
+            # in (or closer than) placing range: only fix the aim
+            forwardAllowed = False
+            inRange = rangeVoltage >= low
+        else:
+            forwardAllowed = True
+            inRange = False
+
+        if self.targetHeading is None or now - self.lastSample > MAX_AGE:
+            self.drive.tankDrive(0, 0, False)
+            self.status = "No Target"
+            return False
+
+        error = self.targetHeading - heading
+        turn = max(-self.maxTurn, min(self.maxTurn, self.kTurn * error))
+
+        forward = 0.0
+        if forwardAllowed:
+            forward = self.kForward * max(self.targetDistance - self.standoff, 0.0) + self.minForward
+            forward = min(forward, self.maxForward)
+            if abs(error) > self.aimTolerance:
+                # turn first, creep while still far off
+                forward *= self.aimTolerance / abs(error)
+
+        self.drive.tankDrive(forward + turn, forward - turn, False)
+
+        aligned = inRange and abs(error) <= self.aimTolerance
+        self.status = "Aligned" if aligned else "Aligning"
+        return aligned
@@ -0,0 +1,190 @@
+'''
+Autonomous routines.
+
+A routine is a list of steps picked from SmartDashboard before the match:
+following a precomputed trajectory (trajectory.py), setting a solenoid or
+waiting. Trajectories are followed with per-side feedforward (static,
+velocity and acceleration) plus feedback on the wheel distance from the
+drive Talon encoders and on the odometry heading.
+'''
+
+import logging
+from math import atan2, copysign, cos, sin
+
+import wpilib
+
+from robotmap import COUNTS_PER_INCH, HIGH_GEAR
+import trajectory
+
+logger = logging.getLogger('autonomous')
+
+# name -> steps; None leaves the sandstorm to the drivers
+#   ('path', trajectory name)
+#   ('set', solenoid attribute of the robot, 'kForward' / 'kReverse')
+#   ('wait', seconds)
+ROUTINES = (
+    ('Driver Control', None),
+    ('Drive Off HAB', (
+        ('set', 'DoubleSolenoidOne', 'kForward'),   # high gear, the follower gains are tuned for it
+        ('path', 'HAB Forward'),
+    )),
+    ('Cargo Ship Front Hatch', (
+        ('set', 'DoubleSolenoidOne', 'kForward'),
+        ('path', 'HAB to Cargo Front'),
+        ('set', 'DoubleSolenoidThree', 'kForward'),  # eject the hatch panel
+        ('wait', 0.5),
+        ('path', 'Cargo Front Back Out'),
+        ('set', 'DoubleSolenoidThree', 'kReverse'),
+    )),
+)
+
+
+class FollowerGains(object):
+    ''' Tuning of the trajectory follower, in inches and seconds, for high gear. '''
+
+    def __init__(self, kS=0.06, kV=0.0042, kA=0.0008, kP=0.03, kTurn=0.8,
+                 maxOutput=0.8, tolerance=2.0, settleTime=0.5):
+        # feedforward: output to break static friction, per in/s and per in/s^2
+        self.kS = kS
+        self.kV = kV
+        self.kA = kA
+
+        # feedback: output per inch of wheel distance error and per radian of heading error
+        self.kP = kP
+        self.kTurn = kTurn
+
+        self.maxOutput = maxOutput
+
+        # a finished trajectory waits up to settleTime for both wheels to be within tolerance (in)
+        self.tolerance = tolerance
+        self.settleTime = settleTime
+
+
+class PathFollower(object):
+    ''' Drives one trajectory, indexed by time since start(). '''
+
+    def __init__(self, drive, gains=None, countsPerInch=COUNTS_PER_INCH[HIGH_GEAR]):
+        self.drive = drive
+        self.gains = gains or FollowerGains()
+        self.countsPerInch = countsPerInch
+        self.path = None
+        self.startTime = 0.0
+        self.leftStart = 0
+        self.rightStart = 0
+        self.leftError = 0.0
+        self.rightError = 0.0
+
+    def start(self, path, now, leftCounts, rightCounts):
+        self.path = path
+        self.startTime = now
+        self.leftStart = leftCounts
+        self.rightStart = rightCounts
+        self.leftError = 0.0
+        self.rightError = 0.0
+
+    def _side(self, index, position, velocityField, accelerationField, distance):
+        g = self.gains
+        velocity = self.path.get(index, velocityField)
+        error = self.path.get(index, position) - distance
+        output = g.kV * velocity + g.kA * self.path.get(index, accelerationField) + g.kP * error
+        if velocity:
+            output += copysign(g.kS, velocity)
+        return output, error
+
+    def update(self, now, leftCounts, rightCounts, heading):
+        '''
+            One follower step.
+
+            :param heading: odometry heading (rad, counter-clockwise)
+        '''
+        path, g = self.path, self.gains
+        index = path.index(now - self.startTime)
+
+        left, self.leftError = self._side(index, trajectory.LEFT_POSITION, trajectory.LEFT_VELOCITY,
+                                          trajectory.LEFT_ACCELERATION,
+                                          (leftCounts - self.leftStart) / self.countsPerInch)
+        right, self.rightError = self._side(index, trajectory.RIGHT_POSITION, trajectory.RIGHT_VELOCITY,
+                                            trajectory.RIGHT_ACCELERATION,
+                                            (rightCounts - self.rightStart) / self.countsPerInch)
+
+        # heading error, wrapped to +-pi
+        error = path.get(index, trajectory.HEADING) - heading
+        turn = g.kTurn * atan2(sin(error), cos(error))
+        left -= turn
+        right += turn
+
+        limit = g.maxOutput
+        self.drive.tankDrive(max(-limit, min(limit, left)), max(-limit, min(limit, right)), False)
+
+    def isFinished(self, now):
+        elapsed = now - self.startTime - self.path.duration()
+        if elapsed < 0:
+            return False
+        settled = abs(self.leftError) <= self.gains.tolerance and abs(self.rightError) <= self.gains.tolerance
+        return settled or elapsed >= self.gains.settleTime
+
+
+class AutoRoutine(object):
+    ''' Runs the steps of one routine, one update per loop. '''
+
+    def __init__(self, robot, name, steps, library, gains=None):
+        self.robot = robot
+        self.name = name
+        self.steps = steps
+        self.library = library
+        self.follower = PathFollower(robot.drive, gains)
+        self.step = 0
+        self.stepStart = None
+        self.status = name
+
+    def isFinished(self):
+        return self.step >= len(self.steps)
+
+    def update(self, state, heading):
+        ''' Runs the current step, moving on to the next ones as they finish. '''
+        while not self.isFinished():
+            kind, *args = self.steps[self.step]
+            if self.stepStart is None:
+                self.stepStart = state.timestamp
+                self.status = '%s: %s' % (self.name, ' '.join(str(item) for item in self.steps[self.step]))
+                if kind == 'path':
+                    self.follower.start(self.library[args[0]], state.timestamp,
+                                        state.leftPosition, state.rightPosition)
+                elif kind == 'set':
+                    getattr(self.robot, args[0]).set(getattr(wpilib.DoubleSolenoid.Value, args[1]))
+
+            if kind == 'path':
+                if not self.follower.isFinished(state.timestamp):
+                    self.follower.update(state.timestamp, state.leftPosition, state.rightPosition, heading)
+                    return
+            elif kind == 'wait':
+                self.robot.drive.tankDrive(0, 0, False)
+                if state.timestamp - self.stepStart < args[0]:
+                    return
+
+            self.step += 1
+            self.stepStart = None
+
+        self.robot.drive.tankDrive(0, 0, False)
+        self.status = '%s: done' % self.name
+
+
+def loadRoutines(path=trajectory.DEFAULT_PATH):
+    '''
+        Loads the trajectory library and keeps the routines whose trajectories are in it.
+        Returns (library, list of (name, steps)).
+    '''
+    try:
+        library = trajectory.load(path)
+    except (OSError, ValueError):
+        logger.exception('could not load the trajectory library %s', path)
+        library = {}
+
+    routines = []
+    for name, steps in ROUTINES:
+        missing = [args[0] for kind, *args in steps or () if kind == 'path' and args[0] not in library]
+        if missing:
+            logger.error('autonomous routine %r disabled, missing trajectories %s', name, missing)
+            continue
+        routines.append((name, steps))
+    return library, routines
@@ -0,0 +1,117 @@
+'''
+Camera stream bandwidth manager, used by the vision process.
+
+The camera the driver selected on SmartDashboard gets the full quality
+stream; the other one is throttled to a small, slow, heavily compressed
+stream, or paused entirely when nothing else needs its frames. The
+measured capture data rate and frame rate of every camera are published.
+These are what each camera sends over USB, before the MJPEG server
+recompresses it, so they are an upper bound on what it costs on the field
+radio.
+'''
+
+import time
+import logging
+import threading
+
+import cscore
+from networktables import NetworkTables
+
+logger = logging.getLogger('cameras')
+
+# stream settings: (width, height, fps, jpeg quality 0-100)
+FULL = (320, 240, 20, 50)
+THROTTLED = (160, 120, 5, 20)
+
+# SendableChooser put on SmartDashboard by robot.py
+CHOOSER_TABLE = 'SmartDashboard/Camera'
+
+# seconds between data rate reports
+REPORT_PERIOD = 1.0
+
+
+class CameraManager(object):
+    ''' Gives the selected camera the bandwidth and throttles or pauses the rest. '''
+
+    def __init__(self, cs, cameras, keepOpen=(), pauseUnselected=True):
+        '''
+            :param cs: the CameraServer instance
+            :param cameras: dict of dashboard name ("Top Camera") -> camera started by startAutomaticCapture
+            :param keepOpen: names of cameras that must keep capturing (e.g. the vision camera)
+            :param pauseUnselected: pause unselected cameras instead of throttling them
+        '''
+        self.cameras = cameras
+        self.keepOpen = set(keepOpen)
+        self.pauseUnselected = pauseUnselected
+        self.servers = {}
+        for name, camera in cameras.items():
+            self.servers[name] = cs.getServer(name='serve_' + camera.getName())
+
+        self.names = sorted(cameras)
+        self.selected = None
+        self.lock = threading.Lock()
+
+        self.chooser = NetworkTables.getTable(CHOOSER_TABLE)
+        self.table = NetworkTables.getTable('SmartDashboard')
+
+        # cscore only measures data rates when telemetry is on
+        cscore.setTelemetryPeriod(REPORT_PERIOD)
+
+    def start(self):
+        ''' Applies the current selection and follows dashboard changes from a thread. '''
+        self.select(self._chosen())
+        self.chooser.addEntryListener(self._onChooser, immediateNotify=True, key='selected')
+        threading.Thread(target=self._report, name='cameras', daemon=True).start()
+
+    def _chosen(self):
+        default = self.chooser.getString('default', self.names[0])
+        return self.chooser.getString('selected', default)
+
+    def _onChooser(self, source, key, value, isNew):
+        self.select(value)
+
+    def select(self, selected):
+        ''' Full quality stream for one camera, throttle or pause the others. '''
+        if selected not in self.cameras:
+            return
+        with self.lock:
+            if selected == self.selected:
+                return
+            self.selected = selected
+            for name in self.names:
+                if name == selected:
+                    self._apply(name, FULL, paused=False)
+                else:
+                    paused = self.pauseUnselected and name not in self.keepOpen
+                    self._apply(name, THROTTLED, paused=paused)
+        logger.info('streaming %s', selected)
+
+    def _apply(self, name, settings, paused):
+        width, height, fps, quality = settings
+        camera, server = self.cameras[name], self.servers[name]
+
+        if paused:
+            camera.setConnectionStrategy(cscore.VideoSource.ConnectionStrategy.kForceClose)
+        else:
+            camera.setConnectionStrategy(cscore.VideoSource.ConnectionStrategy.kAutoManage)
+
+        # cameras only used for streaming also capture at the stream settings, saving USB bandwidth;
+        # cameras kept open for processing keep their capture settings
+        if name not in self.keepOpen:
+            camera.setResolution(width, height)
+            camera.setFPS(fps)
+
+        server.setResolution(width, height)
+        server.setFPS(fps)
+        server.setCompression(quality)
+        server.setDefaultCompression(quality)
+
+    def _report(self):
+        ''' Thread: publishes the measured capture (USB) data rate and frame rate of every camera. '''
+        while True:
+            time.sleep(REPORT_PERIOD)
+            for name in self.names:
+                camera = self.cameras[name]
+                self.table.putNumber(name + " Source Mbps: ", round(camera.getActualDataRate() * 8 / 1e6, 2))
+                self.table.putNumber(name + " Source FPS: ", round(camera.getActualFPS(), 1))
+            self.table.putString("Streaming: ", self.selected or "")
@@ -0,0 +1,300 @@
+'''
+Commands run by the scheduler, shared by autonomous and teleop.
+
+Default commands hold the driver controls of each subsystem; the others
+are started by button bindings (oi.py) or by autonomousInit and interrupt
+the default command of the subsystems they require until they finish.
+'''
+
+from wpilib.command import Command
+
+from inputs import LEFT_STICK, RIGHT_STICK, XBOX
+
+# tunable driver control values (params.py)
+PARAMETERS = (
+    ('driverOverride', 0.5),        # drive stick deflection that takes over from an autonomous routine
+    ('liftUpDivisor', 1.5),         # manual lift up: trigger / divisor
+    ('liftDownScale', 0.25),        # manual lift down: trigger * scale
+    ('liftHoldOutput', 0.05),
+    ('fourBarDivisor', 4.0),        # manual four-bar: stick / divisor
+    ('fourBarDeadband', 0.1),       # four-bar stick deflection below which the arm holds
+    ('cargoSlowOutput', 0.12),
+    ('cargoInScale', 0.75),         # cargo intake: stick * scale
+)
+
+# driver drive modes, picked on SmartDashboard
+TANK, ARCADE, CURVATURE = 'Tank', 'Arcade', 'Curvature'
+
+# gear shifting modes, picked on SmartDashboard
+MANUAL_SHIFT, AUTO_SHIFT = 'Manual', 'Auto'
+
+
+class DriverDrive(Command):
+    '''
+        Default drive command: tank steering with both sticks, or arcade / curvature
+        drive with the left stick's throttle and the right stick's turn (right 3 = quick turn).
+    '''
+
+    def __init__(self, robot):
+        super().__init__('DriverDrive')
+        self.robot = robot
+        self.mode = TANK
+        self.requires(robot.drivetrain)
+
+    def initialize(self):
+        self.robot.driveShaper.reset()
+
+    def execute(self):
+        robot = self.robot
+        inputs, shaper, drive = robot.inputs, robot.driveShaper, robot.drive
+        now, gear = robot.state.timestamp, robot.state.gear
+
+        # the drive mode can be changed on the dashboard at any time, even mid-match
+        mode = robot.driveModeChooser.getSelected() or TANK
+        if mode != self.mode:
+            self.mode = mode
+            shaper.reset()
+
+        # stick y is negative forward
+        if self.mode == TANK:
+            left, right = shaper.tank(-inputs.axis(LEFT_STICK, 1), -inputs.axis(RIGHT_STICK, 1), gear, now)
+            drive.tankDrive(left, right, False)
+        else:
+            speed, rotation = shaper.arcade(-inputs.axis(LEFT_STICK, 1), inputs.axis(RIGHT_STICK, 0), gear, now)
+            if self.mode == CURVATURE:
+                drive.curvatureDrive(speed, rotation, inputs.button(RIGHT_STICK, 3))
+            else:
+                drive.arcadeDrive(speed, rotation, False)
+
+    def isFinished(self):
+        return False
+
+
+class AlignToTarget(Command):
+    ''' Vision auto-align while a thumb button is held. '''
+
+    def __init__(self, robot, rangeFinder, rangeWindow):
+        '''
+            :param rangeFinder: ranging.RangeFinder of the ultrasonic facing the target
+            :param rangeWindow: parameter (params.py) with the (low, high) voltage window that is in placing range
+        '''
+        super().__init__('AlignToTarget')
+        self.robot = robot
+        self.rangeFinder = rangeFinder
+        self.rangeWindow = rangeWindow
+        self.requires(robot.drivetrain)
+
+    def execute(self):
+        robot = self.robot
+        robot.autoAlign.update(robot.state.timestamp, robot.odometry.getHeading(),
+                               self.rangeFinder.voltage, robot.params.get(self.rangeWindow))
+
+    def isFinished(self):
+        return False
+
+    def end(self):
+        self.robot.autoAlign.reset()
+
+    def interrupted(self):
+        self.end()
+
+
+class FollowRoutine(Command):
+    ''' Runs an autonomous routine until it is done or the drivers take over. '''
+
+    def __init__(self, robot, routine):
+        super().__init__('FollowRoutine')
+        self.robot = robot
+        self.routine = routine
+        self.overridden = False
+        self.requires(robot.drivetrain)
+
+    def execute(self):
+        robot = self.robot
+
+        # the drivers take over by moving a drive stick
+        override = robot.params.driverOverride
+        if abs(robot.inputs.axis(LEFT_STICK, 1)) > override or abs(robot.inputs.axis(RIGHT_STICK, 1)) > override:
+            self.overridden = True
+            robot.telemetry.putString("Auto Routine: ", "Driver Override")
+            return
+
+        self.routine.update(robot.state, robot.odometry.getPose()[2])
+        robot.telemetry.putString("Auto Routine: ", self.routine.status)
+
+    def isFinished(self):
+        return self.overridden or self.routine.isFinished()
+
+
+class LiftControl(Command):
+    ''' Default lift command: button box levels, manual control while no level is selected. '''
+
+    def __init__(self, robot):
+        super().__init__('LiftControl')
+        self.robot = robot
+        self.requires(robot.liftSubsystem)
+
+    def execute(self):
+        robot = self.robot
+        liftSystem, inputs, params = robot.liftSystem, robot.inputs, robot.params
+
+        liftSystem.step(robot.buttonStatus, robot.state)
+
+        if True not in robot.buttonStatus:
+            if inputs.axis(XBOX, 3):  # up
+                liftSystem.manual(inputs.axis(XBOX, 3) / params.liftUpDivisor)
+            elif inputs.axis(XBOX, 2):  # down
+                liftSystem.manual(-inputs.axis(XBOX, 2) * params.liftDownScale)
+            elif inputs.button(XBOX, 5):  # hold
+                liftSystem.manual(params.liftHoldOutput)
+            else:
+                liftSystem.idle()   # keeps holding the last level
+
+    def isFinished(self):
+        return False
+
+
+class FourBarControl(Command):
+    ''' Default four-bar command: lift level presets, manual on the xbox left stick, holds otherwise (button 6 too). '''
+
+    def __init__(self, robot):
+        super().__init__('FourBarControl')
+        self.robot = robot
+        self.requires(robot.fourBar)
+
+    def execute(self):
+        robot = self.robot
+        fourBarSystem, inputs, params = robot.fourBarSystem, robot.inputs, robot.params
+
+        # stick y is negative up
+        stick = -inputs.axis(XBOX, 1)
+        if abs(stick) > params.fourBarDeadband and not inputs.button(XBOX, 6):
+            fourBarSystem.manual(stick / params.fourBarDivisor)
+        elif not fourBarSystem.step(robot.buttonStatus):
+            fourBarSystem.idle()    # keeps holding the preset or where the arm was left
+
+    def isFinished(self):
+        return False
+
+
+class CargoControl(Command):
+    ''' Default cargo intake command: button 7 runs it slowly, the right stick takes in. '''
+
+    def __init__(self, robot):
+        super().__init__('CargoControl')
+        self.robot = robot
+        self.requires(robot.cargoIntake)
+
+    def execute(self):
+        inputs, params = self.robot.inputs, self.robot.params
+        if inputs.button(XBOX, 7):
+            self.robot.cargoIntake.set(params.cargoSlowOutput)
+        elif inputs.axis(XBOX, 5):  # take in
+            self.robot.cargoIntake.set(inputs.axis(XBOX, 5) * params.cargoInScale)
+
+    def isFinished(self):
+        return False
+
+
+class SetSolenoid(Command):
+    ''' Moves a pneumatic subsystem to one position and finishes. '''
+
+    def __init__(self, subsystem, value):
+        super().__init__('Set%s' % subsystem.getName())
+        self.subsystem = subsystem
+        self.value = value
+        self.requires(subsystem)
+
+    def initialize(self):
+        self.subsystem.set(self.value)
+
+    def isFinished(self):
+        return True
+
+
+class AutoShift(Command):
+    '''
+        Default shifter command: picks the gear from wheel speed and motor current in auto-shift
+        mode. Teleop only, the autonomous routines set the gear their follower gains are tuned for.
+    '''
+
+    def __init__(self, robot):
+        super().__init__('AutoShift')
+        self.robot = robot
+        self.enabled = False
+        self.requires(robot.shifter)
+
+    def execute(self):
+        robot = self.robot
+
+        # the shift mode can be changed on the dashboard at any time; speed filtered before then is stale
+        enabled = robot.isOperatorControl() and robot.shiftModeChooser.getSelected() == AUTO_SHIFT
+        if enabled and not self.enabled:
+            robot.autoShifter.reset()
+        self.enabled = enabled
+        if not enabled:
+            return
+
+        state = robot.state
+        gear = robot.autoShifter.update(state.timestamp, state.gear, state.leftVelocity, state.rightVelocity,
+                                        state.leftCurrent, state.rightCurrent)
+        if gear is not None:
+            robot.shifter.set(gear)
+        robot.telemetry.putString("Auto Shift: ", robot.autoShifter.reason)
+        robot.telemetry.putNumber("Drive Speed (in/s): ", round(robot.autoShifter.speed, 1))
+
+    def isFinished(self):
+        return False
+
+
+class ShiftGear(Command):
+    '''
+        Driver shift. Manual mode keeps the gear after the trigger is released; in auto-shift
+        mode the gear is held while the trigger is, then auto-shifting takes over again.
+    '''
+
+    def __init__(self, robot, value):
+        super().__init__('ShiftGear')
+        self.robot = robot
+        self.value = value
+        self.requires(robot.shifter)
+
+    def initialize(self):
+        self.robot.shifter.set(self.value)
+        self.robot.autoShifter.shifted(self.robot.state.timestamp)
+
+    def isFinished(self):
+        return False
+
+
+class SetCompressor(Command):
+    ''' Starts or stops the compressor and finishes; the power manager defers it while shedding. '''
+
+    def __init__(self, power, enabled):
+        super().__init__('StartCompressor' if enabled else 'StopCompressor')
+        self.power = power
+        self.enabled = enabled
+
+    def initialize(self):
+        self.power.setCompressor(self.enabled)
+
+    def isFinished(self):
+        return True
+
+
+class Diagnostics(Command):
+    ''' Autonomous test modes picked with the game specific message. '''
+
+    def __init__(self, robot):
+        super().__init__('Diagnostics')
+        self.robot = robot
+
+    def execute(self):
+        message = self.robot.DS.getGameSpecificMessage()
+        if message == "pressure":
+            self.robot.pressure()
+        elif message == "diagnostics":
+            self.robot.diagnostics()
+
+    def isFinished(self):
+        return False
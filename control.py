@@ -0,0 +1,259 @@
+'''
+Profiled closed-loop position control.
+
+The lift (lift.py) and the four-bar (fourbar.py) both move to a goal along
+a trapezoidal velocity profile. A PID controller follows the profile from
+its own Notifier, faster than the 20 ms robot loop. ProfiledController is
+that shared part. Each mechanism adds how it measures its position and how
+the PID output becomes a motor output (its feedforward and limits).
+
+A reversed or wrongly scaled encoder makes a controller drive its
+mechanism away from the goal, into the hard stops. So when the position
+falls more than maxFollowingError behind the profile and makes no progress
+towards it for FAULT_TIME, the controller stops the motor and stays off
+until the robot is disabled.
+'''
+
+import logging
+import threading
+from abc import ABC, abstractmethod
+from math import sqrt
+
+import wpilib
+
+logger = logging.getLogger('control')
+
+# how long a following error may last without progress before it is a fault (s)
+FAULT_TIME = 0.25
+
+
+class TrapezoidProfile(object):
+    ''' Trapezoidal velocity profile from a position and velocity to a stopped goal. '''
+
+    def __init__(self, maxVelocity, maxAcceleration):
+        self.maxVelocity = maxVelocity
+        self.maxAcceleration = maxAcceleration
+        self.start(0.0, 0.0, 0.0)
+
+    def start(self, position, velocity, goal):
+        ''' Plans a new profile. Times are relative to the moment start() is called. '''
+        # plan everything as if moving in the positive direction
+        self.direction = -1.0 if position > goal else 1.0
+        self.initialPosition = position * self.direction
+        self.initialVelocity = velocity * self.direction
+        self.goal = goal * self.direction
+
+        if self.initialVelocity > self.maxVelocity:
+            self.initialVelocity = self.maxVelocity
+
+        acceleration = self.maxAcceleration
+        cutoffBegin = self.initialVelocity / acceleration
+        cutoffDistBegin = cutoffBegin * cutoffBegin * acceleration / 2.0
+
+        fullTrapezoidDist = cutoffDistBegin + (self.goal - self.initialPosition)
+        accelerationTime = self.maxVelocity / acceleration
+        fullSpeedDist = fullTrapezoidDist - accelerationTime * accelerationTime * acceleration
+
+        # not enough room to reach full speed: triangle profile
+        if fullSpeedDist < 0:
+            accelerationTime = sqrt(max(fullTrapezoidDist, 0.0) / acceleration)
+            fullSpeedDist = 0.0
+
+        self.endAccel = accelerationTime - cutoffBegin
+        self.endFullSpeed = self.endAccel + fullSpeedDist / self.maxVelocity
+        self.endDecel = self.endFullSpeed + accelerationTime
+
+    def totalTime(self):
+        return self.endDecel
+
+    def isFinished(self, t):
+        return t >= self.endDecel
+
+    def sample(self, t):
+        ''' Returns (position, velocity) of the profile t seconds after start(). '''
+        acceleration = self.maxAcceleration
+        if t < self.endAccel:
+            velocity = self.initialVelocity + t * acceleration
+            position = self.initialPosition + (self.initialVelocity + t * acceleration / 2.0) * t
+        elif t < self.endFullSpeed:
+            velocity = self.maxVelocity
+            position = (self.initialPosition
+                        + (self.initialVelocity + self.endAccel * acceleration / 2.0) * self.endAccel
+                        + self.maxVelocity * (t - self.endAccel))
+        elif t <= self.endDecel:
+            timeLeft = self.endDecel - t
+            velocity = timeLeft * acceleration
+            position = self.goal - (timeLeft * acceleration / 2.0) * timeLeft
+        else:
+            velocity = 0.0
+            position = self.goal
+        return position * self.direction, velocity * self.direction
+
+
+class ProfiledController(ABC):
+    '''
+        Moves a mechanism to a goal along a trapezoidal profile and holds it there,
+        with a PID controller run by its own Notifier. Subclasses must implement measure()
+        and output(), and may override clampGoal().
+    '''
+
+    def __init__(self, name, motor, gains, period, start=True):
+        '''
+            :param name: mechanism name, for the log
+            :param motor: speed controller (group)
+            :param gains: kP, kI, kD, maxVelocity, maxAcceleration, tolerance, maxIntegral and
+                          maxFollowingError, in the units of measure() and seconds
+            :param period: controller period (s)
+            :param start: False leaves the Notifier stopped, for open-loop only use
+        '''
+        self.name = name
+        self.motor = motor
+        self.gains = gains
+
+        self.profile = TrapezoidProfile(gains.maxVelocity, gains.maxAcceleration)
+        self.lock = threading.Lock()
+
+        # controller state, shared with the Notifier thread
+        self.enabled = False
+        self.goal = None
+        self.target = None          # goal as planned, after clampGoal()
+        self.profileStart = 0.0
+        self.setpoint = 0.0
+        self.setpointVelocity = 0.0
+        self.position = 0.0
+        self.integral = 0.0
+        self.lastError = 0.0
+        self.lastTime = None
+        self.atGoal = False
+
+        # following error watch: start of the current window and the position then
+        self.faultSince = None
+        self.faultPosition = 0.0
+        self.faulted = False
+
+        # output magnitude cap, lowered by the power manager
+        self.outputLimit = 1.0
+
+        self.notifier = wpilib.Notifier(self._update)
+        self.period = period
+        if start:
+            self.notifier.startPeriodic(period)
+
+    @abstractmethod
+    def measure(self):
+        ''' Current position, in the units of the gains. '''
+
+    def clampGoal(self, goal):
+        ''' The goal the profile is planned to, e.g. kept inside soft limits. '''
+        return goal
+
+    @abstractmethod
+    def output(self, position, velocity, feedback):
+        ''' Motor output from the measured position, the profile velocity and the PID output. '''
+
+    def setGoal(self, goal):
+        ''' Starts a profiled move to a goal and holds it once there. Does nothing after a fault. '''
+        now = wpilib.Timer.getFPGATimestamp()
+        with self.lock:
+            if self.faulted:
+                return
+            if self.enabled:
+                # continue smoothly from where the current profile is
+                position, velocity = self.setpoint, self.setpointVelocity
+            else:
+                position, velocity = self.measure(), 0.0
+                self.integral = 0.0
+                self.lastError = 0.0
+                self.lastTime = None
+                self.faultSince = None
+            self.target = self.clampGoal(goal)
+            self.profile.start(position, velocity, self.target)
+            self.profileStart = now
+            self.goal = goal
+            self.atGoal = False
+            self.enabled = True
+
+    def isHolding(self):
+        ''' True while the closed-loop controller owns the motors. '''
+        return self.enabled
+
+    def disable(self):
+        ''' Stops closed-loop control without touching the motor output. '''
+        with self.lock:
+            self.enabled = False
+            self.goal = None
+            self.atGoal = False
+
+    def reset(self):
+        ''' Robot disabled: stops closed-loop control and clears a fault. '''
+        with self.lock:
+            self.enabled = False
+            self.goal = None
+            self.atGoal = False
+            self.faulted = False
+            self.faultSince = None
+
+    def setOutputLimit(self, limit):
+        ''' Caps the output magnitude, open and closed-loop (1.0 is no cap). '''
+        self.outputLimit = limit
+
+    def _limit(self, output):
+        limit = self.outputLimit
+        return max(-limit, min(limit, output))
+
+    def _update(self):
+        ''' One closed-loop step, run by the Notifier every period. '''
+        with self.lock:
+            if not self.enabled:
+                return
+
+            gains = self.gains
+            now = wpilib.Timer.getFPGATimestamp()
+            dt = now - self.lastTime if self.lastTime is not None else self.period
+            if dt <= 0:
+                dt = self.period
+            self.lastTime = now
+
+            t = now - self.profileStart
+            self.setpoint, self.setpointVelocity = self.profile.sample(t)
+            self.position = position = self.measure()
+            error = self.setpoint - position
+
+            if self._watch(now, position, error):
+                return
+
+            self.integral += error * dt
+            if self.integral > gains.maxIntegral:
+                self.integral = gains.maxIntegral
+            elif self.integral < -gains.maxIntegral:
+                self.integral = -gains.maxIntegral
+            derivative = (error - self.lastError) / dt
+            self.lastError = error
+
+            feedback = gains.kP * error + gains.kI * self.integral + gains.kD * derivative
+            self.atGoal = self.profile.isFinished(t) and abs(self.target - position) <= gains.tolerance
+            self.motor.set(self.output(position, self.setpointVelocity, feedback))
+
+    def _watch(self, now, position, error):
+        ''' Following error check, stops the controller and returns True on a fault. '''
+        if abs(error) <= self.gains.maxFollowingError:
+            self.faultSince = None
+            return False
+        if self.faultSince is None:
+            self.faultSince, self.faultPosition = now, position
+            return False
+        if now - self.faultSince < FAULT_TIME:
+            return False
+        if (position - self.faultPosition) * error > 0:
+            # behind, but catching up (e.g. capped by the power manager): watch a new window
+            self.faultSince, self.faultPosition = now, position
+            return False
+
+        self.enabled = False
+        self.goal = None
+        self.atGoal = False
+        self.faulted = True
+        self.motor.set(0)
+        logger.error('%s stopped: %.1f from its profile for %.2f s without getting closer, '
+                     'check the encoder direction and scale', self.name, error, FAULT_TIME)
+        return True
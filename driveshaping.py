@@ -0,0 +1,139 @@
+'''
+Driver input shaping.
+
+A stick axis goes through a deadband and a response curve (power or
+exponential, blended with linear), then a per-gear scale and a slew rate
+limit. The curve is precomputed into a lookup table whenever a parameter
+changes, so shaping an axis in the loop is one interpolated table read.
+All parameters can be tuned live from the parameter registry (params.py).
+
+The defaults reproduce the original tank drive response: the axis squared
+and divided by 1.2, then squared again by tankDrive's squareInputs.
+'''
+
+import threading
+from array import array
+from math import exp
+
+# (registry parameter, shaper parameter, default)
+PARAMETERS = (
+    ('driveDeadband', 'deadband', 0.0),
+    ('driveExponent', 'exponent', 4.0),             # power curve, 2 = square, 3 = cubic
+    ('driveExpo', 'expo', 0.0),                     # > 0 uses (e^(expo x) - 1) / (e^expo - 1) instead
+    ('driveCurveWeight', 'weight', 1.0),            # 0 = linear, 1 = all curve
+    ('driveHighGearScale', 'highGearScale', 1 / 1.44),
+    ('driveLowGearScale', 'lowGearScale', 1 / 1.44),
+    ('driveTurnScale', 'turnScale', 0.75),          # rotation of arcade and curvature drive
+    ('driveSlewRate', 'slewRate', 0.0),             # output change per second, 0 = unlimited
+)
+
+# DoubleSolenoidOne value -> scale parameter; neutral (solenoid never set) is unscaled
+GEAR_SCALES = {1: 'highGearScale', 2: 'lowGearScale'}
+
+# lookup table entries over [0, 1]
+TABLE_SIZE = 257
+
+
+def curve(x, deadband, exponent, expo, weight):
+    ''' Shaped magnitude of an axis magnitude x in [0, 1]. '''
+    if x <= deadband:
+        return 0.0
+    x = (x - deadband) / (1.0 - deadband)
+    if expo > 0:
+        shaped = (exp(expo * x) - 1.0) / (exp(expo) - 1.0)
+    else:
+        shaped = x ** exponent
+    return weight * shaped + (1.0 - weight) * x
+
+
+class SlewLimiter(object):
+    ''' Limits how fast a value may change. '''
+
+    def __init__(self):
+        self.value = 0.0
+        self.time = None
+
+    def calculate(self, target, now, rate):
+        if rate <= 0:
+            self.value = target
+        elif self.time is not None:     # the first call after a reset starts from rest
+            step = rate * (now - self.time)
+            self.value += max(-step, min(step, target - self.value))
+        self.time = now
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+        self.time = None
+
+
+class DriveShaper(object):
+    ''' Shapes driver axes into tank, arcade or curvature drive outputs. '''
+
+    def __init__(self, **params):
+        self.params = dict((name, default) for _, name, default in PARAMETERS)
+        self.table = None
+        self.lock = threading.Lock()
+        self.first = SlewLimiter()
+        self.second = SlewLimiter()
+        self.configure(**params)
+
+    @staticmethod
+    def _build(p):
+        if not 0.0 <= p['deadband'] < 1.0:
+            raise ValueError('deadband must be in [0, 1)')
+        table = array('d', bytes(8 * TABLE_SIZE))
+        for i in range(TABLE_SIZE):
+            table[i] = curve(i / (TABLE_SIZE - 1.0), p['deadband'], p['exponent'], p['expo'], p['weight'])
+        return table
+
+    def configure(self, **params):
+        ''' Changes parameters and rebuilds the lookup table; raises and keeps the old ones if they are invalid. '''
+        with self.lock:
+            new = dict(self.params)
+            new.update(params)
+            table = self._build(new)
+            # swapped in whole, the loop never sees a half-built table
+            self.params = new
+            self.table = table
+
+    def listen(self, params):
+        ''' Takes the parameters from the registry (params.py) and follows their changes. '''
+        params.define((key, default) for key, _, default in PARAMETERS)
+        self.configure(**dict((name, params.get(key)) for key, name, _ in PARAMETERS))
+        for key, name, _ in PARAMETERS:
+            params.onChange(key, lambda value, name=name: self.configure(**{name: value}))
+
+    def shape(self, axis):
+        ''' Curve of an axis in [-1, 1], by interpolating the lookup table. '''
+        table = self.table
+        position = min(abs(axis), 1.0) * (TABLE_SIZE - 1)
+        index = int(position)
+        if index >= TABLE_SIZE - 1:
+            value = table[TABLE_SIZE - 1]
+        else:
+            low = table[index]
+            value = low + (table[index + 1] - low) * (position - index)
+        return value if axis >= 0 else -value
+
+    def gearScale(self, gear):
+        name = GEAR_SCALES.get(gear)
+        return self.params[name] if name else 1.0
+
+    def tank(self, leftAxis, rightAxis, gear, now):
+        ''' (left, right) outputs, forward positive, from stick axes that are already forward positive. '''
+        scale = self.gearScale(gear)
+        rate = self.params['slewRate']
+        return (self.first.calculate(self.shape(leftAxis) * scale, now, rate),
+                self.second.calculate(self.shape(rightAxis) * scale, now, rate))
+
+    def arcade(self, speedAxis, turnAxis, gear, now):
+        ''' (speed, rotation) outputs for arcade or curvature drive, rotation clockwise positive. '''
+        rate = self.params['slewRate']
+        return (self.first.calculate(self.shape(speedAxis) * self.gearScale(gear), now, rate),
+                self.second.calculate(self.shape(turnAxis) * self.params['turnScale'], now, rate))
+
+    def reset(self):
+        ''' Forgets the slew limiter state, e.g. when another command had the drive train. '''
+        self.first.reset()
+        self.second.reset()
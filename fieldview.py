@@ -0,0 +1,466 @@
+'''
+Offline match viewer.
+
+Shows a match log (matchlog.py) on one time axis. The log can come from the
+robot or from a headless simulator run (simrunner.py, which leaves one log
+per scenario in logs/ and names it in its results). The view has three
+parts:
+- the robot's odometry pose, with its path, on the field of sim/config.json;
+- the mechanism states: lift level, claw, ejector and gear;
+- the loop timing, with overruns marked.
+
+Logs are never loaded whole. The file is memory-mapped, and when it is
+opened only the timestamp at the start of each INDEX_BLOCK records is read
+to index it by time. Records, or single fields of them, are decoded when
+they are shown. A time range's worst loop time comes from per-block
+maxima, each computed the first time it is needed. Scrubbing through long
+logs therefore stays quick.
+
+    python fieldview.py logs/match_20190302_141503.gemlog
+    python fieldview.py results.json --scenario drive       # a simrunner --json run
+    python fieldview.py logs/match_20190302_141503.gemlog --at 42.5
+
+Drag or click on the timeline to scrub, mouse wheel zooms it around the
+cursor. Left / right step one loop (shift: one second), space plays.
+'''
+
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from math import cos, degrees, radians, sin
+
+from matchlog import readHeader, _codes
+from robotmap import LEVELS
+
+# records per time index entry
+INDEX_BLOCK = 64
+
+# decoded records kept
+CACHE_SIZE = 512
+
+# robot loop period (s); longer loops are overruns
+PERIOD = 0.02
+
+# lift counts from a level that show as being at it
+LEVEL_TOLERANCE = 10
+
+# lift count shaded darkest in the timeline
+LIFT_TOP = max(count for _, count in LEVELS)
+
+# DoubleSolenoid values and how they are shown
+CLAW = {1: 'Closed', 2: 'Open'}
+EJECTOR = {1: 'Retracted', 2: 'Ejected'}
+GEAR = {1: 'High', 2: 'Low'}
+MODES = ('Disabled', 'Autonomous', 'Teleop', 'Test')
+
+FIELD_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sim', 'config.json')
+
+# pose samples in the drawn path
+TRAIL_POINTS = 2000
+
+
+class LogIndex(object):
+    ''' Time index over a memory-mapped match log, decoding records on demand. '''
+
+    def __init__(self, path, cacheSize=CACHE_SIZE):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.version, recordFormat, names = readHeader(self.file)
+        start = self.file.tell()
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.record_ = struct.Struct(recordFormat)
+        self.names = tuple(names)
+        self.start = start
+        self.size = self.record_.size
+        # the last record may be cut short by a power loss
+        self.count = (len(self.data) - start) // self.size
+
+        # offset and decoder of every single field
+        codes = _codes(recordFormat)
+        self.fields = {}
+        for index, name in enumerate(names):
+            offset = struct.calcsize('<' + ''.join(codes[:index]))
+            self.fields[name] = (offset, struct.Struct('<' + codes[index]))
+
+        # first timestamp of every block
+        offset, decoder = self.fields['timestamp']
+        self.blockTimes = array('d', (decoder.unpack_from(self.data, start + i * self.size + offset)[0]
+                                      for i in range(0, self.count, INDEX_BLOCK)))
+        self.blockLoopMax = {}
+
+        self.cache = OrderedDict()
+        self.cacheSize = cacheSize
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def has(self, name):
+        return name in self.fields
+
+    def value(self, name, index):
+        ''' One field of one record, without decoding the rest of it. '''
+        offset, decoder = self.fields[name]
+        return decoder.unpack_from(self.data, self.start + index * self.size + offset)[0]
+
+    def record(self, index):
+        ''' One record as a dict of field name -> value. '''
+        record = self.cache.get(index)
+        if record is not None:
+            self.cache.move_to_end(index)
+            return record
+        record = dict(zip(self.names, self.record_.unpack_from(self.data, self.start + index * self.size)))
+        self.cache[index] = record
+        if len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+        return record
+
+    def time(self, index):
+        return self.value('timestamp', index)
+
+    def startTime(self):
+        return self.blockTimes[0] if self.count else 0.0
+
+    def endTime(self):
+        return self.time(self.count - 1) if self.count else 0.0
+
+    def find(self, t):
+        ''' Index of the last record at or before time t (the first record if t is before it). '''
+        if not self.count:
+            raise IndexError('empty log')
+        block = max(bisect_right(self.blockTimes, t) - 1, 0)
+        low = block * INDEX_BLOCK
+        high = min(low + INDEX_BLOCK, self.count)
+        # binary search inside the block
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.time(middle) <= t:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def loopMax(self, first, last):
+        ''' Longest loop time of records first..last (inclusive), from block maxima where it can. '''
+        worst = 0.0
+        index = first
+        while index <= last:
+            block, position = divmod(index, INDEX_BLOCK)
+            blockEnd = min((block + 1) * INDEX_BLOCK, self.count) - 1
+            if position == 0 and blockEnd <= last:
+                worst = max(worst, self._blockLoopMax(block))
+                index = blockEnd + 1
+            else:
+                worst = max(worst, self.value('loopTime', index))
+                index += 1
+        return worst
+
+    def _blockLoopMax(self, block):
+        worst = self.blockLoopMax.get(block)
+        if worst is None:
+            first = block * INDEX_BLOCK
+            last = min(first + INDEX_BLOCK, self.count)
+            worst = max(self.value('loopTime', index) for index in range(first, last))
+            self.blockLoopMax[block] = worst
+        return worst
+
+    def sample(self, names, points):
+        ''' Up to points evenly spaced records, decoding only the given fields: list of tuples. '''
+        if not self.count:
+            return []
+        step = max(self.count // points, 1)
+        return [tuple(self.value(name, index) for name in names) for index in range(0, self.count, step)]
+
+
+def liftLevel(count):
+    ''' Name of the lift level the count is at, or the count itself between levels. '''
+    name, target = min(LEVELS, key=lambda level: abs(level[1] - count))
+    if abs(target - count) <= LEVEL_TOLERANCE:
+        return name
+    return 'Bottom' if count <= LEVEL_TOLERANCE else '%d counts' % count
+
+
+def describe(log, index):
+    ''' The state of one record as (label, text) pairs. '''
+    record = log.record(index)
+    rows = [
+        ('Time', '%.2f s' % (record['timestamp'] - log.startTime())),
+        ('Mode', MODES[record['mode']] if record['mode'] < len(MODES) else str(record['mode'])),
+        ('Loop', '%.1f ms%s' % (record['loopTime'] * 1000, ' OVERRUN' if record['loopTime'] > PERIOD else '')),
+    ]
+    if log.has('poseX'):
+        rows.append(('Pose', '(%.1f, %.1f) in, %.1f deg' % (record['poseX'], record['poseY'],
+                                                             degrees(record['poseTheta']))))
+    rows += [
+        ('Lift', liftLevel(record['liftCount'])),
+        ('Claw', CLAW.get(record['claw'], 'Off')),
+        ('Ejector', EJECTOR.get(record['ejector'], 'Off')),
+        ('Gear', GEAR.get(record['gear'], 'Neutral')),
+        ('Battery', '%.2f V' % record['batteryVoltage']),
+    ]
+    return rows
+
+
+def resolve(path, scenario=None):
+    ''' The log of a path: a match log itself, or the log of a scenario in simrunner --json results. '''
+    if not path.endswith('.json'):
+        return path
+    with open(path) as fp:
+        results = json.load(fp)
+    for result in results:
+        if scenario is None or result.get('name') == scenario:
+            if not result.get('log'):
+                raise ValueError('scenario %s wrote no match log' % result.get('name'))
+            return result['log']
+    raise ValueError('no scenario %r in %s' % (scenario, path))
+
+
+class Field(object):
+    ''' Field geometry from sim/config.json, and odometry pose -> field coordinates (ft). '''
+
+    def __init__(self, path=FIELD_CONFIG):
+        with open(path) as fp:
+            config = json.load(fp)['pyfrc']
+        self.width = config['field']['w']
+        self.height = config['field']['h']
+        self.objects = config['field'].get('objects', [])
+        robot = config['robot']
+        self.robotWidth = robot['w']
+        self.robotLength = robot['h']
+        self.startX = robot['starting_x']
+        self.startY = robot['starting_y']
+        self.startAngle = radians(robot['starting_angle'])
+
+    def place(self, x, y, theta):
+        '''
+            Field position (ft, y down like pyfrc's field) and screen angle (rad, clockwise)
+            of an odometry pose (in, x forward and y left of the starting position; theta counter-clockwise).
+        '''
+        forwardX, forwardY = cos(self.startAngle), sin(self.startAngle)
+        leftX, leftY = forwardY, -forwardX
+        fieldX = self.startX + (x * forwardX + y * leftX) / 12.0
+        fieldY = self.startY + (x * forwardY + y * leftY) / 12.0
+        return fieldX, fieldY, self.startAngle - theta
+
+
+class Viewer(object):
+    ''' Tk window: field with pose on top, mechanism and loop timing strips below, sharing a time cursor. '''
+
+    SCALE = 20          # px per ft
+    TIMELINE_WIDTH = 900
+    STRIP_HEIGHT = 22
+    LOOP_HEIGHT = 60
+
+    def __init__(self, log, field):
+        import tkinter
+
+        self.tk = tkinter
+        self.log = log
+        self.field = field
+        self.index = 0
+        self.playing = False
+
+        # visible time range of the timeline
+        self.t0 = log.startTime()
+        self.t1 = max(log.endTime(), self.t0 + 1.0)
+
+        self.root = tkinter.Tk()
+        self.root.title(os.path.basename(log.path))
+
+        self.fieldCanvas = tkinter.Canvas(self.root, width=field.width * self.SCALE,
+                                          height=field.height * self.SCALE, background='white')
+        self.fieldCanvas.grid(row=0, column=0, sticky='nw')
+        self.info = tkinter.Label(self.root, justify='left', anchor='nw', font='TkFixedFont')
+        self.info.grid(row=0, column=1, sticky='nw', padx=8)
+        self.stripNames = ('Lift', 'Claw', 'Ejector', 'Gear')
+        height = self.LOOP_HEIGHT + self.STRIP_HEIGHT * len(self.stripNames) + 20
+        self.timeline = tkinter.Canvas(self.root, width=self.TIMELINE_WIDTH, height=height, background='white')
+        self.timeline.grid(row=1, column=0, columnspan=2, sticky='we')
+
+        self._drawField()
+        self._drawTimeline()
+        self.seek(self.index)
+
+        self.timeline.bind('<Button-1>', self._click)
+        self.timeline.bind('<B1-Motion>', self._click)
+        self.timeline.bind('<MouseWheel>', self._wheel)
+        self.timeline.bind('<Button-4>', lambda event: self._zoom(event.x, 0.8))
+        self.timeline.bind('<Button-5>', lambda event: self._zoom(event.x, 1.25))
+        self.root.bind('<Left>', lambda event: self.seek(self.index - 1))
+        self.root.bind('<Right>', lambda event: self.seek(self.index + 1))
+        self.root.bind('<Shift-Left>', lambda event: self.seekTime(self.log.time(self.index) - 1.0))
+        self.root.bind('<Shift-Right>', lambda event: self.seekTime(self.log.time(self.index) + 1.0))
+        self.root.bind('<space>', self._togglePlay)
+
+    def run(self):
+        self.root.mainloop()
+
+    # field
+
+    def _point(self, x, y):
+        return x * self.SCALE, y * self.SCALE
+
+    def _drawField(self):
+        canvas = self.fieldCanvas
+        for obj in self.field.objects:
+            points = [coordinate for x, y in obj['points'] for coordinate in self._point(x, y)]
+            canvas.create_polygon(*points, fill=obj.get('color', 'grey'))
+
+        # the whole path, decoding only the pose fields of a sample of records
+        if self.log.has('poseX'):
+            trail = []
+            for x, y, theta in self.log.sample(('poseX', 'poseY', 'poseTheta'), TRAIL_POINTS):
+                fieldX, fieldY, _ = self.field.place(x, y, theta)
+                trail.extend(self._point(fieldX, fieldY))
+            if len(trail) >= 4:
+                canvas.create_line(*trail, fill='#8ab', width=1)
+        self.robotItem = canvas.create_polygon(0, 0, 0, 0, 0, 0, fill='', outline='blue', width=2)
+        self.frontItem = canvas.create_line(0, 0, 0, 0, fill='red', width=3)
+
+    def _drawRobot(self, record):
+        if not self.log.has('poseX'):
+            return
+        x, y, angle = self.field.place(record['poseX'], record['poseY'], record['poseTheta'])
+        forward = (cos(angle), sin(angle))
+        side = (-sin(angle), cos(angle))
+        halfLength, halfWidth = self.field.robotLength / 2.0, self.field.robotWidth / 2.0
+        corners = []
+        for along, across in ((1, 1), (1, -1), (-1, -1), (-1, 1)):
+            corners.extend(self._point(x + forward[0] * along * halfLength + side[0] * across * halfWidth,
+                                       y + forward[1] * along * halfLength + side[1] * across * halfWidth))
+        self.fieldCanvas.coords(self.robotItem, *corners)
+        self.fieldCanvas.coords(self.frontItem, *corners[:4])
+
+    # timeline
+
+    def _x(self, t):
+        return (t - self.t0) / (self.t1 - self.t0) * self.TIMELINE_WIDTH
+
+    def _time(self, x):
+        return self.t0 + x / float(self.TIMELINE_WIDTH) * (self.t1 - self.t0)
+
+    def _drawTimeline(self):
+        ''' One decode per pixel column and strip, however long the visible range. '''
+        canvas, log = self.timeline, self.log
+        canvas.delete('all')
+        if not log.count:
+            return
+
+        first = log.find(self.t0)
+        columns = []
+        for x in range(self.TIMELINE_WIDTH):
+            last = log.find(self._time(x + 1))
+            columns.append((x, first, last))
+            first = last
+
+        # loop time: worst loop of each column, the period line, overruns red
+        scale = self.LOOP_HEIGHT / (2.5 * PERIOD)
+        for x, first, last in columns:
+            worst = log.loopMax(first, last)
+            height = min(worst * scale, self.LOOP_HEIGHT)
+            canvas.create_line(x, self.LOOP_HEIGHT, x, self.LOOP_HEIGHT - height,
+                               fill='red' if worst > PERIOD else '#6a6')
+        canvas.create_line(0, self.LOOP_HEIGHT - PERIOD * scale, self.TIMELINE_WIDTH,
+                           self.LOOP_HEIGHT - PERIOD * scale, dash=(3, 3))
+        canvas.create_text(4, 2, anchor='nw', text='loop time')
+
+        # mechanism strips: state of the last record of every column, higher lift darker
+        colors = (
+            lambda record: '#%02x%02x%02x' % ((255 - min(max(record['liftCount'], 0), LIFT_TOP) * 200 // LIFT_TOP,) * 3),
+            lambda record: {1: '#999', 2: '#4b4'}.get(record['claw'], 'white'),
+            lambda record: {1: '#999', 2: '#e83'}.get(record['ejector'], 'white'),
+            lambda record: {1: '#36c', 2: '#a4c'}.get(record['gear'], 'white'),
+        )
+        tops = [self.LOOP_HEIGHT + 4 + row * self.STRIP_HEIGHT for row in range(len(self.stripNames))]
+        for x, _, last in columns:
+            record = log.record(last)
+            for top, color in zip(tops, colors):
+                canvas.create_line(x, top, x, top + self.STRIP_HEIGHT - 2, fill=color(record))
+        for top, name in zip(tops, self.stripNames):
+            canvas.create_text(4, top + 2, anchor='nw', text=name, fill='black')
+
+        bottom = self.LOOP_HEIGHT + 4 + len(self.stripNames) * self.STRIP_HEIGHT
+        for fraction in (0.0, 0.25, 0.5, 0.75):
+            x = fraction * self.TIMELINE_WIDTH
+            canvas.create_text(x + 2, bottom, anchor='nw',
+                               text='%.1f s' % (self._time(x) - log.startTime()))
+        self.cursorItem = canvas.create_line(0, 0, 0, bottom, fill='blue')
+
+    def _click(self, event):
+        self.seekTime(self._time(event.x))
+
+    def _wheel(self, event):
+        self._zoom(event.x, 0.8 if event.delta > 0 else 1.25)
+
+    def _zoom(self, x, factor):
+        log = self.log
+        center = self._time(x)
+        span = min((self.t1 - self.t0) * factor, log.endTime() - log.startTime() + 1.0)
+        span = max(span, 20 * PERIOD)
+        self.t0 = max(center - (center - self.t0) * span / (self.t1 - self.t0), log.startTime())
+        self.t1 = self.t0 + span
+        self._drawTimeline()
+        self.seek(self.index)
+
+    # cursor
+
+    def seekTime(self, t):
+        self.seek(self.log.find(t))
+
+    def seek(self, index):
+        log = self.log
+        if not log.count:
+            return
+        self.index = max(0, min(index, log.count - 1))
+        record = log.record(self.index)
+        self._drawRobot(record)
+        self.info.configure(text='\n'.join('%-8s %s' % row for row in describe(log, self.index)))
+        x = self._x(record['timestamp'])
+        self.timeline.coords(self.cursorItem, x, 0, x, self.LOOP_HEIGHT + 4 + len(self.stripNames) * self.STRIP_HEIGHT)
+
+    def _togglePlay(self, event=None):
+        self.playing = not self.playing
+        if self.playing:
+            self._play()
+
+    def _play(self):
+        if not self.playing or self.index >= self.log.count - 1:
+            self.playing = False
+            return
+        now = self.log.time(self.index)
+        self.seek(self.index + 1)
+        delay = int(max(self.log.time(self.index) - now, 0.001) * 1000)
+        self.root.after(delay, self._play)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log', help='match log, or simrunner --json results')
+    parser.add_argument('--scenario', help='scenario of the simrunner results to show (default: the first)')
+    parser.add_argument('--at', type=float, help='print the state this many seconds into the log instead of opening a window')
+    args = parser.parse_args(argv)
+
+    log = LogIndex(resolve(args.log, args.scenario))
+    try:
+        if args.at is not None:
+            if not log.count:
+                print('%s: empty' % log.path)
+                return 1
+            for label, text in describe(log, log.find(log.startTime() + args.at)):
+                print('%-8s %s' % (label, text))
+            return 0
+        Viewer(log, Field()).run()
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
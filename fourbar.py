@@ -0,0 +1,217 @@
+'''
+Four-bar (liftArm) position control.
+
+The arm angle comes from liftArmEncoder (DIO 5/6), zeroed with the arm in
+its starting position. Like the lift, the four-bar runs a trapezoidal
+profile to its goal and a PID controller in its own Notifier at
+LOOP_PERIOD, faster than the 20 ms robot loop (control.ProfiledController).
+Gravity is compensated with
+a feedforward of kG * cos(angle), so holding any angle costs the PID
+nothing. Goals are kept inside soft limits short of the hard stops, and no output
+pushes past them. Manual control slows down in the last SLOW_ZONE degrees
+before a soft limit and holds the arm once it reaches one.
+
+Nothing is held closed-loop until the arm has been moved, by a preset or
+the driver, in the current enabled period. Until then only the gravity
+feedforward is applied, so the arm doesn't jump when the robot is enabled.
+
+Each button box lift level has a four-bar preset, so selecting a level
+can move the arm as well. START_ANGLE, COUNTS_PER_DEGREE and PRESETS are not
+measured on the robot yet, so the presets stay off until the
+fourBarPresetsEnabled parameter is turned on.
+'''
+
+from math import cos, radians
+
+from control import ProfiledController
+from robotmap import LEVELS
+
+# encoder counts per degree of arm rotation. Encoder.get() counts whole quadrature
+# cycles (it divides out the 4x decoding), so this is the encoder's 2048 cycles per rev.
+COUNTS_PER_DEGREE = 2048 / 360.0
+
+# arm angle (deg, 0 = horizontal, up positive) when the encoder is zeroed: stowed upright
+START_ANGLE = 90.0
+
+# arm angle (deg) for each lift level, in LEVELS order: cargo angled up into the port, hatches level
+PRESETS = (30.0, 0.0, 30.0, 0.0, 30.0, 0.0)
+
+# (lowest, highest) angle (deg) the arm is driven to, short of the hard stops.
+# The upright starting position is inside them, so the arm can be stowed again.
+SOFT_LIMITS = (-35.0, 95.0)
+
+# tunable (params.py)
+PARAMETERS = (
+    ('fourBarPresetsEnabled', False),
+    ('fourBarPresets', PRESETS),
+    ('fourBarLimits', SOFT_LIMITS),
+)
+
+# degrees before a soft limit in which output towards it is scaled down
+SLOW_ZONE = 15.0
+
+# closed-loop period of the four-bar controller (s)
+LOOP_PERIOD = 0.005
+
+
+class FourBarGains(object):
+    ''' Tuning of the closed-loop four-bar controller, in degrees and seconds. '''
+
+    def __init__(self, kP=0.02, kI=0.0, kD=0.0005, kG=0.1,
+                 maxVelocity=180.0, maxAcceleration=540.0,
+                 tolerance=2.0, maxOutput=0.5, maxIntegral=20.0, maxFollowingError=15.0):
+        # PID on angle error (output per degree)
+        self.kP = kP
+        self.kI = kI
+        self.kD = kD
+
+        # output that holds the arm horizontal; scaled by cos(angle)
+        self.kG = kG
+
+        # motion profile limits (deg/s, deg/s^2)
+        self.maxVelocity = maxVelocity
+        self.maxAcceleration = maxAcceleration
+
+        # degrees from the goal that count as "there"
+        self.tolerance = tolerance
+
+        # output limit, both directions
+        self.maxOutput = maxOutput
+
+        # integrator clamp (degree-seconds)
+        self.maxIntegral = maxIntegral
+
+        # degrees behind the profile, without catching up, that stop the controller
+        self.maxFollowingError = maxFollowingError
+
+
+class FourBar(ProfiledController):
+    ''' Holds the four-bar at an angle, moves it to presets and keeps it inside the soft limits. '''
+
+    def __init__(self, motor, encoder, gains=None, period=LOOP_PERIOD):
+        '''
+            :param motor: four-bar speed controller group, positive raises the arm
+            :param encoder: liftArmEncoder, counting up as the arm raises
+            :param gains: FourBarGains
+            :param period: closed-loop controller period (s)
+        '''
+        self.encoder = encoder
+        self.presets = PRESETS
+        self.presetsEnabled = False
+        self.minAngle, self.maxAngle = SOFT_LIMITS
+
+        # moved by a preset or the driver since the robot was enabled
+        self.engaged = False
+
+        super().__init__('four-bar', motor, gains if gains is not None else FourBarGains(), period)
+        self.target = self.position = START_ANGLE
+
+    def listen(self, params):
+        ''' Takes the presets and soft limits from the registry (params.py) and follows their changes. '''
+        params.define(PARAMETERS)
+        self.setPresetsEnabled(params.fourBarPresetsEnabled)
+        self.setPresets(params.fourBarPresets)
+        self.setLimits(params.fourBarLimits)
+        params.onChange('fourBarPresetsEnabled', self.setPresetsEnabled)
+        params.onChange('fourBarPresets', self.setPresets)
+        params.onChange('fourBarLimits', self.setLimits)
+
+    def setPresetsEnabled(self, enabled):
+        ''' Whether selecting a lift level moves the four-bar to its preset. '''
+        self.presetsEnabled = enabled
+
+    def setPresets(self, presets):
+        presets = tuple(presets)
+        if len(presets) != len(LEVELS):
+            raise ValueError('expected %d presets, got %d' % (len(LEVELS), len(presets)))
+        self.presets = presets
+
+    def setLimits(self, limits):
+        ''' New (lowest, highest) soft limits (deg), goals set from now on are clamped to them. '''
+        low, high = limits
+        if low >= high:
+            raise ValueError('the lower soft limit must be below the upper one')
+        self.minAngle, self.maxAngle = low, high
+
+    def getAngle(self):
+        ''' Arm angle (deg), 0 = horizontal. '''
+        return START_ANGLE + self.encoder.get() / COUNTS_PER_DEGREE
+
+    def step(self, buttonStatus):
+        '''
+            Moves to the preset of the highest priority selected lift level, if any.
+            Does nothing while the presets are off or after a fault, so the driver has
+            the four-bar; the level buttons are left to the lift.
+
+            :param buttonStatus: list of button box toggle states
+            :returns: True if a level drove the four-bar this loop
+        '''
+        if not self.presetsEnabled or self.faulted:
+            return False
+        for index in range(len(self.presets)):
+            if buttonStatus[index]:
+                self.engaged = True
+                if self.goal != self.presets[index]:
+                    self.setGoal(self.presets[index])
+                return True
+        return False
+
+    def measure(self):
+        return self.getAngle()
+
+    def clampGoal(self, angle):
+        return max(self.minAngle, min(self.maxAngle, angle))
+
+    def output(self, angle, velocity, feedback):
+        return self._output(angle, self.gains.kG * cos(radians(angle)), feedback)
+
+    def manual(self, output):
+        '''
+            Hands the four-bar to the driver: open-loop on top of the gravity feedforward,
+            slowed down approaching a soft limit and held at the limit once there.
+        '''
+        self.engaged = True
+        self.position = angle = self.getAngle()
+        room = self.maxAngle - angle if output > 0 else angle - self.minAngle
+        if room <= 0:
+            if self.faulted:
+                self.motor.set(0)
+            elif not self.enabled:
+                self.setGoal(angle)     # clamped to the limit
+            return
+        self.disable()
+        if room < SLOW_ZONE:
+            output *= room / SLOW_ZONE
+        self.motor.set(self._output(angle, self.gains.kG * cos(radians(angle)), output))
+
+    def idle(self):
+        '''
+            No driver input: keep holding the goal if there is one, otherwise hold where the
+            driver left the arm. Before the arm has been moved only gravity is compensated.
+        '''
+        if self.enabled:
+            return
+        self.position = angle = self.getAngle()
+        if self.faulted:
+            self.motor.set(0)
+        elif self.engaged:
+            self.setGoal(angle)
+        else:
+            self.motor.set(self._output(angle, self.gains.kG * cos(radians(angle)), 0.0))
+
+    def reset(self):
+        ''' Robot disabled: stops closed-loop control, clears a fault and waits to be moved again. '''
+        super().reset()
+        self.engaged = False
+
+    def _output(self, angle, feedforward, output):
+        ''' Final motor output from the gravity feedforward and the output on top of it, none past a soft limit. '''
+        if (output > 0 and angle >= self.maxAngle) or (output < 0 and angle <= self.minAngle):
+            output = 0.0
+        limit = min(self.outputLimit, self.gains.maxOutput)
+        return max(-limit, min(limit, feedforward + output))
+
+    def publish(self, telemetry):
+        telemetry.putNumber("Four-Bar Angle (deg): ", round(self.position, 1))
+        telemetry.putBoolean("Four-Bar At Goal: ", self.atGoal)
+        telemetry.putBoolean("Four-Bar Fault: ", self.faulted)
@@ -0,0 +1,109 @@
+'''
+Driver station input layer.
+
+Once per loop, update() reads every button of every controller as one
+bitmask per controller (DriverStation.getStickButtons) plus their axes.
+Button changes are debounced, turned into pressed / released / held events
+and dispatched to the actions bound in the mapping table, so any number of
+simultaneous presses is seen in the same loop. Dispatch only walks the bits
+that changed (or are held with a held binding), not every button.
+'''
+
+# controller ports
+LEFT_STICK, RIGHT_STICK, XBOX, BUTTON_BOX = range(4)
+
+# events
+PRESSED, RELEASED, HELD = range(3)
+
+
+def _bits(mask):
+    ''' Yields (button number, bit) for every set bit, lowest first. Button 1 is bit 0. '''
+    while mask:
+        low = mask & -mask
+        yield low.bit_length(), low
+        mask ^= low
+
+
+class Inputs(object):
+    ''' Button bitmasks, axes and event dispatch for all controllers. '''
+
+    def __init__(self, ds, axisCounts, debounce=None):
+        '''
+            :param ds: the DriverStation
+            :param axisCounts: number of axes read per port, e.g. (3, 3, 6, 0)
+            :param debounce: port -> loops a button change must persist before it counts (default 1)
+        '''
+        self.ds = ds
+        self.axisCounts = tuple(axisCounts)
+        ports = len(self.axisCounts)
+        self.debounce = [1] * ports
+        for port, loops in (debounce or {}).items():
+            self.debounce[port] = loops
+
+        self.raw = [0] * ports          # buttons as read this loop
+        self.stable = [0] * ports       # debounced buttons
+        self.pending = [0] * ports      # changed bits still being debounced
+        self.counts = [[0] * 32 for _ in range(ports)]
+        self.axes = [[0.0] * count for count in self.axisCounts]
+
+        # (port, button, event) -> actions; held bindings also in a mask per port
+        self.actions = {}
+        self.heldMasks = [0] * ports
+
+    def bind(self, port, button, event, action):
+        ''' Calls action() on the event of a button (1-based). '''
+        self.actions.setdefault((port, button, event), []).append(action)
+        if event == HELD:
+            self.heldMasks[port] |= 1 << (button - 1)
+
+    def update(self):
+        ''' Reads all controllers once and dispatches the button events. '''
+        ds = self.ds
+        for port, count in enumerate(self.axisCounts):
+            axes = self.axes[port]
+            for axis in range(count):
+                axes[axis] = ds.getStickAxis(port, axis)
+
+            raw = ds.getStickButtons(port)
+            self.raw[port] = raw
+            stable = self.stable[port]
+            changed = raw ^ stable
+
+            if self.debounce[port] > 1:
+                counts = self.counts[port]
+                # bits that bounced back start over
+                for button, _ in _bits(self.pending[port] & ~changed):
+                    counts[button - 1] = 0
+                accepted = 0
+                for button, bit in _bits(changed):
+                    counts[button - 1] += 1
+                    if counts[button - 1] >= self.debounce[port]:
+                        counts[button - 1] = 0
+                        accepted |= bit
+                self.pending[port] = changed & ~accepted
+            else:
+                accepted = changed
+
+            if accepted:
+                current = stable ^ accepted
+                self.stable[port] = current
+                self._dispatch(port, accepted & current, PRESSED)
+                self._dispatch(port, accepted & stable, RELEASED)
+            self._dispatch(port, self.stable[port] & self.heldMasks[port], HELD)
+
+    def _dispatch(self, port, mask, event):
+        actions = self.actions
+        for button, _ in _bits(mask):
+            for action in actions.get((port, button, event), ()):
+                action()
+
+    def axis(self, port, axis):
+        return self.axes[port][axis]
+
+    def button(self, port, button):
+        ''' Debounced state of a button (1-based). '''
+        return bool(self.stable[port] & (1 << (button - 1)))
+
+    def buttons(self, port):
+        ''' Button bitmask of a controller as read this loop, before debouncing. '''
+        return self.raw[port]
@@ -0,0 +1,169 @@
+'''
+Lift setpoint subsystem.
+
+The button box selects a level, the level table maps it to a lift encoder
+count, and the lift moves there. All heights are in LEVELS, and can be
+tuned live as the liftLevels parameter (params.py).
+
+By default the lift runs closed-loop: a trapezoidal velocity profile to the
+level, followed by a PID + feedforward controller that keeps holding the
+target (control.ProfiledController). The controller runs in its own Notifier
+at LOOP_PERIOD, so it is not tied to the 20 ms TimedRobot loop. The lift
+encoder is wired to the roboRIO DIO, so the Victors' onboard PID can't see it
+and the loop runs here.
+'''
+
+from control import ProfiledController
+
+# button box index -> (level, lift encoder count)
+from robotmap import LEVELS
+
+# tunable (params.py): level encoder counts, in LEVELS order
+PARAMETERS = (
+    ('liftLevels', tuple(count for _, count in LEVELS)),
+)
+
+# button box index that drives the lift down onto the Hall effect sensor
+RESET_BUTTON = 6
+
+# closed-loop period of the lift controller (s)
+LOOP_PERIOD = 0.005
+
+
+class LiftGains(object):
+    ''' Tuning of the closed-loop lift controller, in encoder counts and seconds. '''
+
+    def __init__(self, kP=0.008, kI=0.0, kD=0.0002, kV=0.00125, kG=0.05,
+                 maxVelocity=400.0, maxAcceleration=1200.0,
+                 tolerance=5.0, maxOutput=0.6, minOutput=-0.25, maxIntegral=50.0,
+                 maxFollowingError=40.0):
+        # PID on position error (output per count)
+        self.kP = kP
+        self.kI = kI
+        self.kD = kD
+
+        # feedforward: output per count/s of profile velocity, and output to hold against gravity
+        self.kV = kV
+        self.kG = kG
+
+        # motion profile limits
+        self.maxVelocity = maxVelocity
+        self.maxAcceleration = maxAcceleration
+
+        # counts from the target that count as "there"
+        self.tolerance = tolerance
+
+        # output limits, going down is slow just like manual control
+        self.maxOutput = maxOutput
+        self.minOutput = minOutput
+
+        # integrator clamp (count-seconds)
+        self.maxIntegral = maxIntegral
+
+        # counts behind the profile, without catching up, that stop the controller
+        self.maxFollowingError = maxFollowingError
+
+
+class Lift(ProfiledController):
+    ''' Drives the lift to the level selected on the button box. '''
+
+    def __init__(self, motor, encoder, levels=LEVELS, gains=None, closedLoop=True,
+                 upSpeed=0.5, holdSpeed=0.05, resetSpeed=0.01, period=LOOP_PERIOD):
+        '''
+            :param motor: lift speed controller group
+            :param encoder: lift encoder, reset when the Hall effect sensor trips
+            :param levels: sequence of (name, target count), in button box order
+            :param gains: LiftGains for closed-loop control
+            :param closedLoop: False falls back to the open-loop bang-bang control
+            :param period: closed-loop controller period (s)
+        '''
+        self.encoder = encoder
+        self.names = tuple(name for name, _ in levels)
+        self.targets = tuple(count for _, count in levels)
+        self.closedLoop = closedLoop
+        self.upSpeed = upSpeed
+        self.holdSpeed = holdSpeed
+        self.resetSpeed = resetSpeed
+
+        super().__init__('lift', motor, gains if gains is not None else LiftGains(), period, start=closedLoop)
+
+    def listen(self, params):
+        ''' Takes the level counts from the registry (params.py) and follows their changes. '''
+        params.define(PARAMETERS)
+        self.setTargets(params.liftLevels)
+        params.onChange('liftLevels', self.setTargets)
+
+    def setTargets(self, targets):
+        ''' New encoder counts for the levels; a level being held moves to its new count on the next step. '''
+        targets = tuple(targets)
+        if len(targets) != len(self.names):
+            raise ValueError('expected %d levels, got %d' % (len(self.names), len(targets)))
+        if min(targets) < 0:
+            raise ValueError('level counts must not be negative')
+        self.targets = targets
+
+    def getTarget(self, index):
+        ''' Encoder count of a button box level. '''
+        return self.targets[index]
+
+    def step(self, buttonStatus, state):
+        '''
+            Runs one control step for the highest priority selected button.
+            A level's button is cleared once the lift is at the level; the
+            closed-loop controller keeps holding it afterwards. After a fault
+            the buttons are cleared at once, which hands the lift back to the driver.
+
+            :param buttonStatus: list of button box toggle states
+            :param state: SensorSnapshot of this loop
+            :returns: True if a button drove the lift this loop
+        '''
+        for index in range(len(self.targets)):
+            if buttonStatus[index]:
+                target = self.targets[index]
+                if not self.closedLoop:
+                    if state.liftCount <= target:
+                        self.motor.set(self._limit(self.upSpeed))
+                    else:
+                        self.motor.set(self.holdSpeed)
+                        buttonStatus[index] = False
+                    return True
+
+                if self.faulted:
+                    buttonStatus[index] = False
+                    continue
+                if self.goal != target:
+                    self.setGoal(target)
+                elif self.atGoal:
+                    buttonStatus[index] = False
+                return True
+
+        if buttonStatus[RESET_BUTTON]:
+            self.disable()
+            self.motor.set(self.resetSpeed)
+            if state.hall is True:
+                self.encoder.reset()
+            return True
+
+        return False
+
+    def manual(self, output):
+        ''' Hands the lift back to the driver and drives it open-loop. '''
+        self.disable()
+        self.motor.set(self._limit(output))
+
+    def idle(self):
+        ''' No driver input: keep holding a level if there is one, otherwise stop. '''
+        if not self.enabled:
+            self.motor.set(0)
+
+    def measure(self):
+        return self.encoder.get()
+
+    def output(self, position, velocity, feedback):
+        gains = self.gains
+        output = gains.kG + gains.kV * velocity + feedback
+        if output > gains.maxOutput:
+            output = gains.maxOutput
+        elif output < gains.minOutput:
+            output = gains.minOutput
+        return self._limit(output)
@@ -0,0 +1,331 @@
+'''
+High-rate binary match logger.
+
+Every enabled loop is packed as one fixed-layout record into a preallocated
+buffer. Full buffers are handed to a background thread that writes them to
+the roboRIO USB stick, so the loop never waits on the disk. If the writer
+falls behind, records are dropped (and counted) instead of blocking.
+
+A log file is a short header (magic, version, struct format and field
+names) followed by back-to-back records. Offline, readLog() loads a log
+into a NumPy structured array:
+
+    python matchlog.py /media/sda1/logs/match_20190302_141503.gemlog
+'''
+
+import os
+import sys
+import json
+import time
+import queue
+import struct
+import logging
+import threading
+
+logger = logging.getLogger('matchlog')
+
+MAGIC = b'GEMLOG'
+
+VERSION = 1
+
+# (field name, struct code), in record order
+FIELDS = (
+    ('timestamp', 'd'),
+    ('mode', 'B'),              # 0 disabled, 1 autonomous, 2 teleop, 3 test
+    ('loopTime', 'f'),          # previous loop (s)
+
+    # driver input
+    ('leftX', 'f'), ('leftY', 'f'), ('leftZ', 'f'),
+    ('rightX', 'f'), ('rightY', 'f'), ('rightZ', 'f'),
+    ('xbox0', 'f'), ('xbox1', 'f'), ('xbox2', 'f'), ('xbox3', 'f'), ('xbox4', 'f'), ('xbox5', 'f'),
+    ('leftButtons', 'H'), ('rightButtons', 'H'), ('xboxButtons', 'H'), ('buttonBoxButtons', 'H'),
+    ('buttonStatus', 'B'),      # button box toggles, bit n = buttonStatus[n]
+    ('gameMessage', '12s'),
+    ('driveMode', '10s'), ('shiftMode', '6s'),     # dashboard chooser selections
+
+    # motor outputs
+    ('frontLeft', 'f'), ('rearLeft', 'f'), ('frontRight', 'f'), ('rearRight', 'f'),
+    ('lift', 'f'), ('liftArm', 'f'), ('cargo', 'f'),
+
+    # sensors
+    ('leftPosition', 'i'), ('rightPosition', 'i'),
+    ('leftVelocity', 'i'), ('rightVelocity', 'i'),
+    ('leftCurrent', 'f'), ('rightCurrent', 'f'),  # leading drive Talon output current (A)
+    ('liftCount', 'i'), ('liftArmCount', 'i'),
+    ('hall', 'B'),
+    ('ultrasonicVoltage', 'f'), ('cargoUltrasonicVoltage', 'f'),
+    ('gyroAngle', 'f'),
+
+    # odometry pose (in, in, rad)
+    ('poseX', 'f'), ('poseY', 'f'), ('poseTheta', 'f'),
+
+    # pneumatics
+    ('compressorEnabled', 'B'), ('gear', 'B'), ('claw', 'B'), ('ejector', 'B'),
+
+    # power
+    ('batteryVoltage', 'f'), ('totalCurrent', 'f'),
+) + tuple(('pdp%d' % channel, 'f') for channel in range(16))
+
+RECORD_FORMAT = '<' + ''.join(code for _, code in FIELDS)
+FIELD_NAMES = tuple(name for name, _ in FIELDS)
+
+# where the roboRIO mounts a USB stick
+USB_PATHS = ('/u', '/media/sda1')
+
+
+def _header(recordFormat, names):
+    meta = json.dumps({'format': recordFormat, 'fields': list(names)}).encode()
+    return MAGIC + struct.pack('<HI', VERSION, len(meta)) + meta
+
+
+def _create(directory):
+    '''
+        Creates a new log file, never reusing an existing name: the name has one-second
+        resolution (and the roboRIO clock may not be set), so a suffix is added until it is free.
+        Returns (path, file).
+    '''
+    name = time.strftime('match_%Y%m%d_%H%M%S')
+    suffix = ''
+    attempt = 1
+    while True:
+        path = os.path.join(directory, name + suffix + '.gemlog')
+        try:
+            return path, open(path, 'xb')
+        except FileExistsError:
+            attempt += 1
+            suffix = '_%d' % attempt
+
+
+class MatchLogger(object):
+    ''' Packs one record per loop into preallocated buffers, written out by a background thread. '''
+
+    def __init__(self, directory=None, recordsPerBuffer=250, buffers=4):
+        '''
+            :param directory: where logs go, defaults to the USB stick (or ./logs in simulation)
+            :param recordsPerBuffer: records per write, 250 is 5 s of 20 ms loops
+            :param buffers: number of buffers; once all are waiting on the disk, records are dropped
+        '''
+        self.directory = directory
+        self.record_ = struct.Struct(RECORD_FORMAT)
+        self.recordsPerBuffer = recordsPerBuffer
+        self.bufferSize = self.record_.size * recordsPerBuffer
+
+        # buffers cycle free -> filling -> full (writer thread) -> free
+        self.free = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(bytearray(self.bufferSize))
+        self.full = queue.Queue()
+        self.buffer = None
+        self.count = 0
+
+        self.file = None
+        self.path = None
+        self.dropped = 0
+        self.written = 0
+
+        self.thread = threading.Thread(target=self._writer, name='matchlog', daemon=True)
+        self.thread.start()
+
+    def _logDirectory(self, robot):
+        if self.directory is not None:
+            return self.directory
+        if robot.isSimulation():
+            return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+        for path in USB_PATHS:
+            if os.path.ismount(path) or os.path.isdir(path):
+                return os.path.join(path, 'logs')
+        return None     # no USB stick: never fill up the roboRIO's own flash
+
+    def open(self, robot):
+        ''' Starts a new log file, unless one is already open. Returns its path or None. '''
+        if self.file is not None:
+            return self.path
+
+        directory = self._logDirectory(robot)
+        if directory is None:
+            logger.warning('no USB stick found, match logging disabled')
+            return None
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.path, self.file = _create(directory)
+            self.file.write(_header(RECORD_FORMAT, FIELD_NAMES))
+        except OSError:
+            logger.exception('could not open match log in %s', directory)
+            self.file = None
+            return None
+
+        self.dropped = 0
+        self.written = 0
+        return self.path
+
+    def close(self):
+        ''' Hands the partly filled buffer to the writer and closes the file once written. '''
+        if self.file is None:
+            return
+        self._handOff()
+        self.full.put((self.file, None, 0))     # close marker
+        self.file = None
+
+    def stop(self):
+        ''' Closes the log and ends the writer thread once everything queued is written. '''
+        self.close()
+        self.full.put(None)
+        self.thread.join()
+
+    def isOpen(self):
+        return self.file is not None
+
+    def record(self, robot):
+        ''' Packs one loop of robot state. Never blocks. '''
+        if self.file is None:
+            return
+
+        if self.buffer is None:
+            try:
+                self.buffer = self.free.get_nowait()
+            except queue.Empty:
+                self.dropped += 1
+                return
+            self.count = 0
+
+        state = robot.state
+
+        if robot.isAutonomous():
+            mode = 1
+        elif robot.isOperatorControl():
+            mode = 2
+        elif robot.isTest():
+            mode = 3
+        else:
+            mode = 0
+
+        buttonStatus = 0
+        for index in range(len(robot.buttonStatus)):
+            if robot.buttonStatus[index]:
+                buttonStatus |= 1 << index
+
+        inputs = robot.inputs
+        left, right, xbox = inputs.axes[0], inputs.axes[1], inputs.axes[2]
+        x, y, theta = robot.odometry.getPose()
+        self.record_.pack_into(
+            self.buffer, self.count * self.record_.size,
+            state.timestamp, mode, robot.profiler.loop.last(),
+            left[0], left[1], left[2],
+            right[0], right[1], right[2],
+            xbox[0], xbox[1], xbox[2], xbox[3], xbox[4], xbox[5],
+            inputs.buttons(0), inputs.buttons(1), inputs.buttons(2), inputs.buttons(3),
+            buttonStatus, robot.DS.getGameSpecificMessage().encode()[:12],
+            (robot.driveModeChooser.getSelected() or '').encode(),
+            (robot.shiftModeChooser.getSelected() or '').encode(),
+            robot.frontLeftMotor.get(), robot.rearLeftMotor.get(),
+            robot.frontRightMotor.get(), robot.rearRightMotor.get(),
+            robot.liftOne.get(), robot.liftArmOne.get(), robot.cargo.get(),
+            state.leftPosition, state.rightPosition,
+            state.leftVelocity, state.rightVelocity,
+            state.leftCurrent, state.rightCurrent,
+            state.liftCount, state.liftArmCount,
+            state.hall,
+            state.ultrasonicVoltage, state.cargoUltrasonicVoltage,
+            state.gyroAngle,
+            x, y, theta,
+            state.compressorEnabled, state.gear, state.claw, state.ejector,
+            robot.power.batteryVoltage, robot.power.current,
+            *robot.power.currents)
+
+        self.count += 1
+        if self.count == self.recordsPerBuffer:
+            self._handOff()
+
+    def _handOff(self):
+        if self.buffer is not None and self.count:
+            self.full.put((self.file, self.buffer, self.count * self.record_.size))
+        elif self.buffer is not None:
+            self.free.put(self.buffer)
+        self.buffer = None
+        self.count = 0
+
+    def _writer(self):
+        ''' Background thread: writes full buffers and recycles them. '''
+        while True:
+            item = self.full.get()
+            if item is None:
+                return
+
+            fp, buffer, size = item
+            if buffer is None:
+                fp.close()
+                continue
+            try:
+                fp.write(memoryview(buffer)[:size])
+                fp.flush()
+                self.written += size // self.record_.size
+            except (OSError, ValueError):
+                logger.exception('match log write failed')
+            finally:
+                self.free.put(buffer)
+
+
+def _dtype(recordFormat, names):
+    import numpy as np
+
+    codes = {'d': '<f8', 'f': '<f4', 'i': '<i4', 'I': '<u4', 'h': '<i2', 'H': '<u2', 'b': 'i1', 'B': 'u1'}
+    fields = []
+    for name, code in zip(names, _codes(recordFormat)):
+        if code.endswith('s'):
+            fields.append((name, 'S' + code[:-1]))
+        else:
+            fields.append((name, codes[code]))
+    return np.dtype(fields)
+
+
+def _codes(recordFormat):
+    ''' Splits a struct format into one code per field, e.g. '<d12sB' -> ['d', '12s', 'B']. '''
+    codes, count = [], ''
+    for char in recordFormat.lstrip('<'):
+        if char.isdigit():
+            count += char
+        else:
+            codes.append(count + char if char == 's' else char)
+            count = ''
+    return codes
+
+
+def readHeader(fp):
+    ''' Reads a log header. Returns (version, record format, field names). '''
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a match log')
+    version, size = struct.unpack('<HI', fp.read(6))
+    meta = json.loads(fp.read(size).decode())
+    return version, meta['format'], meta['fields']
+
+
+def readLog(path):
+    ''' Loads a match log into a NumPy structured array, one element per loop. '''
+    import numpy as np
+
+    with open(path, 'rb') as fp:
+        version, recordFormat, names = readHeader(fp)
+        data = fp.read()
+    if version != VERSION:
+        raise ValueError('match log version %d, expected %d' % (version, VERSION))
+
+    dtype = _dtype(recordFormat, names)
+    usable = len(data) - len(data) % dtype.itemsize     # last record may be cut short by a power loss
+    return np.frombuffer(data[:usable], dtype=dtype)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    for path in argv:
+        log = readLog(path)
+        if not len(log):
+            print('%s: empty' % path)
+            continue
+        duration = log['timestamp'][-1] - log['timestamp'][0]
+        print('%s: %d records, %.1f s, loop max %.1f ms, battery min %.2f V' % (
+            path, len(log), duration, log['loopTime'].max() * 1000, log['batteryVoltage'].min()))
+
+
+if __name__ == '__main__':
+    main()
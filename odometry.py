@@ -0,0 +1,129 @@
+'''
+Drive train odometry.
+
+Integrates the left/right Talon encoder deltas along the gyro heading into
+a field pose (x forward, y left, inches; theta counter-clockwise, radians)
+from a Notifier running faster than the main loop. Without a gyro (or
+until it has calibrated) the heading comes from the encoder difference.
+'''
+
+import threading
+from math import cos, degrees, radians, sin
+
+import wpilib
+
+# counts per inch per gear, and the track width for the heading without a gyro
+from robotmap import COUNTS_PER_INCH, HIGH_GEAR, TRACK_WIDTH
+
+# update period (s)
+PERIOD = 0.005
+
+# a wheel moving further than this in one update is an encoder reset, not motion (in)
+MAX_STEP = 6.0
+
+
+class Odometry(object):
+    ''' Tracks the robot's field pose from the drive encoders and gyro. '''
+
+    def __init__(self, leftEncoder, rightEncoder, gyro=None, period=PERIOD, start=True):
+        '''
+            :param leftEncoder: sensors.DriveEncoder of the left side
+            :param rightEncoder: sensors.DriveEncoder of the right side
+            :param gyro: wpilib gyro (clockwise positive degrees), or None
+            :param start: False leaves the Notifier stopped, update() is then called by the owner
+        '''
+        self.leftEncoder = leftEncoder
+        self.rightEncoder = rightEncoder
+        self.gyro = gyro
+        self.lock = threading.Lock()
+
+        self.gear = HIGH_GEAR
+        self.x = 0.0
+        self.y = 0.0
+        self.theta = 0.0
+        self.timestamp = 0.0
+        self.thetaOffset = 0.0
+        self.lastLeft = None
+        self.lastRight = None
+        self.encoderTheta = 0.0
+
+        self.notifier = wpilib.Notifier(self.update)
+        if start:
+            self.notifier.startPeriodic(period)
+
+    def setGear(self, gear):
+        ''' Current DoubleSolenoidOne value, picks the counts per inch. '''
+        if gear in COUNTS_PER_INCH:
+            self.gear = gear
+
+    def reset(self, x=0.0, y=0.0, theta=0.0):
+        ''' Sets the pose, e.g. to the starting position of an autonomous routine. '''
+        with self.lock:
+            self.x, self.y = x, y
+            self.encoderTheta = theta
+            self.thetaOffset = theta + (radians(self.gyro.getAngle()) if self.gyro is not None else 0.0)
+            self.theta = theta
+            self.lastLeft = None    # next update only takes new encoder baselines
+            self.lastRight = None
+
+    def setGyro(self, gyro):
+        ''' Switches the heading to a gyro that became ready later, without a jump in the pose. '''
+        with self.lock:
+            self.thetaOffset = self.theta + radians(gyro.getAngle())
+            self.gyro = gyro
+
+    def resync(self):
+        ''' Takes new encoder baselines without moving the pose, after the encoders were zeroed. '''
+        with self.lock:
+            self.lastLeft = None
+            self.lastRight = None
+
+    def _heading(self):
+        if self.gyro is not None:
+            # gyro angle is clockwise positive degrees
+            return self.thetaOffset - radians(self.gyro.getAngle())
+        return self.encoderTheta
+
+    def update(self):
+        ''' One odometry step, run by the Notifier. '''
+        left = self.leftEncoder.getPosition()
+        right = self.rightEncoder.getPosition()
+        now = wpilib.Timer.getFPGATimestamp()
+
+        with self.lock:
+            if self.lastLeft is None:
+                self.lastLeft, self.lastRight = left, right
+                return
+
+            countsPerInch = COUNTS_PER_INCH[self.gear]
+            dLeft = (left - self.lastLeft) / countsPerInch
+            dRight = (right - self.lastRight) / countsPerInch
+            self.lastLeft, self.lastRight = left, right
+            if abs(dLeft) > MAX_STEP or abs(dRight) > MAX_STEP:
+                return
+
+            self.encoderTheta += (dRight - dLeft) / TRACK_WIDTH
+            theta = self._heading()
+
+            # integrate along the mean heading of the step
+            distance = (dLeft + dRight) / 2.0
+            middle = (self.theta + theta) / 2.0
+            self.x += distance * cos(middle)
+            self.y += distance * sin(middle)
+            self.theta = theta
+            self.timestamp = now
+
+    def getPose(self):
+        ''' Returns (x, y, theta) in inches and radians. '''
+        with self.lock:
+            return self.x, self.y, self.theta
+
+    def getHeading(self):
+        ''' Heading in gyro convention: degrees, clockwise positive. '''
+        return -degrees(self.theta)
+
+    def publish(self, telemetry):
+        x, y, theta = self.getPose()
+        telemetry.putNumber("Pose X (in): ", round(x, 1))
+        telemetry.putNumber("Pose Y (in): ", round(y, 1))
+        telemetry.putNumber("Pose Heading (deg): ", round(degrees(theta), 1))
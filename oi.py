@@ -0,0 +1,54 @@
+'''
+Operator interface: the mapping table of buttons to actions.
+
+Drive, lift, four-bar and cargo intake sticks are read by the default
+commands of their subsystems; everything bound here only runs on its
+button event (inputs.py).
+'''
+
+import wpilib
+
+from commands import AlignToTarget, SetCompressor, SetSolenoid, ShiftGear
+from inputs import BUTTON_BOX, LEFT_STICK, PRESSED, RELEASED, RIGHT_STICK, XBOX
+
+FORWARD = wpilib.DoubleSolenoid.Value.kForward
+REVERSE = wpilib.DoubleSolenoid.Value.kReverse
+
+
+def bind(robot):
+    ''' Fills the mapping table of robot.inputs. '''
+    inputs = robot.inputs
+
+    def whenPressed(port, button, command):
+        inputs.bind(port, button, PRESSED, command.start)
+
+    def whileHeld(port, button, command):
+        inputs.bind(port, button, PRESSED, command.start)
+        inputs.bind(port, button, RELEASED, command.cancel)
+
+    def toggle(index):
+        def action():
+            robot.buttonStatus[index] = not robot.buttonStatus[index]
+        return action
+
+    # button box level toggles
+    for index in range(len(robot.buttonStatus)):
+        inputs.bind(BUTTON_BOX, index + 1, PRESSED, toggle(index))
+
+    # compressor
+    whenPressed(XBOX, 9, SetCompressor(robot.power, False))
+    whenPressed(XBOX, 10, SetCompressor(robot.power, True))
+
+    # gear shifting, held to override auto-shifting
+    whileHeld(RIGHT_STICK, 1, ShiftGear(robot, FORWARD))    # high gear
+    whileHeld(LEFT_STICK, 1, ShiftGear(robot, REVERSE))     # low gear
+
+    # hatch panel claw and ejector
+    whenPressed(XBOX, 3, SetSolenoid(robot.claw, FORWARD))      # open claw
+    whenPressed(XBOX, 2, SetSolenoid(robot.claw, REVERSE))      # close claw
+    whenPressed(XBOX, 4, SetSolenoid(robot.ejector, FORWARD))   # eject
+    whenPressed(XBOX, 1, SetSolenoid(robot.ejector, REVERSE))   # retract
+
+    # vision auto-align
+    whileHeld(RIGHT_STICK, 2, AlignToTarget(robot, robot.ranging.playerStation, 'playerStationRange'))
+    whileHeld(LEFT_STICK, 2, AlignToTarget(robot, robot.ranging.cargo, 'hatchRange'))
@@ -0,0 +1,186 @@
+'''
+Live-tunable parameter registry.
+
+Each module that has tuning values lists them as (name, default) pairs and
+defines them here at robotInit. The type of the default is the parameter's
+type: bool, int, float, str, or a fixed-length tuple of numbers. Values
+saved in the JSON file override the defaults.
+
+Every parameter is published to NetworkTables. Changes made on the
+dashboard arrive through an entry listener, so nothing is polled per
+loop. A change is type-checked and passed to the parameter's change
+callbacks; if either rejects it, the old value is put back. Readers use
+plain attribute access (params.liftUpDivisor). Tuned values are written
+back to the file when the robot is disabled, and while it stays disabled
+once they have stopped changing for SAVE_DELAY, so values tuned in the pits
+survive a power cycle.
+
+The file on the roboRIO lives outside the deploy directory, so tuned
+values survive a redeploy. Delete it to go back to the defaults in the
+code.
+'''
+
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger('params')
+
+# tuned values, on the roboRIO outside /home/lvuser/py (replaced on every deploy)
+ROBOT_PATH = '/home/lvuser/params.json'
+SIM_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'params.json')
+
+TYPES = (bool, int, float, str, tuple)
+
+# seconds without a change before tuned values are saved (saveSettled)
+SAVE_DELAY = 2.0
+
+
+def _coerce(value, default):
+    ''' value converted to the type of default, raises TypeError / ValueError if it can't be. '''
+    kind = type(default)
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise TypeError('expected a boolean, got %r' % (value,))
+        return value
+    if kind is int:
+        if isinstance(value, bool) or float(value) != int(value):
+            raise ValueError('expected an integer, got %r' % (value,))
+        return int(value)
+    if kind is float:
+        if isinstance(value, bool):
+            raise TypeError('expected a number, got %r' % (value,))
+        return float(value)
+    if kind is str:
+        if not isinstance(value, str):
+            raise TypeError('expected a string, got %r' % (value,))
+        return value
+    # tuple: same length, each element the type of the default's
+    value = tuple(value)
+    if len(value) != len(default):
+        raise ValueError('expected %d values, got %d' % (len(default), len(value)))
+    return tuple(_coerce(element, elementDefault) for element, elementDefault in zip(value, default))
+
+
+class Parameters(object):
+    ''' Named, typed tuning values, loaded from a JSON file and overridden from NetworkTables. '''
+
+    def __init__(self, path=SIM_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.defaults = {}
+        self.callbacks = {}
+        self.table = None
+        self.dirty = False
+        self.changedAt = 0.0
+        self.saved = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as fp:
+                saved = json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning('ignoring parameter file %s: %s', self.path, e)
+            return {}
+        if not isinstance(saved, dict):
+            logger.warning('ignoring parameter file %s: not an object', self.path)
+            return {}
+        return saved
+
+    def define(self, parameters):
+        ''' Adds (name, default) pairs; a valid value in the file replaces the default. '''
+        for name, default in parameters:
+            if type(default) not in TYPES:
+                raise TypeError('parameter %s: unsupported type %s' % (name, type(default).__name__))
+            if name in self.defaults or hasattr(self, name):
+                raise ValueError('parameter %s is already defined' % name)
+            value = default
+            if name in self.saved:
+                try:
+                    value = _coerce(self.saved[name], default)
+                except (TypeError, ValueError) as e:
+                    logger.warning('parameter %s: ignoring saved value, %s', name, e)
+            self.defaults[name] = default
+            setattr(self, name, value)
+            if self.table is not None:
+                self.table.putValue(name, value)
+
+    def get(self, name):
+        return getattr(self, name)
+
+    def onChange(self, name, callback):
+        ''' Calls callback(value) when the parameter changes; it may raise ValueError to reject the value. '''
+        if name not in self.defaults:
+            raise KeyError(name)
+        self.callbacks.setdefault(name, []).append(callback)
+
+    def set(self, name, value):
+        ''' Changes a parameter, raises TypeError / ValueError and keeps the old value if it is rejected. '''
+        with self.lock:
+            value = _coerce(value, self.defaults[name])
+            old = getattr(self, name)
+            if value == old:
+                return
+            setattr(self, name, value)
+            try:
+                for callback in self.callbacks.get(name, ()):
+                    callback(value)
+            except (TypeError, ValueError, ZeroDivisionError, OverflowError):
+                setattr(self, name, old)
+                for callback in self.callbacks.get(name, ()):
+                    callback(old)
+                raise
+            self.dirty = True
+            self.changedAt = time.monotonic()
+
+    def listen(self, table):
+        ''' Publishes every parameter to a NetworkTable and follows the changes made there. '''
+        self.table = table
+        for name in self.defaults:
+            table.putValue(name, getattr(self, name))
+
+        def changed(source, key, value, isNew):
+            if key not in self.defaults:
+                return
+            try:
+                self.set(key, value)
+            except (TypeError, ValueError, ZeroDivisionError, OverflowError) as e:
+                logger.warning('parameter %s: rejected %r, %s', key, value, e)
+                table.putValue(key, getattr(self, key))
+
+        table.addEntryListener(changed)
+
+    def saveSettled(self, now=None):
+        ''' Saves changed values once they haven't changed for SAVE_DELAY. Returns True if it saved. '''
+        now = time.monotonic() if now is None else now
+        if not self.dirty or now - self.changedAt < SAVE_DELAY:
+            return False
+        if not self.save():
+            self.changedAt = now    # try again after another SAVE_DELAY
+            return False
+        return True
+
+    def save(self):
+        ''' Writes every value to the file, replacing it in one step. '''
+        with self.lock:
+            values = dict((name, getattr(self, name)) for name in sorted(self.defaults))
+            self.dirty = False
+        # values of parameters that weren't defined this run are kept
+        for name, value in self.saved.items():
+            values.setdefault(name, value)
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'w') as fp:
+                json.dump(values, fp, indent=2, sort_keys=True)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning('could not save parameters to %s: %s', self.path, e)
+            self.dirty = True
+            return False
+        self.saved = values
+        logger.info('saved parameters to %s', self.path)
+        return True
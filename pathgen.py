@@ -0,0 +1,199 @@
+'''
+Offline trajectory generator. Never imported by the robot code.
+
+Fits quintic Hermite splines through the waypoints of every path in PATHS,
+time-parameterizes them under velocity, acceleration and curvature limits,
+splits them into left/right wheel profiles and writes the samples to the
+trajectory library loaded by trajectory.py:
+
+    python pathgen.py                   # rebuilds trajectories.bin
+    python pathgen.py -o /tmp/test.bin
+
+Waypoints are (x, y, heading) in inches and degrees, x forward and y left
+of the robot's starting position on the HAB, heading counter-clockwise.
+Reversed paths are driven backwards; their waypoint headings are still the
+direction the robot faces.
+'''
+
+import sys
+import argparse
+from math import atan2, cos, hypot, pi, radians, sin, sqrt
+
+import trajectory
+from robotmap import TRACK_WIDTH
+
+# spline samples per segment, before time parameterization
+SAMPLES_PER_SEGMENT = 500
+
+# tangent length as a fraction of the distance between waypoints
+TANGENT_SCALE = 1.2
+
+PATHS = {
+    # off HAB level 1, straight ahead
+    'HAB Forward': {
+        'waypoints': [(0, 0, 0), (72, 0, 0)],
+        'maxVelocity': 90, 'maxAcceleration': 80,
+    },
+    # center of HAB level 1 to the left front bay of the cargo ship
+    'HAB to Cargo Front': {
+        'waypoints': [(0, 0, 0), (130, 11, 0)],
+        'maxVelocity': 90, 'maxAcceleration': 70,
+    },
+    # backs off the cargo ship after placing the hatch panel
+    'Cargo Front Back Out': {
+        'waypoints': [(130, 11, 0), (94, 11, 0)],
+        'reversed': True,
+        'maxVelocity': 60, 'maxAcceleration': 60,
+    },
+}
+
+
+def _hermite(p0, v0, p1, v1, t):
+    ''' Position, first and second derivative of a quintic Hermite spline with zero end accelerations. '''
+    t2, t3, t4, t5 = t * t, t ** 3, t ** 4, t ** 5
+    h0 = 1 - 10 * t3 + 15 * t4 - 6 * t5
+    h1 = t - 6 * t3 + 8 * t4 - 3 * t5
+    h4 = -4 * t3 + 7 * t4 - 3 * t5
+    h5 = 10 * t3 - 15 * t4 + 6 * t5
+    d0 = -30 * t2 + 60 * t3 - 30 * t4
+    d1 = 1 - 18 * t2 + 32 * t3 - 15 * t4
+    d4 = -12 * t2 + 28 * t3 - 15 * t4
+    d5 = 30 * t2 - 60 * t3 + 30 * t4
+    s0 = -60 * t + 180 * t2 - 120 * t3
+    s1 = -36 * t + 96 * t2 - 60 * t3
+    s4 = -24 * t + 84 * t2 - 60 * t3
+    s5 = 60 * t - 180 * t2 + 120 * t3
+    return (h0 * p0 + h1 * v0 + h4 * v1 + h5 * p1,
+            d0 * p0 + d1 * v0 + d4 * v1 + d5 * p1,
+            s0 * p0 + s1 * v0 + s4 * v1 + s5 * p1)
+
+
+def spline(waypoints, reversed=False):
+    '''
+        Dense points along the path through the waypoints.
+        Returns lists of x, y, travel heading (rad, unwrapped) and curvature (1/in).
+    '''
+    xs, ys, headings, curvatures = [], [], [], []
+    for (x0, y0, h0), (x1, y1, h1) in zip(waypoints, waypoints[1:]):
+        if reversed:
+            h0, h1 = h0 + 180, h1 + 180
+        scale = TANGENT_SCALE * hypot(x1 - x0, y1 - y0)
+        vx0, vy0 = scale * cos(radians(h0)), scale * sin(radians(h0))
+        vx1, vy1 = scale * cos(radians(h1)), scale * sin(radians(h1))
+
+        first = 1 if xs else 0      # segments share their end points
+        for i in range(first, SAMPLES_PER_SEGMENT + 1):
+            t = i / SAMPLES_PER_SEGMENT
+            x, dx, ddx = _hermite(x0, vx0, x1, vx1, t)
+            y, dy, ddy = _hermite(y0, vy0, y1, vy1, t)
+            heading = atan2(dy, dx)
+            if headings:    # unwrap
+                while heading - headings[-1] > pi:
+                    heading -= 2 * pi
+                while heading - headings[-1] < -pi:
+                    heading += 2 * pi
+            xs.append(x)
+            ys.append(y)
+            headings.append(heading)
+            curvatures.append((dx * ddy - dy * ddx) / max(dx * dx + dy * dy, 1e-9) ** 1.5)
+    return xs, ys, headings, curvatures
+
+
+def generate(waypoints, maxVelocity, maxAcceleration, reversed=False, trackWidth=TRACK_WIDTH, dt=trajectory.DT):
+    ''' Samples of one trajectory, one row of trajectory.FIELDS per dt. '''
+    xs, ys, headings, curvatures = spline(waypoints, reversed)
+    count = len(xs)
+
+    # arc length and per-side distance at every spline point
+    distance, leftDistance, rightDistance = [0.0], [0.0], [0.0]
+    for i in range(1, count):
+        ds = hypot(xs[i] - xs[i - 1], ys[i] - ys[i - 1])
+        k = (curvatures[i] + curvatures[i - 1]) / 2.0
+        distance.append(distance[-1] + ds)
+        leftDistance.append(leftDistance[-1] + ds * (1 - k * trackWidth / 2.0))
+        rightDistance.append(rightDistance[-1] + ds * (1 + k * trackWidth / 2.0))
+
+    # fastest speed allowed at every point: the outer wheel stays under maxVelocity,
+    # then forward (accelerate) and backward (decelerate) passes
+    velocity = [maxVelocity / (1 + abs(k) * trackWidth / 2.0) for k in curvatures]
+    velocity[0] = velocity[-1] = 0.0
+    for i in range(1, count):
+        ds = distance[i] - distance[i - 1]
+        velocity[i] = min(velocity[i], sqrt(velocity[i - 1] ** 2 + 2 * maxAcceleration * ds))
+    for i in range(count - 2, -1, -1):
+        ds = distance[i + 1] - distance[i]
+        velocity[i] = min(velocity[i], sqrt(velocity[i + 1] ** 2 + 2 * maxAcceleration * ds))
+
+    # time at every spline point
+    times = [0.0]
+    for i in range(1, count):
+        ds = distance[i] - distance[i - 1]
+        speed = velocity[i] + velocity[i - 1]
+        times.append(times[-1] + (2 * ds / speed if speed > 0 else 0.0))
+
+    # resample at the loop period
+    rows = []
+    index = 0
+    steps = int(times[-1] / dt + 0.999999)
+    for step in range(steps + 1):
+        t = min(step * dt, times[-1])
+        while index < count - 2 and times[index + 1] < t:
+            index += 1
+        span = times[index + 1] - times[index]
+        f = (t - times[index]) / span if span > 0 else 1.0
+
+        def at(values):
+            return values[index] + (values[index + 1] - values[index]) * f
+
+        v = at(velocity)
+        k = at(curvatures)
+        rows.append([at(xs), at(ys), at(headings),
+                     at(leftDistance), v * (1 - k * trackWidth / 2.0), 0.0,
+                     at(rightDistance), v * (1 + k * trackWidth / 2.0), 0.0])
+
+    # accelerations by differencing the velocities
+    for i, row in enumerate(rows):
+        previous, following = rows[max(i - 1, 0)], rows[min(i + 1, len(rows) - 1)]
+        span = dt * (min(i + 1, len(rows) - 1) - max(i - 1, 0)) or dt
+        row[trajectory.LEFT_ACCELERATION] = (following[trajectory.LEFT_VELOCITY] - previous[trajectory.LEFT_VELOCITY]) / span
+        row[trajectory.RIGHT_ACCELERATION] = (following[trajectory.RIGHT_VELOCITY] - previous[trajectory.RIGHT_VELOCITY]) / span
+
+    if reversed:
+        # driving backwards: the robot faces away from the direction of travel,
+        # its left wheels run on the travel path's right side and both run backwards
+        for row in rows:
+            row[trajectory.HEADING] -= pi
+            left = row[trajectory.LEFT_POSITION:trajectory.LEFT_ACCELERATION + 1]
+            right = row[trajectory.RIGHT_POSITION:trajectory.RIGHT_ACCELERATION + 1]
+            row[trajectory.LEFT_POSITION:trajectory.LEFT_ACCELERATION + 1] = [-value for value in right]
+            row[trajectory.RIGHT_POSITION:trajectory.RIGHT_ACCELERATION + 1] = [-value for value in left]
+    return rows
+
+
+def build(paths=PATHS):
+    ''' Generates every path. Returns a list of (name, reversed, samples) for trajectory.write(). '''
+    library = []
+    for name in sorted(paths):
+        path = paths[name]
+        reversed = path.get('reversed', False)
+        samples = generate(path['waypoints'], path['maxVelocity'], path['maxAcceleration'], reversed)
+        library.append((name, reversed, samples))
+    return library
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the trajectory library.')
+    parser.add_argument('-o', '--output', default=trajectory.DEFAULT_PATH, help='library file')
+    args = parser.parse_args(argv)
+
+    library = build()
+    trajectory.write(args.output, library)
+    for name, reversed, samples in library:
+        print('%-24s %5.2f s  %4d samples%s' % (name, (len(samples) - 1) * trajectory.DT, len(samples),
+                                                 '  reversed' if reversed else ''))
+    print('wrote %s' % args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
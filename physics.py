@@ -3,39 +3,205 @@
 #
 
 
+from math import cos, radians
+
+from hal_impl.data import NotifyDict
 from pyfrc.physics import drivetrains
 
+from robotmap import COUNTS_PER_INCH, HIGH_GEAR, LEFT_ENCODER_SIGN, RIGHT_ENCODER_SIGN, TRACK_WIDTH, \
+    WHEEL_CIRCUMFERENCE
+
+
+# drive train Talon SRX CAN ids (see robot.py)
+LEFT_FRONT, LEFT_REAR = 1, 2
+RIGHT_REAR, RIGHT_FRONT = 3, 4
+
+# drive train geometry
+WHEELBASE_FT = TRACK_WIDTH / 12.0
+
+# two-speed gearbox: motor free speed (rpm) and motor:wheel ratio in each gear
+MOTOR_FREE_RPM = 5330.0
+HIGH_GEAR_RATIO = 7.0
+LOW_GEAR_RATIO = 15.0
+
+# gear shift solenoid (DoubleSolenoidOne), forward channel = high speed
+SHIFT_FORWARD_CHANNEL = 0
+
+# hal_data['CAN'] key of a Victor SPX, see VictorKeyedCAN
+VICTOR_KEY = 'Victor %d'
+
+# lift: Victor SPX CAN id, encoder on DIO 8/9, Hall effect sensor on DIO 7
+LIFT_CAN_ID = VICTOR_KEY % 1
+LIFT_ENCODER_CHANNEL = 8
+HALL_CHANNEL = 7
+LIFT_MAX_SPEED = 900.0      # counts/s at full output
+LIFT_HOLD_OUTPUT = 0.05     # output that balances gravity
+LIFT_TOP = 450              # counts at the top of travel
+HALL_WINDOW = 3             # Hall sensor reads True within this many counts of the bottom
+
+# four-bar: Victor SPX CAN id, encoder on DIO 5/6
+FOUR_BAR_CAN_ID = VICTOR_KEY % 3
+FOUR_BAR_ENCODER_CHANNEL = 5
+FOUR_BAR_COUNTS_PER_DEGREE = 2048 / 360.0   # encoder cycles, the unit Encoder.get() counts in
+FOUR_BAR_MAX_SPEED = 300.0      # deg/s at full output
+FOUR_BAR_HOLD_OUTPUT = 0.1      # output that holds the arm horizontal against gravity
+FOUR_BAR_START = 90.0           # deg, stowed upright, where the encoder reads 0
+FOUR_BAR_STOPS = (-40.0, 100.0) # hard stops (deg)
+
+
+def find_encoder(hal_data, channel):
+    ''' Index of the hal encoder whose A channel is on a DIO, or None. '''
+    for index, encoder in enumerate(hal_data['encoder']):
+        if not encoder.get('initialized'):
+            continue
+        source = encoder.get('config', {}).get('ASource')
+        if source is not None and source.get('channel') == channel:
+            return index
+    return None
+
+
+class VictorKeyedCAN(NotifyDict):
+    '''
+       The simulator keys CAN devices by device number only, so a Victor SPX
+       replaces the drive Talon SRX with the same number. This keeps the
+       Victors under their own keys (VICTOR_KEY) instead.
+    '''
+
+    def __setitem__(self, key, value):
+        if isinstance(key, int) and isinstance(value, dict) and value.get('type') == 'victorspx':
+            key = VICTOR_KEY % key
+        super().__setitem__(key, value)
+
 
 class PhysicsEngine(object):
     '''
-       Simulates a 4-wheel robot using Tank Drive joystick control 
+       Simulates a 4-wheel, two-speed tank drive robot on CAN Talon SRXs,
+       plus the lift encoder and its Hall effect sensor, and the four-bar encoder.
     '''
-    
-    
+
+
     def __init__(self, physics_controller):
         '''
             :param physics_controller: `pyfrc.physics.core.Physics` object
                                        to communicate simulation effects to
         '''
-        
+
         self.physics_controller = physics_controller
         self.physics_controller.add_analog_gyro_channel(1)
-            
+
+        # wheel distance travelled per side (in)
+        self.left_distance = 0.0
+        self.right_distance = 0.0
+
+        # lift position (counts)
+        self.lift_position = 0.0
+        self.lift_offset = 0.0
+        self.lift_count = 0
+        self.lift_encoder = None
+
+        # four-bar angle (deg, 0 = horizontal)
+        self.four_bar_angle = FOUR_BAR_START
+        self.four_bar_encoder = None
+
+    def initialize(self, hal_data):
+        ''' Called before the robot is created: keeps its Victor SPXs apart from its Talon SRXs. '''
+        hal_data['CAN'] = VictorKeyedCAN(hal_data['CAN'])
+
     def update_sim(self, hal_data, now, tm_diff):
         '''
             Called when the simulation parameters for the program need to be
             updated.
-            
+
             :param now: The current time as a float
             :param tm_diff: The amount of time that has passed since the last
                             time that this function was called
         '''
-        
+
+        can = hal_data['CAN']
+        if RIGHT_FRONT not in can:
+            return  # robot hasn't created its motors yet
+
         # Simulate the drivetrain
-        lr_motor = hal_data['pwm'][1]['value']
-        rr_motor = hal_data['pwm'][2]['value']
-        lf_motor = hal_data['pwm'][3]['value']
-        rf_motor = hal_data['pwm'][4]['value']
-        
-        speed, rotation = drivetrains.four_motor_drivetrain(lr_motor, rr_motor, lf_motor, rf_motor)
+        lf_motor = can[LEFT_FRONT]['value']
+        lr_motor = can[LEFT_REAR]['value']
+        rf_motor = can[RIGHT_FRONT]['value']
+        rr_motor = can[RIGHT_REAR]['value']
+
+        # top speed (ft/s) of the current gear
+        if hal_data['solenoid'][SHIFT_FORWARD_CHANNEL]['value']:
+            ratio = HIGH_GEAR_RATIO
+        else:
+            ratio = LOW_GEAR_RATIO
+        top_speed = MOTOR_FREE_RPM / 60.0 / ratio * WHEEL_CIRCUMFERENCE / 12.0
+
+        speed, rotation = drivetrains.four_motor_drivetrain(lr_motor, rr_motor, lf_motor, rf_motor,
+                                                            x_wheelbase=WHEELBASE_FT, speed=top_speed)
         self.physics_controller.drive(speed, rotation, tm_diff)
+
+        # wheel speeds (in/s, forward positive), the right side is inverted by DifferentialDrive
+        left_speed = (lf_motor + lr_motor) * 0.5 * top_speed * 12.0
+        right_speed = -(rf_motor + rr_motor) * 0.5 * top_speed * 12.0
+        self.left_distance += left_speed * tm_diff
+        self.right_distance += right_speed * tm_diff
+
+        # encoder feedback into the leading Talons, counting the way the real encoders do
+        self._update_talon(can[LEFT_FRONT], LEFT_ENCODER_SIGN * self.left_distance, LEFT_ENCODER_SIGN * left_speed)
+        self._update_talon(can[RIGHT_FRONT], RIGHT_ENCODER_SIGN * self.right_distance,
+                           RIGHT_ENCODER_SIGN * right_speed)
+
+        # Simulate the lift and the four-bar
+        self._update_lift(hal_data, can, tm_diff)
+        self._update_four_bar(hal_data, can, tm_diff)
+
+    def _update_talon(self, talon, distance, speed):
+        ''' Writes wheel distance (in) and speed (in/s) as quadrature counts. '''
+        counts_per_inch = COUNTS_PER_INCH[HIGH_GEAR]
+        talon['quad_position'] = int(distance * counts_per_inch)
+        talon['quad_velocity'] = int(speed * counts_per_inch / 10.0)   # counts per 100 ms
+
+    def _update_lift(self, hal_data, can, tm_diff):
+        if self.lift_encoder is None:
+            self.lift_encoder = find_encoder(hal_data, LIFT_ENCODER_CHANNEL)
+            if self.lift_encoder is None:
+                return
+
+        output = can[LIFT_CAN_ID]['value'] if LIFT_CAN_ID in can else 0.0
+
+        # holding output balances gravity, anything less drifts down
+        velocity = (output - LIFT_HOLD_OUTPUT) * LIFT_MAX_SPEED
+        self.lift_position += velocity * tm_diff
+        if self.lift_position <= 0:
+            self.lift_position, velocity = 0.0, 0.0
+        elif self.lift_position >= LIFT_TOP:
+            self.lift_position, velocity = float(LIFT_TOP), 0.0
+
+        # counts are relative to the last reset; a count we didn't write means the robot reset it
+        encoder = hal_data['encoder'][self.lift_encoder]
+        if encoder['count'] != self.lift_count:
+            self.lift_offset = self.lift_position - encoder['count']
+        self.lift_count = int(self.lift_position - self.lift_offset)
+        encoder['count'] = self.lift_count
+        encoder['rate'] = velocity
+
+        hal_data['dio'][HALL_CHANNEL]['value'] = self.lift_position <= HALL_WINDOW
+
+    def _update_four_bar(self, hal_data, can, tm_diff):
+        if self.four_bar_encoder is None:
+            self.four_bar_encoder = find_encoder(hal_data, FOUR_BAR_ENCODER_CHANNEL)
+            if self.four_bar_encoder is None:
+                return
+
+        output = can[FOUR_BAR_CAN_ID]['value'] if FOUR_BAR_CAN_ID in can else 0.0
+
+        # positive output raises the arm, gravity pulls it down hardest when horizontal
+        velocity = (output - FOUR_BAR_HOLD_OUTPUT * cos(radians(self.four_bar_angle))) * FOUR_BAR_MAX_SPEED
+        self.four_bar_angle += velocity * tm_diff
+        low, high = FOUR_BAR_STOPS
+        if self.four_bar_angle <= low:
+            self.four_bar_angle, velocity = low, 0.0
+        elif self.four_bar_angle >= high:
+            self.four_bar_angle, velocity = high, 0.0
+
+        encoder = hal_data['encoder'][self.four_bar_encoder]
+        encoder['count'] = int((self.four_bar_angle - FOUR_BAR_START) * FOUR_BAR_COUNTS_PER_DEGREE)
+        encoder['rate'] = velocity * FOUR_BAR_COUNTS_PER_DEGREE
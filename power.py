@@ -0,0 +1,244 @@
+'''
+Brownout-aware power manager.
+
+A Notifier samples the battery voltage (read by the roboRIO) at a steady
+rate, and the PDP total current every few samples: the PDP only sends a
+new status frame about every 25 ms, so reading it faster costs CAN reads
+for the same value. It predicts the voltage a
+short time ahead two ways and takes the lower one: from the filtered
+voltage and its trend, and from the rising current draw times the battery
+and wiring resistance. The resistance is estimated from how far the voltage
+drops when the current steps up. Loads are shed
+in priority order as the prediction sags, well before the roboRIO's 6.8 V
+brownout: first the compressor's closed-loop control is paused, then the
+lift and four-bar are capped, and only then is the drive output scaled
+down. Loads come back when the prediction has recovered for a while.
+
+The driver's compressor start / stop goes through setCompressor(), so a
+stop while the compressor is paused is still honored when it would resume.
+
+The 16 PDP channel currents are for the match log and dashboard only. They
+are read once per robot loop with readChannels(), not by the Notifier.
+'''
+
+import threading
+
+import wpilib
+
+# sample period (s)
+PERIOD = 0.01
+
+# voltage prediction horizon (s) and filter constants
+LOOKAHEAD = 0.1
+VOLTAGE_FILTER = 0.3
+SLOPE_FILTER = 0.2
+CURRENT_FILTER = 0.3
+
+# battery + wiring resistance (ohm): starting estimate, plausible range, and the filter
+# and smallest current step (A) used to refine it from voltage drop / current rise
+RESISTANCE = 0.02
+MIN_RESISTANCE, MAX_RESISTANCE = 0.005, 0.1
+RESISTANCE_FILTER = 0.05
+RESISTANCE_STEP = 5.0
+
+# the PDP total current is read every PDP_SAMPLES samples (30 ms), no faster than its
+# status frames arrive (about every 25 ms)
+PDP_SAMPLES = 3
+
+# shedding stages: predicted voltage below which each stage starts
+COMPRESSOR_VOLTAGE = 9.5
+MECHANISM_VOLTAGE = 8.5
+DRIVE_VOLTAGE = 8.0
+
+# a stage ends once the prediction stays this far above its start voltage for RECOVERY_TIME (s)
+HYSTERESIS = 0.5
+RECOVERY_TIME = 0.5
+
+# lift / four-bar output cap while shedding
+MECHANISM_LIMIT = 0.4
+
+# drive output scale: 1.0 at DRIVE_VOLTAGE down to DRIVE_MIN_SCALE at DRIVE_MIN_VOLTAGE,
+# recovering at most DRIVE_RECOVERY per second
+DRIVE_MIN_VOLTAGE = 7.0
+DRIVE_MIN_SCALE = 0.6
+DRIVE_RECOVERY = 1.0
+
+# stages, in shedding order
+NORMAL, COMPRESSOR, MECHANISMS, DRIVE = range(4)
+STAGE_NAMES = ('Normal', 'Compressor Paused', 'Mechanisms Capped', 'Drive Scaled')
+STAGE_VOLTAGES = (None, COMPRESSOR_VOLTAGE, MECHANISM_VOLTAGE, DRIVE_VOLTAGE)
+
+
+class PowerManager(object):
+    ''' Predicts brownouts from the battery voltage and sheds load by priority. '''
+
+    def __init__(self, pdp, compressor, drive, lift, fourBar, period=PERIOD, start=True):
+        '''
+            :param pdp: PowerDistributionPanel
+            :param compressor: Compressor, closed-loop control is paused while shedding
+            :param drive: DifferentialDrive, its max output is scaled
+            :param lift: lift.Lift, capped with setOutputLimit
+            :param fourBar: fourbar.FourBar, capped with setOutputLimit
+            :param start: False leaves the Notifier stopped, samples are then passed to sample()
+        '''
+        self.pdp = pdp
+        self.compressor = compressor
+        self.drive = drive
+        self.lift = lift
+        self.fourBar = fourBar
+        self.period = period
+        self.lock = threading.Lock()
+
+        self.voltage = None
+        self.batteryVoltage = 12.0
+        self.slope = 0.0
+        self.predicted = 12.0
+        self.current = 0.0
+        self.currents = [0.0] * 16
+        self.samples = 0
+
+        # battery voltage at the last PDP sample, to pair with a current step
+        self.currentVoltage = 12.0
+
+        # filtered total current (A), its trend (A/s) and the resistance estimate (ohm)
+        self.filteredCurrent = None
+        self.currentSlope = 0.0
+        self.resistance = RESISTANCE
+
+        self.stage = NORMAL
+        self.recoveredSince = None
+        self.driveScale = 1.0
+        self.minVoltage = 13.0
+
+        # compressor closed-loop control the driver wants, restored after a pause
+        self.pausedCompressor = False
+        self.compressorWanted = compressor.getClosedLoopControl()
+
+        self.notifier = wpilib.Notifier(self.update)
+        if start:
+            self.notifier.startPeriodic(period)
+
+    def readChannels(self):
+        ''' Reads the 16 PDP channel currents, once per robot loop. '''
+        pdp, currents = self.pdp, self.currents
+        for channel in range(16):
+            currents[channel] = pdp.getCurrent(channel)
+
+    def update(self):
+        ''' One sample, run by the Notifier. '''
+        voltage = wpilib.RobotController.getBatteryVoltage()
+        now = wpilib.Timer.getFPGATimestamp()
+        current = self.pdp.getTotalCurrent() if self.samples % PDP_SAMPLES == 0 else None
+        self.samples += 1
+        self.sample(now, voltage, current)
+
+    def sample(self, now, voltage, current=None):
+        '''
+            Updates the prediction and the shedding stage.
+
+            :param voltage: battery voltage (V)
+            :param current: PDP total current (A), or None if it wasn't read this sample
+        '''
+        self.batteryVoltage = voltage
+        if current is not None:
+            lastVoltage, lastCurrent = self.currentVoltage, self.current
+            self.current, self.currentVoltage = current, voltage
+
+        with self.lock:
+            if self.voltage is None:
+                self.voltage = voltage
+            previous = self.voltage
+            self.voltage += VOLTAGE_FILTER * (voltage - self.voltage)
+            self.slope += SLOPE_FILTER * ((self.voltage - previous) / self.period - self.slope)
+
+            if current is not None:
+                first = self.filteredCurrent is None
+                if first:
+                    self.filteredCurrent = current
+                dt = self.period * PDP_SAMPLES
+                previous = self.filteredCurrent
+                self.filteredCurrent += CURRENT_FILTER * (current - self.filteredCurrent)
+                self.currentSlope += SLOPE_FILTER * ((self.filteredCurrent - previous) / dt - self.currentSlope)
+
+                # a current step shows the resistance the battery sags through
+                step = current - lastCurrent
+                if not first and abs(step) >= RESISTANCE_STEP:
+                    resistance = (lastVoltage - voltage) / step
+                    if MIN_RESISTANCE <= resistance <= MAX_RESISTANCE:
+                        self.resistance += RESISTANCE_FILTER * (resistance - self.resistance)
+
+            # only falling voltage and rising current are extrapolated, a recovery is not trusted yet
+            fromVoltage = self.voltage + min(self.slope, 0.0) * LOOKAHEAD
+            fromCurrent = self.voltage - self.resistance * max(self.currentSlope, 0.0) * LOOKAHEAD
+            self.predicted = min(fromVoltage, fromCurrent)
+            self.minVoltage = min(self.minVoltage, voltage)
+
+            self._updateStage(now)
+            self._apply()
+
+    def _updateStage(self, now):
+        predicted = self.predicted
+
+        # worse: shed at once
+        stage = self.stage
+        while stage < DRIVE and predicted < STAGE_VOLTAGES[stage + 1]:
+            stage += 1
+        if stage != self.stage:
+            self.stage = stage
+            self.recoveredSince = None
+            return
+
+        # better: only after the prediction has held above the stage for a while
+        if self.stage != NORMAL and predicted > STAGE_VOLTAGES[self.stage] + HYSTERESIS:
+            if self.recoveredSince is None:
+                self.recoveredSince = now
+            elif now - self.recoveredSince >= RECOVERY_TIME:
+                self.stage -= 1
+                self.recoveredSince = None
+        else:
+            self.recoveredSince = None
+
+    def setCompressor(self, enabled):
+        ''' Driver / robot request to start or stop the compressor, deferred while it is paused. '''
+        with self.lock:
+            self.compressorWanted = enabled
+            if not self.pausedCompressor:
+                self.compressor.setClosedLoopControl(enabled)
+
+    def _apply(self):
+        stage = self.stage
+
+        # compressor: paused whatever is requested meanwhile, then put back the way it was last wanted
+        if stage >= COMPRESSOR:
+            if not self.pausedCompressor:
+                self.compressorWanted = self.compressor.getClosedLoopControl()
+                self.pausedCompressor = True
+            if self.compressor.getClosedLoopControl():
+                self.compressor.setClosedLoopControl(False)
+        elif self.pausedCompressor:
+            self.compressor.setClosedLoopControl(self.compressorWanted)
+            self.pausedCompressor = False
+
+        limit = MECHANISM_LIMIT if stage >= MECHANISMS else 1.0
+        self.lift.setOutputLimit(limit)
+        self.fourBar.setOutputLimit(limit)
+
+        # drive: scaled with the prediction, drops at once and recovers gradually
+        if stage >= DRIVE:
+            span = (self.predicted - DRIVE_MIN_VOLTAGE) / (DRIVE_VOLTAGE - DRIVE_MIN_VOLTAGE)
+            target = DRIVE_MIN_SCALE + (1.0 - DRIVE_MIN_SCALE) * max(0.0, min(1.0, span))
+        else:
+            target = 1.0
+        if target < self.driveScale:
+            self.driveScale = target
+        else:
+            self.driveScale = min(target, self.driveScale + DRIVE_RECOVERY * self.period)
+        self.drive.setMaxOutput(self.driveScale)
+
+    def publish(self, telemetry):
+        telemetry.putString("Power Stage: ", STAGE_NAMES[self.stage])
+        telemetry.putNumber("Predicted Voltage: ", round(self.predicted, 2))
+        telemetry.putNumber("Total Current: ", round(self.current, 1))
+        telemetry.putNumber("Battery Resistance (mOhm): ", round(self.resistance * 1000.0, 1))
+        telemetry.putNumber("Drive Scale: ", round(self.driveScale, 2))
+        telemetry.putNumber("Min Voltage: ", round(self.minVoltage, 2))
@@ -0,0 +1,184 @@
+'''
+Loop timing profiler for the TimedRobot periodic methods, and a startup
+profiler for robotInit.
+
+Each named section records its execution time into a preallocated ring
+buffer, so timing a section never allocates. Percentiles are only computed
+when the summary is published, once every publishPeriod loops.
+'''
+
+import time
+import logging
+from array import array
+
+logger = logging.getLogger('profiler')
+
+
+class Section(object):
+    ''' One timed region of the loop, used as a reusable context manager. '''
+
+    __slots__ = ('name', 'samples', 'size', 'cursor', 'count', 'start')
+
+    def __init__(self, name, size):
+        self.name = name
+        self.samples = array('d', bytes(8 * size))
+        self.size = size
+        self.cursor = 0
+        self.count = 0
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record(time.perf_counter() - self.start)
+        return False
+
+    def record(self, elapsed):
+        ''' Stores one timing sample, overwriting the oldest one when full. '''
+        self.samples[self.cursor] = elapsed
+        self.cursor += 1
+        if self.cursor == self.size:
+            self.cursor = 0
+        if self.count < self.size:
+            self.count += 1
+
+    def last(self):
+        ''' Most recent sample in seconds, 0 if there is none. '''
+        if self.count == 0:
+            return 0.0
+        return self.samples[self.cursor - 1]
+
+    def stats(self):
+        ''' Returns (p50, p99, max) of the buffered samples in seconds. '''
+        if self.count == 0:
+            return 0.0, 0.0, 0.0
+        ordered = sorted(self.samples[:self.count])
+        last = self.count - 1
+        return ordered[last // 2], ordered[(last * 99) // 100], ordered[last]
+
+    def clear(self):
+        self.cursor = 0
+        self.count = 0
+
+
+class LoopProfiler(object):
+    ''' Times named sections of the robot loop and counts loop overruns. '''
+
+    def __init__(self, names, period=0.02, size=512, publishPeriod=50):
+        '''
+            :param names: section names that will be timed
+            :param period: loop period in seconds, used to count overruns
+            :param size: samples kept per section
+            :param publishPeriod: loops between dashboard summaries
+        '''
+        self.period = period
+        self.publishPeriod = publishPeriod
+        self.sections = {}
+        for name in names:
+            self.sections[name] = Section(name, size)
+        self.loop = Section('loop', size)
+
+        self.loopStart = None
+        self.loops = 0
+        self.overruns = 0
+
+    def section(self, name):
+        ''' Returns the preallocated timer for a section. '''
+        return self.sections[name]
+
+    def beginLoop(self):
+        ''' Marks the start of one robot loop. '''
+        self.loopStart = time.perf_counter()
+
+    def endLoop(self):
+        ''' Marks the end of a loop started with beginLoop(). Returns True if it overran. '''
+        if self.loopStart is None:
+            return False
+
+        elapsed = time.perf_counter() - self.loopStart
+        self.loopStart = None
+        self.loop.record(elapsed)
+        self.loops += 1
+
+        if elapsed > self.period:
+            self.overruns += 1
+            return True
+        return False
+
+    def publishDue(self):
+        ''' True once every publishPeriod loops. '''
+        return self.loops > 0 and self.loops % self.publishPeriod == 0
+
+    def publish(self, telemetry):
+        ''' Sends p50/p99/max in milliseconds for every section, plus the overrun count. '''
+        for timer in self._timers():
+            p50, p99, worst = timer.stats()
+            telemetry.putNumber("Loop %s p50 (ms): " % timer.name, round(p50 * 1000, 2))
+            telemetry.putNumber("Loop %s p99 (ms): " % timer.name, round(p99 * 1000, 2))
+            telemetry.putNumber("Loop %s max (ms): " % timer.name, round(worst * 1000, 2))
+        telemetry.putNumber("Loop Overruns: ", self.overruns)
+
+    def report(self):
+        ''' Returns a plain text summary table, e.g. for the simulator console. '''
+        lines = ['%-12s %8s %8s %8s %6s' % ('section', 'p50 ms', 'p99 ms', 'max ms', 'n')]
+        for timer in self._timers():
+            p50, p99, worst = timer.stats()
+            lines.append('%-12s %8.3f %8.3f %8.3f %6d' % (timer.name, p50 * 1000, p99 * 1000, worst * 1000, timer.count))
+        lines.append('overruns: %d of %d loops' % (self.overruns, self.loops))
+        return '\n'.join(lines)
+
+    def log(self):
+        logger.info('loop timing\n%s', self.report())
+
+    def reset(self):
+        for timer in self._timers():
+            timer.clear()
+        self.loopStart = None
+        self.loops = 0
+        self.overruns = 0
+
+    def _timers(self):
+        yield self.loop
+        for name in self.sections:
+            yield self.sections[name]
+
+
+class StartupProfiler(object):
+    ''' Times the stages of robotInit, for a report once the robot code is ready. '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.stages = []
+
+        # CPU time the interpreter used before robotInit, mostly imports
+        self.beforeInit = time.process_time()
+
+    def mark(self, name):
+        ''' Ends a stage, which began at the previous mark (or when the profiler was made). '''
+        now = time.perf_counter()
+        self.stages.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        ''' Seconds from the start of robotInit to the last mark. '''
+        return self.last - self.start
+
+    def report(self):
+        ''' Returns a plain text table of the stages. '''
+        lines = ['%-16s %8s' % ('stage', 'ms'),
+                 '%-16s %8.1f' % ('before init cpu', self.beforeInit * 1000)]
+        for name, elapsed in self.stages:
+            lines.append('%-16s %8.1f' % (name, elapsed * 1000))
+        lines.append('%-16s %8.1f' % ('robotInit', self.total() * 1000))
+        return '\n'.join(lines)
+
+    def log(self):
+        logger.info('startup timing\n%s', self.report())
+
+    def publish(self, telemetry):
+        for name, elapsed in self.stages:
+            telemetry.putNumber("Startup %s (ms): " % name, round(elapsed * 1000, 1))
+        telemetry.putNumber("Startup Time (ms): ", round(self.total() * 1000, 1))
@@ -0,0 +1,101 @@
+'''
+Filtered ultrasonic range sensing.
+
+The FPGA averages and oversamples the analog inputs in hardware, so each
+getAverageVoltage() is already the mean of many samples at no cost to the
+loop. On top of that, the last few readings are kept in a small ring
+buffer: their median rejects single-sample spikes (echoes, crosstalk) and
+an exponential filter smooths what is left. The filtered voltage is turned
+into a calibrated distance, with a confidence from how much the recent
+readings agree and whether they are inside the sensor's range.
+'''
+
+from array import array
+
+# FPGA averaging: each reading is the mean of 2 ** (AVERAGE_BITS + OVERSAMPLE_BITS) samples
+AVERAGE_BITS = 4
+OVERSAMPLE_BITS = 2
+
+# readings in the median window, and the exponential filter constant after it
+MEDIAN_WINDOW = 5
+FILTER = 0.4
+
+# calibration, distance = (voltage - offset) * inches per volt. MaxBotix LV sensors give
+# Vcc / 512 per inch; measure against a tape to refine.
+INCHES_PER_VOLT = 512 / 5.0
+OFFSET = 0.0
+
+# distances the sensor can measure (in)
+MIN_RANGE = 6.0
+MAX_RANGE = 254.0
+
+# spread of the middle readings of the window (in) at which the confidence reaches 0
+SPREAD_LIMIT = 2.0
+
+# confidence a reading needs to count as in a placing range
+MIN_CONFIDENCE = 0.5
+
+
+class RangeFinder(object):
+    ''' One ultrasonic on an analog input: filtered voltage, distance and confidence. '''
+
+    def __init__(self, name, analogInput, inchesPerVolt=INCHES_PER_VOLT, offset=OFFSET):
+        '''
+            :param name: dashboard name
+            :param analogInput: wpilib AnalogInput, its FPGA averaging is configured here
+        '''
+        self.name = name
+        self.inchesPerVolt = inchesPerVolt
+        self.offset = offset
+        analogInput.setAverageBits(AVERAGE_BITS)
+        analogInput.setOversampleBits(OVERSAMPLE_BITS)
+
+        # recent readings ring buffer
+        self.window = array('d', bytes(8 * MEDIAN_WINDOW))
+        self.cursor = 0
+        self.count = 0
+
+        self.voltage = 0.0
+        self.distance = 0.0
+        self.confidence = 0.0
+
+        self.rangeKey = "%s Range (in): " % name
+        self.confidenceKey = "%s Confidence: " % name
+
+    def update(self, voltage):
+        ''' Adds this loop's (FPGA averaged) voltage. '''
+        if self.count == 0:
+            self.voltage = voltage
+        window = self.window
+        window[self.cursor] = voltage
+        self.cursor = (self.cursor + 1) % MEDIAN_WINDOW
+        if self.count < MEDIAN_WINDOW:
+            self.count += 1
+
+        recent = sorted(window[:self.count])
+        median = recent[self.count // 2]
+        self.voltage += FILTER * (median - self.voltage)
+        self.distance = (self.voltage - self.offset) * self.inchesPerVolt
+
+        if MIN_RANGE <= self.distance <= MAX_RANGE:
+            # spread of the middle readings, one spike doesn't cost confidence
+            trim = self.count // 4
+            spread = (recent[self.count - 1 - trim] - recent[trim]) * self.inchesPerVolt
+            confidence = max(0.0, 1.0 - spread / SPREAD_LIMIT)
+            # fewer readings than the window: not trusted as much yet
+            self.confidence = confidence * self.count / MEDIAN_WINDOW
+        else:
+            self.confidence = 0.0
+
+    def inRange(self, window):
+        ''' True when the filtered voltage is confidently inside a (low, high) voltage window. '''
+        return window[0] <= self.voltage <= window[1] and self.confidence >= MIN_CONFIDENCE
+
+    def reset(self):
+        self.cursor = 0
+        self.count = 0
+        self.confidence = 0.0
+
+    def publish(self, telemetry):
+        telemetry.putNumber(self.rangeKey, round(self.distance, 1))
+        telemetry.putNumber(self.confidenceKey, round(self.confidence, 2))
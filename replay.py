@@ -0,0 +1,268 @@
+'''
+Match log replay.
+
+Feeds a match log recorded by matchlog.py back through MyRobot on pyfrc's
+simulated clock: joystick axes, button bitmasks, the game specific message,
+the dashboard drive and shift mode selections and the logged sensor values
+(drive Talon quadrature and output current, lift and four-bar encoders, Hall
+effect sensor, ultrasonics, gyro, battery voltage and PDP currents) are
+written into the simulated HAL every loop. physics.py is not loaded, so the sensors only ever show what
+the real robot saw. The motor outputs the code produces are diffed against
+the ones in the log, which shows where changed control code behaves
+differently on real match input.
+
+    python replay.py logs/match_20190302_141503.gemlog
+    python replay.py -j 4 --json diffs.json logs/*.gemlog
+'''
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+import simrunner
+from matchlog import readLog
+from physics import find_encoder
+from robotmap import LEFT_ENCODER_SIGN, RIGHT_ENCODER_SIGN
+
+AUTO_LENGTH = simrunner.AUTO_LENGTH
+MATCH_LENGTH = simrunner.MATCH_LENGTH
+
+# logged output field -> attribute of the robot's speed controller
+OUTPUTS = (
+    ('frontLeft', 'frontLeftMotor'),
+    ('rearLeft', 'rearLeftMotor'),
+    ('frontRight', 'frontRightMotor'),
+    ('rearRight', 'rearRightMotor'),
+    ('lift', 'liftOne'),
+    ('liftArm', 'liftArmOne'),
+    ('cargo', 'cargo'),
+)
+
+# logs store outputs as float32
+TOLERANCE = 1e-3
+
+# logged axes per joystick port
+AXES = (
+    (0, ('leftX', 'leftY', 'leftZ')),
+    (1, ('rightX', 'rightY', 'rightZ')),
+    (2, ('xbox0', 'xbox1', 'xbox2', 'xbox3', 'xbox4', 'xbox5')),
+)
+BUTTONS = ((0, 'leftButtons'), (1, 'rightButtons'), (2, 'xboxButtons'), (3, 'buttonBoxButtons'))
+
+# drive Talons carrying the encoders, and DIO / analog channels of the replayed sensors
+LEFT_TALON, RIGHT_TALON = 'frontLeftMotor', 'frontRightMotor'
+LIFT_ENCODER_CHANNEL, LIFT_ARM_ENCODER_CHANNEL = 8, 5
+HALL_CHANNEL = 7
+ULTRASONIC_CHANNEL, CARGO_ULTRASONIC_CHANNEL = 2, 3
+GYRO_CHANNEL = 1
+PDP_MODULE = 0
+
+
+def match_times(log):
+    '''
+        Practice match time of every record: autonomous records start at 0,
+        teleop records at AUTO_LENGTH, just like on the field.
+    '''
+    import numpy as np
+
+    times = np.full(len(log), -1.0)
+    for mode, offset in ((1, 0.0), (2, AUTO_LENGTH)):
+        selected = log['mode'] == mode
+        if selected.any():
+            stamps = log['timestamp'][selected]
+            times[selected] = offset + stamps - stamps[0]
+    return times
+
+# dashboard choosers replaced by the logged selection: (log field, robot attribute)
+CHOOSERS = (('driveMode', 'driveModeChooser'), ('shiftMode', 'shiftModeChooser'))
+
+
+class Selection(object):
+    ''' Stands in for a SendableChooser, answering with the selection from the log. '''
+
+    def __init__(self):
+        self.value = None
+
+    def getSelected(self):
+        return self.value
+
+
+class Replayer(object):
+    ''' Applies one log record per simulated loop and diffs the outputs of the previous one. '''
+
+    def __init__(self, log, robot, hal_data):
+        self.log = log
+        self.robot = robot
+        self.hal_data = hal_data
+        self.times = match_times(log)
+        self.order = [index for index in self.times.argsort() if self.times[index] >= 0]
+        self.next = 0
+        self.applied = None
+
+        self.encoders = None
+        self.selections = None
+        self.mismatches = dict((field, 0) for field, _ in OUTPUTS)
+        self.maxError = dict((field, 0.0) for field, _ in OUTPUTS)
+        self.firstDivergence = None
+        self.compared = 0
+
+    def __call__(self, tm):
+        # outputs produced by the loop that ran on the last applied record
+        if self.applied is not None:
+            self._compare(self.applied)
+            self.applied = None
+
+        while self.next < len(self.order) and self.times[self.order[self.next]] <= tm:
+            self.applied = self.order[self.next]
+            self.next += 1
+        if self.applied is not None:
+            self._apply(self.log[self.applied])
+
+        return self.next < len(self.order) and tm < MATCH_LENGTH
+
+    def _apply(self, record):
+        hal_data = self.hal_data
+
+        # driver station
+        for port, names in AXES:
+            axes = hal_data['joysticks'][port]['axes']
+            for axis, name in enumerate(names):
+                axes[axis] = float(record[name])
+        for port, name in BUTTONS:
+            mask = int(record[name])
+            buttons = hal_data['joysticks'][port]['buttons']
+            for button in range(1, len(buttons)):
+                buttons[button] = bool(mask & (1 << (button - 1)))
+        hal_data['event']['game_specific_message'] = record['gameMessage'].decode().rstrip('\0')
+
+        # dashboard choosers, swapped out once robotInit has built them
+        if self.selections is None:
+            self.selections = []
+            for field, attribute in CHOOSERS:
+                selection = Selection()
+                setattr(self.robot, attribute, selection)
+                self.selections.append((field, selection))
+        for field, selection in self.selections:
+            selection.value = record[field].decode().rstrip('\0') or None
+
+        # sensors, into each Talon's own sim data: without physics.py, hal_data['CAN'] keys the
+        # Victor SPX with the same device number over it
+        left = getattr(self.robot, LEFT_TALON).hal_data
+        right = getattr(self.robot, RIGHT_TALON).hal_data
+        # the log has counts forward positive, the Talons count the way the encoders are mounted
+        left['quad_position'] = LEFT_ENCODER_SIGN * int(record['leftPosition'])
+        left['quad_velocity'] = LEFT_ENCODER_SIGN * int(record['leftVelocity'])
+        right['quad_position'] = RIGHT_ENCODER_SIGN * int(record['rightPosition'])
+        right['quad_velocity'] = RIGHT_ENCODER_SIGN * int(record['rightVelocity'])
+        left['output_current'] = float(record['leftCurrent'])
+        right['output_current'] = float(record['rightCurrent'])
+
+        if self.encoders is None:
+            self.encoders = (find_encoder(hal_data, LIFT_ENCODER_CHANNEL),
+                             find_encoder(hal_data, LIFT_ARM_ENCODER_CHANNEL))
+        for index, name in zip(self.encoders, ('liftCount', 'liftArmCount')):
+            if index is not None:
+                hal_data['encoder'][index]['count'] = int(record[name])
+
+        hal_data['dio'][HALL_CHANNEL]['value'] = bool(record['hall'])
+        for channel, name in ((ULTRASONIC_CHANNEL, 'ultrasonicVoltage'),
+                              (CARGO_ULTRASONIC_CHANNEL, 'cargoUltrasonicVoltage')):
+            # the robot reads the FPGA average
+            hal_data['analog_in'][channel]['voltage'] = float(record[name])
+            hal_data['analog_in'][channel]['avg_voltage'] = float(record[name])
+        hal_data['analog_gyro'][GYRO_CHANNEL]['angle'] = float(record['gyroAngle'])
+
+        # power, so the power manager sheds load the way it did on the field
+        hal_data['power']['vin_voltage'] = float(record['batteryVoltage'])
+        pdp = hal_data['pdp'][PDP_MODULE]
+        pdp['current'][:] = [float(record['pdp%d' % channel]) for channel in range(16)]
+        pdp['voltage'] = float(record['batteryVoltage'])
+        pdp['total_current'] = float(record['totalCurrent'])
+
+    def _compare(self, index):
+        record = self.log[index]
+        diverged = False
+        for field, attribute in OUTPUTS:
+            error = abs(getattr(self.robot, attribute).get() - float(record[field]))
+            if error > TOLERANCE:
+                self.mismatches[field] += 1
+                diverged = True
+            if error > self.maxError[field]:
+                self.maxError[field] = error
+        if diverged and self.firstDivergence is None:
+            self.firstDivergence = float(self.times[index])
+        self.compared += 1
+
+    def result(self):
+        return {
+            'records': len(self.order),
+            'compared': self.compared,
+            'mismatches': self.mismatches,
+            'max_error': self.maxError,
+            'first_divergence': self.firstDivergence,
+        }
+
+
+def test_replay(control, robot, hal_data):
+    ''' Entry point run by pytest inside a worker, see replay(). '''
+    payload = json.loads(os.environ['SIMRUNNER_PAYLOAD'])
+    replayer = Replayer(readLog(payload['log']), robot, hal_data)
+
+    control.set_practice_match()
+    control.run_test(replayer)
+
+    with open(os.environ['SIMRUNNER_RESULT'], 'w') as fp:
+        json.dump(replayer.result(), fp)
+
+
+def replay(path):
+    ''' Replays one log in this process. '''
+    # an empty robot path keeps the harness from loading physics.py
+    noPhysics = tempfile.mkdtemp(prefix='replay')
+    try:
+        passed, result = simrunner.run_harness(__file__, {'log': os.path.abspath(path)}, robot_path=noPhysics)
+    finally:
+        os.rmdir(noPhysics)
+    result['log'] = path
+    result['passed'] = passed
+    return result
+
+
+def format_results(results):
+    lines = []
+    for result in results:
+        if not result.get('compared'):
+            lines.append('%s: replay failed' % result['log'])
+            continue
+        first = result['first_divergence']
+        lines.append('%s: %d loops, %s' % (result['log'], result['compared'],
+                                           'identical' if first is None else 'first divergence at %.2f s' % first))
+        for field, _ in OUTPUTS:
+            if result['mismatches'][field]:
+                lines.append('    %-10s %5d loops differ, max %.3f' % (field, result['mismatches'][field],
+                                                                       result['max_error'][field]))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay match logs through MyRobot and diff the motor outputs.')
+    parser.add_argument('logs', nargs='+', help='match logs (.gemlog)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    results = simrunner.run_pool(replay, args.logs, args.jobs)
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+    identical = all(result['passed'] and result.get('first_divergence') is None for result in results)
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
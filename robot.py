@@ -4,11 +4,31 @@ Destination: Deep Space 2019 - GEMINI from Gryphon Robotics
 
 import wpilib
 import logging
-from math import *
+import threading
+from math import fabs
 from wpilib.drive import DifferentialDrive
 from networktables import NetworkTables
-from ctre import *
-
+from ctre import WPI_TalonSRX, WPI_VictorSPX
+from telemetry import Telemetry
+from profiler import LoopProfiler, StartupProfiler
+from sensors import DriveEncoder, SensorSnapshot
+from lift import Lift, LiftGains
+from fourbar import FourBar, FourBarGains
+from matchlog import MatchLogger
+from wpilib.command import Scheduler
+from align import AutoAlign, PARAMETERS as ALIGN_PARAMETERS
+from odometry import Odometry
+from autonomous import AutoRoutine, loadRoutines
+from subsystems import Drivetrain, LiftSubsystem, FourBarSubsystem, Motor, Pneumatic, Ranging
+from commands import DriverDrive, LiftControl, FourBarControl, CargoControl, FollowRoutine, Diagnostics, \
+    AutoShift, TANK, ARCADE, CURVATURE, MANUAL_SHIFT, AUTO_SHIFT, PARAMETERS as CONTROL_PARAMETERS
+import oi
+from inputs import Inputs, BUTTON_BOX
+from power import PowerManager
+from driveshaping import DriveShaper
+from shifting import AutoShifter
+from params import Parameters, ROBOT_PATH, SIM_PATH
+from robotmap import LEFT_ENCODER_SIGN, RIGHT_ENCODER_SIGN
 
 
 class MyRobot(wpilib.TimedRobot):
@@ -16,6 +36,28 @@ class MyRobot(wpilib.TimedRobot):
 
     def robotInit(self):
         ''' Initialization of robot objects. '''
+        self.startup = StartupProfiler()
+
+        ''' Vision '''
+        # the vision process boots in parallel with the rest of robotInit, so it is launched first
+        wpilib.CameraServer.launch('vision.py:main')
+        self.startup.mark('vision')
+
+        ''' Smart Dashboard '''
+        # connection for logging & Smart Dashboard, it connects in the background from here on
+        logging.basicConfig(level=logging.DEBUG)
+        self.sd = NetworkTables.getTable('SmartDashboard')
+        NetworkTables.initialize(server='10.55.49.2')
+        self.sd.putString("  ", "Connection")
+
+        # change-only publisher for the values sent every loop
+        self.telemetry = Telemetry(self.sd)
+        self.telemetry.setMaxRate("Telemetry Sent: ", 1)
+        self.telemetry.setMaxRate("Telemetry Skipped: ", 1)
+
+        # Smart Dashboard classes; the PDP is built by the power manager, RobotController is static
+        self.DS = wpilib.DriverStation.getInstance()
+        self.startup.mark('networktables')
 
         ''' Talon SRX Initialization '''
         # drive train motors
@@ -25,14 +67,14 @@ class MyRobot(wpilib.TimedRobot):
         self.rearLeftMotor = WPI_TalonSRX(2)
 
         ''' Encoders '''
-        # drive train encoders
-        self.rightEncoder = self.frontRightMotor
-        self.leftEncoder = self.frontLeftMotor
+        # drive train encoders, both counting up driving forward
+        self.rightEncoder = DriveEncoder(self.frontRightMotor, RIGHT_ENCODER_SIGN)
+        self.leftEncoder = DriveEncoder(self.frontLeftMotor, LEFT_ENCODER_SIGN)
 
         # lift encoder
         self.liftEncoder = wpilib.Encoder(8, 9)
 
-        # liftArm encoder
+        # liftArm encoder, zeroed with the four-bar stowed upright (its starting position)
         self.liftArmEncoder = wpilib.Encoder(5, 6)
 
         ''' Motor Groups '''
@@ -64,30 +106,37 @@ class MyRobot(wpilib.TimedRobot):
         self.rightStick = wpilib.Joystick(1)
         self.xbox = wpilib.Joystick(2)
         self.buttonBox = wpilib.Joystick(3)
+        self.startup.mark('motors')
 
         ''' Button Status'''
         self.buttonStatus = [False, False, False, False, False, False, False]
 
+        ''' Parameters '''
+        # tuning values from the saved file, tunable live from SmartDashboard (params.py)
+        self.params = Parameters(ROBOT_PATH if self.isReal() else SIM_PATH)
+        self.params.define(CONTROL_PARAMETERS)
+        self.params.define(ALIGN_PARAMETERS)
+        self.params.listen(self.sd.getSubTable('Parameters'))
+
+        ''' Lift Levels '''
+        # button box level -> lift encoder target; profiled closed-loop control
+        self.liftSystem = Lift(self.lift, self.liftEncoder, gains=LiftGains())
+        self.liftSystem.listen(self.params)
+
+        ''' Four-Bar '''
+        # arm angle from the liftArm encoder, gravity-compensated closed-loop control, presets per lift level
+        self.fourBarSystem = FourBar(self.liftArm, self.liftArmEncoder, gains=FourBarGains())
+        self.fourBarSystem.listen(self.params)
+        self.telemetry.setMaxRate("Four-Bar Angle (deg): ", 10)
+        self.startup.mark('parameters')
+
         ''' Pneumatic Initialization '''
         self.Compressor = wpilib.Compressor(0)
-        self.Compressor.setClosedLoopControl(True)
-        self.enable = self.Compressor.getPressureSwitchValue()
+        self.Compressor.setClosedLoopControl(True)     # starts it
         self.DoubleSolenoidOne = wpilib.DoubleSolenoid(0, 1)    # gear shifting
         self.DoubleSolenoidTwo = wpilib.DoubleSolenoid(2, 3)    # hatch panel claw
         self.DoubleSolenoidThree = wpilib.DoubleSolenoid(4, 5)  # hatch panel ejection
-        self.Compressor.start()
-
-        ''' Smart Dashboard '''
-        # connection for logging & Smart Dashboard
-        logging.basicConfig(level=logging.DEBUG)
-        self.sd = NetworkTables.getTable('SmartDashboard')
-        NetworkTables.initialize(server='10.55.49.2')
-        self.sd.putString("  ", "Connection")
-
-        # Smart Dashboard classes
-        self.PDP = wpilib.PowerDistributionPanel()
-        self.roboController = wpilib.RobotController()
-        self.DS = wpilib.DriverStation.getInstance()
+        self.startup.mark('pneumatics')
 
         ''' Sensors '''
         # Hall Effect Sensor
@@ -95,494 +144,400 @@ class MyRobot(wpilib.TimedRobot):
         self.ultrasonic = wpilib.AnalogInput(2)
         self.cargoUltrasonic = wpilib.AnalogInput(3)
 
+        # gyro: calibrating takes 5 s with the robot still, so it is done in the background while
+        # disabled (startGyro). self.gyro stays None until a calibration finished undisturbed.
+        self.gyro = None
+        self.uncalibratedGyro = None
+        self.gyroCalibrating = False
+        self.gyroThread = None
+        self.enables = 0
+
+        # inputs read once at the start of every loop
+        self.state = SensorSnapshot()
+
+        ''' Odometry '''
+        # field pose from the drive encoders and gyro, updated every 5 ms
+        # (on the encoder heading until the gyro has calibrated)
+        self.odometry = Odometry(self.leftEncoder, self.rightEncoder)
+        self.startGyro()
+        for key in ("Pose X (in): ", "Pose Y (in): ", "Pose Heading (deg): "):
+            self.telemetry.setMaxRate(key, 10)
+        self.startup.mark('sensors')
+
+        ''' Autonomous '''
+        # routines over the trajectory library built offline by pathgen.py, picked on SmartDashboard
+        self.trajectories, routines = loadRoutines()
+        self.routines = dict(routines)
+        self.autoChooser = wpilib.SendableChooser()
+        self.autoChooser.setDefaultOption(routines[0][0], routines[0][0])
+        for name, _ in routines[1:]:
+            self.autoChooser.addOption(name, name)
+        wpilib.SmartDashboard.putData("Autonomous", self.autoChooser)
+        self.startup.mark('autonomous')
+
+        ''' Auto Align '''
+        # vision target from the vision process
+        self.autoAlign = AutoAlign(self.drive, NetworkTables.getTable('Vision'), wpilib.Timer.getFPGATimestamp)
+
+        ''' Drive Shaping '''
+        # driver stick response, tunable from SmartDashboard
+        self.driveShaper = DriveShaper()
+        self.driveShaper.listen(self.params)
+        self.driveModeChooser = wpilib.SendableChooser()
+        self.driveModeChooser.setDefaultOption(TANK, TANK)
+        self.driveModeChooser.addOption(ARCADE, ARCADE)
+        self.driveModeChooser.addOption(CURVATURE, CURVATURE)
+        wpilib.SmartDashboard.putData("Drive Mode", self.driveModeChooser)
+
+        ''' Gear Shifting '''
+        # manual on the triggers, or automatic from wheel speed and motor current
+        self.autoShifter = AutoShifter()
+        self.shiftModeChooser = wpilib.SendableChooser()
+        self.shiftModeChooser.setDefaultOption(MANUAL_SHIFT, MANUAL_SHIFT)
+        self.shiftModeChooser.addOption(AUTO_SHIFT, AUTO_SHIFT)
+        wpilib.SmartDashboard.putData("Shifting", self.shiftModeChooser)
+        self.telemetry.setMaxRate("Drive Speed (in/s): ", 10)
+
+        ''' Subsystems '''
+        # mechanisms run by the command scheduler; default commands hold the driver controls
+        self.drivetrain = Drivetrain(self)
+        self.liftSubsystem = LiftSubsystem(self.liftSystem)
+        self.fourBar = FourBarSubsystem(self.fourBarSystem)
+        self.cargoIntake = Motor('CargoIntake', self.cargo)
+        self.shifter = Pneumatic('Shifter', self.DoubleSolenoidOne)
+        self.claw = Pneumatic('Claw', self.DoubleSolenoidTwo)
+        self.ejector = Pneumatic('Ejector', self.DoubleSolenoidThree)
+        self.ranging = Ranging(self)
+        for key in ("Player Station Range (in): ", "Player Station Confidence: ",
+                    "Cargo Range (in): ", "Cargo Confidence: "):
+            self.telemetry.setMaxRate(key, 10)
+
+        self.drivetrain.setDefaultCommand(DriverDrive(self))
+        self.liftSubsystem.setDefaultCommand(LiftControl(self))
+        self.fourBar.setDefaultCommand(FourBarControl(self))
+        self.cargoIntake.setDefaultCommand(CargoControl(self))
+        self.shifter.setDefaultCommand(AutoShift(self))
+
+        ''' Power '''
+        # sheds compressor, lift / four-bar and then drive output before a brownout
+        self.power = PowerManager(wpilib.PowerDistributionPanel(), self.Compressor, self.drive, self.liftSystem,
+                                  self.fourBarSystem)
+        for key in ("Predicted Voltage: ", "Total Current: ", "Drive Scale: ", "Min Voltage: "):
+            self.telemetry.setMaxRate(key, 5)
+
+        ''' Commands '''
+        # all controllers read once per loop; button events start the rest of the commands (oi.py)
+        self.inputs = Inputs(self.DS, (3, 3, 6, 0), debounce={BUTTON_BOX: 2})
+        oi.bind(self)
+        self.scheduler = Scheduler.getInstance()
+        self.autoCommand = None
+        self.diagnosticsCommand = Diagnostics(self)
+        self.startup.mark('commands')
+
         ''' Timer '''
         self.timer = wpilib.Timer()
 
+        ''' Loop Profiler '''
+        # per-section timing of the periodic methods
+        self.profiler = LoopProfiler(['sensors', 'buttons', 'commands', 'dashboard', 'log', 'telemetry'],
+                                     period=self.getPeriod())
+
+        ''' Match Log '''
+        # every enabled loop, written to the USB stick in the background
+        self.matchLog = MatchLogger()
+
         ''' Camera '''
-        # initialization of the HTTP camera
-        wpilib.CameraServer.launch('vision.py:main')
+        # the vision process was launched at the start of robotInit
         self.sd.putString("", "Top Camera")
         self.sd.putString(" ", "Bottom Camera")
 
-    def autonomousInit(self):
-        ''' Executed each time the robot enters autonomous. '''
+        # the vision process streams the chosen camera at full quality
+        self.cameraChooser = wpilib.SendableChooser()
+        self.cameraChooser.setDefaultOption("Top Camera", "Top Camera")
+        self.cameraChooser.addOption("Bottom Camera", "Bottom Camera")
+        wpilib.SmartDashboard.putData("Camera", self.cameraChooser)
+        self.startup.mark('logging')
+
+        # time to robot code ready, on the console and the dashboard
+        self.startup.log()
+        self.startup.publish(self.telemetry)
+
+    def startGyro(self):
+        ''' Starts calibrating the gyro in the background, only while disabled and not done or running yet. '''
+        if self.gyro is not None or self.gyroCalibrating or self.isEnabled():
+            return
+        self.gyroCalibrating = True
+        self.gyroThread = threading.Thread(target=self.calibrateGyro, args=(self.enables,),
+                                           name='GyroCalibration', daemon=True)
+        self.gyroThread.start()
+
+    def calibrateGyro(self, enables):
+        '''
+            Builds (or recalibrates) the gyro, then hands it to odometry. A calibration the robot
+            was enabled during is thrown away: odometry stays on the encoder heading, and the
+            next disable calibrates again.
+        '''
+        log = logging.getLogger('robot')
+        start = wpilib.Timer.getFPGATimestamp()
+        if self.uncalibratedGyro is None:
+            self.uncalibratedGyro = wpilib.AnalogGyro(1)    # calibrates as it is built
+        else:
+            self.uncalibratedGyro.calibrate()
 
-        # timer config
-        self.timer.reset()
-        self.timer.start()
+        if self.enables != enables or self.isEnabled():
+            log.warning('robot enabled while the gyro calibrated, staying on the encoder heading')
+        else:
+            self.odometry.setGyro(self.uncalibratedGyro)
+            self.gyro = self.uncalibratedGyro
+            log.info('gyro calibrated in %.1f s', wpilib.Timer.getFPGATimestamp() - start)
+        self.gyroCalibrating = False
 
-        # drive train encoder reset
-        self.rightEncoder.setQuadraturePosition(0, 0)
-        self.leftEncoder.setQuadraturePosition(0, 0)
+    def robotPeriodic(self):
+        ''' Called at the end of every loop, in every mode. '''
 
-        self.liftEncoder.reset()
+        # bandwidth savings of the change-only publisher
+        self.telemetry.putNumber("Telemetry Sent: ", self.telemetry.getSent())
+        self.telemetry.putNumber("Telemetry Skipped: ", self.telemetry.getSkipped())
 
-    def autonomousPeriodic(self):
-        ''' Called periodically during autonomous. '''
+        # power budget
+        self.power.publish(self.telemetry)
 
-        '''Test Methods'''
-        def encoder_test():
-            ''' Drives robot set encoder distance away '''
-            self.rightPos = fabs(self.rightEncoder.getQuadraturePosition())
-            self.leftPos = fabs(self.leftEncoder.getQuadraturePosition())
-            self.distIn = (((self.leftPos + self.rightPos) / 2) / 4096) * 18.84955
-            if 0 <= self.distIn <= 72:
-                self.drive.tankDrive(0.5, 0.5)
-            else:
-                self.drive.tankDrive(0, 0)
-
-        def Diagnostics():
-            ''' Smart Dashboard Tests'''
-            self.sd.putNumber("Temperature: ", self.PDP.getTemperature())
-            self.sd.putNumber("Battery Voltage: ", self.roboController.getBatteryVoltage())
-            self.sd.putBoolean(" Browned Out?", self.roboController.isBrownedOut)
-
-            # Smart Dashboard diagnostics
-            self.sd.putNumber("Right Encoder Speed: ", abs(self.rightEncoder.getQuadratureVelocity()))
-            self.sd.putNumber("Left Encoder Speed: ", abs(self.leftEncoder.getQuadratureVelocity()))
-            self.sd.putNumber("Lift Encoder: ", self.liftEncoder.getDistance())
-
-        def Pressure():
-            self.Compressor.start()
-
-        def cargoOne():
-            if self.liftEncoder.get() <= 133:  # Cargo 1
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 133:
-                self.lift.set(0.05)
-                self.buttonStatus[4] = False
-
-        def cargoTwo():
-            if self.liftEncoder.get() <= 270:   # Cargo 2
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 270:
-                self.lift.set(0.05)
-                self.buttonStatus[2] = False
-
-        def cargoThree():
-            if self.liftEncoder.get() <= 415:   # Cargo 3
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 415:
-                self.lift.set(0.05)
-                self.buttonStatus[0] = False
-
-        def hatchOne():
-            if self.liftEncoder.get() <= 96:    # Hatch 1
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 96:
-                self.lift.set(0.05)
-                self.buttonStatus[5] = False
-
-        def hatchTwo():
-            if self.liftEncoder.get() <= 237:   # Hatch 2
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 237:
-                self.lift.set(0.05)
-                self.buttonStatus[3] = False
-
-        def hatchThree():
-            if self.liftEncoder.get() <= 378:   # Hatch 3
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 378:
-                self.lift.set(0.05)
-                self.buttonStatus[1] = False
-
-        def liftEncoderReset():
-            self.lift.set(0.01)
-            if self.Hall.get() is True:
-                self.liftEncoder.reset()
-
-        ''' Button Status Toggle '''
-        if self.buttonBox.getRawButtonPressed(1):
-            self.buttonStatus[0] = not self.buttonStatus[0]
-        elif self.buttonBox.getRawButtonPressed(2):
-            self.buttonStatus[1] = not self.buttonStatus[1]
-        elif self.buttonBox.getRawButtonPressed(3):
-            self.buttonStatus[2] = not self.buttonStatus[2]
-        elif self.buttonBox.getRawButtonPressed(4):
-            self.buttonStatus[3] = not self.buttonStatus[3]
-        elif self.buttonBox.getRawButtonPressed(5):
-            self.buttonStatus[4] = not self.buttonStatus[4]
-        elif self.buttonBox.getRawButtonPressed(6):
-            self.buttonStatus[5] = not self.buttonStatus[5]
-        elif self.buttonBox.getRawButtonPressed(7):
-            self.buttonStatus[6] = not self.buttonStatus[6]
-
-        ''' Button Box Level Mapping '''
-        if self.buttonStatus[0] is True:
-            cargoThree()
-        elif self.buttonStatus[1] is True:
-            hatchThree()
-        elif self.buttonStatus[2] is True:
-            cargoTwo()
-        elif self.buttonStatus[3] is True:
-            hatchTwo()
-        elif self.buttonStatus[4] is True:
-            cargoOne()
-        elif self.buttonStatus[5] is True:
-            hatchOne()
-        elif self.buttonStatus[6] is True:
-            liftEncoderReset()
-
-        ''' Test Execution '''
-        if self.DS.getGameSpecificMessage() == "pressure":
-            Pressure()
-        elif self.DS.getGameSpecificMessage() == "diagnostics":
-            Diagnostics()
+        # field pose, in the gear the drive train is in
+        self.odometry.setGear(self.state.gear)
+        self.odometry.publish(self.telemetry)
 
-        ''' Smart Dashboard '''
-        # compressor state
-        if self.Compressor.enabled() is True:
-            self.sd.putString("Compressor Status: ", "Enabled")
-        elif self.Compressor.enabled() is False:
-            self.sd.putString("Compressor Status: ", "Disabled")
+        # match data, one record per enabled loop
+        if self.isEnabled():
+            with self.profiler.section('log'):
+                self.matchLog.record(self)
 
-        # gear state
-        if self.DoubleSolenoidOne.get() == 1:
-            self.sd.putString("Gear Shift: ", "High Speed")
-        elif self.DoubleSolenoidOne.get() == 2:
-            self.sd.putString("Gear Shift: ", "Low Speed")
+        # loop timing summary, about once a second
+        if self.profiler.publishDue():
+            self.profiler.publish(self.telemetry)
 
-        # ejector state
-        if self.DoubleSolenoidThree.get() == 2:
-            self.sd.putString("Ejector Pins: ", "Ejected")
-        elif self.DoubleSolenoidThree.get() == 1:
-            self.sd.putString("Ejector Pins: ", "Retracted")
+        # one NetworkTables write per loop
+        with self.profiler.section('telemetry'):
+            self.telemetry.flush()
 
-        # claw state
-        if self.DoubleSolenoidTwo.get() == 2:
-            self.sd.putString("Claw: ", "Open")
-        elif self.DoubleSolenoidTwo.get() == 1:
-            self.sd.putString("Claw: ", "Closed")
-
-        ''' Ultrasonic stuff '''
-        # robot ultrasonic
-        self.ultraValue = self.ultrasonic.getVoltage()
-        if 0.142 <= self.ultraValue <= 0.146:
-            self.sd.putString("PLAYER STATION RANGE: ", "YES!!!!")
-        else:
-            self.sd.putString("PLAYER STATION RANGE: ", "NO!")
+        self.profiler.endLoop()
 
-        #self.sd.putNumber("Ultrasonic Voltage: ", self.ultraValue)
+    def disabledInit(self):
+        ''' Executed each time the robot is disabled. '''
 
-        # cargo ultrasonic
-        self.cargoUltraValue = self.cargoUltrasonic.getVoltage()
+        # cancel every command, the default commands come back on enable
+        self.scheduler.removeAll()
 
-        if 0.70 <= self.cargoUltraValue <= 1.56:
-            self.sd.putString("HATCH RANGE: ", "HATCH IN RANGE")
-        else:
-            self.sd.putString("HATCH RANGE: ", "NOT IN RANGE")
-
-        ''' Pneumatics Control '''
-        # compressor
-        if self.xbox.getRawButton(9):
-            self.Compressor.stop()
-        elif self.xbox.getRawButton(10):
-            self.Compressor.start()
-        elif self.rightStick.getRawButton(1):  # shift right
-            self.DoubleSolenoidOne.set(wpilib.DoubleSolenoid.Value.kForward)
-        elif self.leftStick.getRawButton(1):  # shift left
-            self.DoubleSolenoidOne.set(wpilib.DoubleSolenoid.Value.kReverse)
-        elif self.xbox.getRawButton(3):  # open claw
-            self.DoubleSolenoidTwo.set(wpilib.DoubleSolenoid.Value.kForward)
-        elif self.xbox.getRawButton(2):  # close claw
-            self.DoubleSolenoidTwo.set(wpilib.DoubleSolenoid.Value.kReverse)
-        elif self.xbox.getRawButton(4):  # eject
-            self.DoubleSolenoidThree.set(wpilib.DoubleSolenoid.Value.kForward)
-        elif self.xbox.getRawButton(1):  # retract
-            self.DoubleSolenoidThree.set(wpilib.DoubleSolenoid.Value.kReverse)
-
-        ''' Victor SPX (Lift, Lift Arm, Cargo) '''
-        # lift control
-        if True in self.buttonStatus:
-            if self.xbox.getRawButton(5):  # hold
-                self.lift.set(0.05)
-            elif self.xbox.getRawAxis(3):  # up
-                self.lift.set(self.xbox.getRawAxis(3) / 1.5)
-            elif self.xbox.getRawAxis(2):  # down
-                self.lift.set(-self.xbox.getRawAxis(2) * 0.25)
-            else:
-                self.lift.set(0)
-
-        # four-bar control
-        if self.xbox.getRawButton(6):
-           self.liftArm.set(0.05)
-        elif not self.xbox.getRawButton(6):
-            self.liftArm.set(-self.xbox.getRawAxis(1) / 4.0)
-        else:
-            self.liftArm.set(0)
-
-        # cargo intake control
-        if self.xbox.getRawButton(7):
-            self.cargo.set(0.12)
-        elif self.xbox.getRawAxis(5):  # take in
-            self.cargo.set(self.xbox.getRawAxis(5) *0.75)
-
-        # controller mapping for tank steering
-        rightAxis = self.rightStick.getRawAxis(1)
-        leftAxis = self.leftStick.getRawAxis(1)
-
-        # drives drive system using tank steering
-        if self.DoubleSolenoidOne.get() == 1:  # if on high gear
-            self.divisor = 1.2  # 90% of high speed
-        elif self.DoubleSolenoidOne.get() == 2:  # if on low gear
-            self.divisor = 1.2  # normal slow speed
-        else:
-            self.divisor = 1.0
+        # stop the closed-loop lift and four-bar so they don't jump back to a level on enable,
+        # and clear a following error fault
+        self.liftSystem.reset()
+        self.fourBarSystem.reset()
 
-        if leftAxis != 0:
-            self.leftSign = leftAxis / fabs(leftAxis)
-        else:
-            self.leftSign = 0
-        if rightAxis != 0:
-            self.rightSign = rightAxis / fabs(rightAxis)
+        # calibrate the gyro now if an enable interrupted it
+        self.startGyro()
+
+        # finish the match log
+        if self.matchLog.isOpen():
+            self.matchLog.close()
+            self.telemetry.putNumber("Log Dropped: ", self.matchLog.dropped)
+
+        # keep what was tuned during the enabled period
+        if self.params.dirty:
+            self.params.save()
+
+        # dump the loop timing of the last enabled period to the console / log
+        if self.profiler.loops:
+            self.profiler.log()
+            self.profiler.reset()
+
+    def disabledPeriodic(self):
+        ''' Called periodically while the robot is disabled. '''
+
+        # keep what is tuned while disabled, once the dashboard has stopped changing it
+        self.params.saveSettled()
+
+    def autonomousInit(self):
+        ''' Executed each time the robot enters autonomous. '''
+        self.enables += 1
+
+        # timer config
+        self.timer.reset()
+        self.timer.start()
+
+        # one log per match, kept open into teleop
+        self.matchLog.open(self)
+
+        # drive train encoder reset
+        self.rightEncoder.reset()
+        self.leftEncoder.reset()
+
+        # autonomous routines measure from the starting position
+        self.odometry.reset()
+
+        # routine picked on SmartDashboard, if any
+        name = self.autoChooser.getSelected()
+        steps = self.routines.get(name)
+        if steps:
+            self.autoCommand = FollowRoutine(self, AutoRoutine(self, name, steps, self.trajectories))
+            self.autoCommand.start()
+
+        # test modes picked with the game specific message
+        self.diagnosticsCommand.start()
+
+        self.liftEncoder.reset()
+        self.liftSystem.disable()
+
+    ''' Test Methods '''
+    def encoderTest(self):
+        ''' Drives robot set encoder distance away '''
+        self.rightPos = fabs(self.state.rightPosition)
+        self.leftPos = fabs(self.state.leftPosition)
+        self.distIn = (((self.leftPos + self.rightPos) / 2) / 4096) * 18.84955
+        if 0 <= self.distIn <= 72:
+            self.drive.tankDrive(0.5, 0.5)
         else:
-            self.rightSign = 0
+            self.drive.tankDrive(0, 0)
 
-        self.drive.tankDrive(-(self.leftSign)*(1 / self.divisor)*(leftAxis ** 2), -(self.rightSign)*(1 / self.divisor)*(rightAxis ** 2))
+    def diagnostics(self):
+        ''' Smart Dashboard Tests'''
+        self.telemetry.putNumber("Temperature: ", self.power.pdp.getTemperature())
+        self.telemetry.putNumber("Battery Voltage: ", self.power.batteryVoltage)
+        self.telemetry.putBoolean(" Browned Out?", wpilib.RobotController.isBrownedOut())
 
-        #self.drive.tankDrive(-leftAxis / self.divisor, -rightAxis/ self.divisor)  # drive divided by appropriate divisor
+        # Smart Dashboard diagnostics
+        self.telemetry.putNumber("Right Encoder Speed: ", abs(self.state.rightVelocity))
+        self.telemetry.putNumber("Left Encoder Speed: ", abs(self.state.leftVelocity))
+        self.telemetry.putNumber("Lift Encoder: ", self.liftEncoder.getDistance())
 
+    def pressure(self):
+        self.power.setCompressor(True)
+
+    def autonomousPeriodic(self):
+        ''' Called periodically during autonomous. '''
+        self.enabledPeriodic()
 
     def teleopInit(self):
         ''' Executed at the start of teleop mode. '''
+        self.enables += 1
 
         self.drive.setSafetyEnabled(True)
 
+        # autonomous commands don't carry over
+        self.scheduler.removeAll()
+
+        # continues the autonomous log if there is one
+        self.matchLog.open(self)
+
         # drive train encoder reset
-        self.rightEncoder.setQuadraturePosition(0, 0)
-        self.leftEncoder.setQuadraturePosition(0, 0)
+        self.rightEncoder.reset()
+        self.leftEncoder.reset()
+
+        # the pose carries over from autonomous
+        self.odometry.resync()
 
         # lift encoder rest
         self.liftEncoder.reset()
+        self.liftSystem.disable()
 
-        # compressor
-        self.Compressor.start()
+        # compressor, through the power manager so a pause for a brownout is kept
+        self.power.setCompressor(True)
 
     def teleopPeriodic(self):
         ''' Periodically executes methods during the teleop mode. '''
+        self.enabledPeriodic()
+
+    def enabledPeriodic(self):
+        ''' One autonomous or teleop loop: read the inputs, run the active commands, report. '''
+        self.profiler.beginLoop()
+
+        with self.profiler.section('sensors'):
+            self.state.read(self)
+            self.power.readChannels()
+
+        ''' Controllers '''
+        with self.profiler.section('buttons'):
+            self.inputs.update()
+
+        ''' Commands '''
+        with self.profiler.section('commands'):
+            self.scheduler.run()
+
+        with self.profiler.section('dashboard'):
+            self.dashboard()
+
+    def dashboard(self):
+        ''' Mechanism states and ultrasonic ranges for the drivers. '''
         '''        
-        self.sd.putString(" ", "Match Info")
-        self.sd.putString("Event Name: ", self.DS.getEventName())
-        self.sd.putNumber("Match Time: ", self.timer.getMatchTime())
-        self.sd.putNumber("Match Number: ", self.DS.getMatchTime())
-        self.sd.putNumber("Location: ", self.DS.getLocation())
+        self.telemetry.putString(" ", "Match Info")
+        self.telemetry.putString("Event Name: ", self.DS.getEventName())
+        self.telemetry.putNumber("Match Time: ", self.timer.getMatchTime())
+        self.telemetry.putNumber("Match Number: ", self.DS.getMatchTime())
+        self.telemetry.putNumber("Location: ", self.DS.getLocation())
         if self.DS.getMatchType() == 3:
-            self.sd.putString("Match Type: ", "Elimination")
+            self.telemetry.putString("Match Type: ", "Elimination")
         elif self.DS.getMatchType() == 1:
-            self.sd.putString("Match Type: ", "Practice")
+            self.telemetry.putString("Match Type: ", "Practice")
         elif self.DS.getMatchType() == 2:
-            self.sd.putString("Match Type: ", "Qualification")
+            self.telemetry.putString("Match Type: ", "Qualification")
         else:
-            self.sd.putString("Match Type: ", "None")
+            self.telemetry.putString("Match Type: ", "None")
 
         if self.DS.getAlliance() == 0:
-            self.sd.putString("Alliance: ", "Red")
+            self.telemetry.putString("Alliance: ", "Red")
         elif self.DS.getAlliance() == 1:
-            self.sd.putString("Alliance: ", "Blue")
+            self.telemetry.putString("Alliance: ", "Blue")
         else:
-            self.sd.putString("Alliance: ", "Invalid")
+            self.telemetry.putString("Alliance: ", "Invalid")
         '''
 
-        def cargoOne():
-            if self.liftEncoder.get() <= 133:  # Cargo 1
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 133:
-                self.lift.set(0.05)
-                self.buttonStatus[4] = False
-
-        def cargoTwo():
-            if self.liftEncoder.get() <= 270:  # Cargo 2
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 270:
-                self.lift.set(0.05)
-                self.buttonStatus[2] = False
-
-        def cargoThree():
-            if self.liftEncoder.get() <= 415:  # Cargo 3
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 415:
-                self.lift.set(0.05)
-                self.buttonStatus[0] = False
-
-        def hatchOne():
-            if self.liftEncoder.get() <= 96:  # Hatch 1
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 96:
-                self.lift.set(0.05)
-                self.buttonStatus[5] = False
-
-        def hatchTwo():
-            if self.liftEncoder.get() <= 237:  # Hatch 2
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 237:
-                self.lift.set(0.05)
-                self.buttonStatus[3] = False
-
-        def hatchThree():
-            if self.liftEncoder.get() <= 378:  # Hatch 3
-                self.lift.set(0.5)
-            elif self.liftEncoder.get() > 378:
-                self.lift.set(0.05)
-                self.buttonStatus[1] = False
-
-        def liftEncoderReset():
-            self.lift.set(0.01)
-            if self.Hall.get() is True:
-                self.liftEncoder.reset()
-
-        ''' Button Status Toggle '''
-        if self.buttonBox.getRawButtonPressed(1):
-            self.buttonStatus[0] = not self.buttonStatus[0]
-        elif self.buttonBox.getRawButtonPressed(2):
-            self.buttonStatus[1] = not self.buttonStatus[1]
-        elif self.buttonBox.getRawButtonPressed(3):
-            self.buttonStatus[2] = not self.buttonStatus[2]
-        elif self.buttonBox.getRawButtonPressed(4):
-            self.buttonStatus[3] = not self.buttonStatus[3]
-        elif self.buttonBox.getRawButtonPressed(5):
-            self.buttonStatus[4] = not self.buttonStatus[4]
-        elif self.buttonBox.getRawButtonPressed(6):
-            self.buttonStatus[5] = not self.buttonStatus[5]
-        elif self.buttonBox.getRawButtonPressed(7):
-            self.buttonStatus[6] = not self.buttonStatus[6]
-
-        ''' Button Box Level Mapping '''
-        if self.buttonStatus[0] is True:
-            cargoThree()
-        elif self.buttonStatus[1] is True:
-            hatchThree()
-        elif self.buttonStatus[2] is True:
-            cargoTwo()
-        elif self.buttonStatus[3] is True:
-            hatchTwo()
-        elif self.buttonStatus[4] is True:
-            cargoOne()
-        elif self.buttonStatus[5] is True:
-            hatchOne()
-        elif self.buttonStatus[6] is True:
-            liftEncoderReset()
-
         ''' Smart Dashboard '''
         # compressor state
-        if self.Compressor.enabled() is True:
-            self.sd.putString("Compressor Status: ", "Enabled")
-        elif self.Compressor.enabled() is False:
-            self.sd.putString("Compressor Status: ", "Disabled")
+        if self.state.compressorEnabled is True:
+            self.telemetry.putString("Compressor Status: ", "Enabled")
+        elif self.state.compressorEnabled is False:
+            self.telemetry.putString("Compressor Status: ", "Disabled")
 
         # gear state
-        if self.DoubleSolenoidOne.get() == 1:
-            self.sd.putString("Gear Shift: ", "High Speed")
-        elif self.DoubleSolenoidOne.get() == 2:
-            self.sd.putString("Gear Shift: ", "Low Speed")
+        if self.state.gear == 1:
+            self.telemetry.putString("Gear Shift: ", "High Speed")
+        elif self.state.gear == 2:
+            self.telemetry.putString("Gear Shift: ", "Low Speed")
 
         # ejector state
-        if self.DoubleSolenoidThree.get() == 2:
-            self.sd.putString("Ejector Pins: ", "Ejected")
-        elif self.DoubleSolenoidThree.get() == 1:
-            self.sd.putString("Ejector Pins: ", "Retracted")
+        if self.state.ejector == 2:
+            self.telemetry.putString("Ejector Pins: ", "Ejected")
+        elif self.state.ejector == 1:
+            self.telemetry.putString("Ejector Pins: ", "Retracted")
 
         # claw state
-        if self.DoubleSolenoidTwo.get() == 2:
-            self.sd.putString("Claw: ", "Open")
-        elif self.DoubleSolenoidTwo.get() == 1:
-            self.sd.putString("Claw: ", "Closed")
+        if self.state.claw == 2:
+            self.telemetry.putString("Claw: ", "Open")
+        elif self.state.claw == 1:
+            self.telemetry.putString("Claw: ", "Closed")
 
-        ''' Ultrasonic '''
-        self.ultraValue = self.ultrasonic.getVoltage()
+        # four-bar angle
+        self.fourBarSystem.publish(self.telemetry)
 
-        if 0.142 <= self.ultraValue <= 0.146:
-            self.sd.putString("PLAYER STATION RANGE: ", "YES!!!!")
+        ''' Ultrasonic '''
+        # filtered by the ranging subsystem, only in range while the readings agree
+        if self.ranging.playerStation.inRange(self.params.playerStationRange):
+            self.telemetry.putString("PLAYER STATION RANGE: ", "YES!!!!")
         else:
-            self.sd.putString("PLAYER STATION RANGE: ", "NO!")
-
-        #self.sd.putNumber("Ultrasonic Voltage: ", self.ultraValue)
+            self.telemetry.putString("PLAYER STATION RANGE: ", "NO!")
 
         # cargo ultrasonic
-        self.cargoUltraValue = self.cargoUltrasonic.getVoltage()
-
-        if 0.70 <= self.cargoUltraValue <= 1.56:
-            self.sd.putString("HATCH RANGE: ", "HATCH IN RANGE")
+        if self.ranging.cargo.inRange(self.params.hatchRange):
+            self.telemetry.putString("HATCH RANGE: ", "HATCH IN RANGE")
         else:
-            self.sd.putString("HATCH RANGE: ", "NOT IN RANGE")
+            self.telemetry.putString("HATCH RANGE: ", "NOT IN RANGE")
 
         # # button states
-        # self.sd.putBoolean("Button 1 (Cargo 3): ", self.buttonStatusOne)
-        # self.sd.putBoolean("Button 2 (Hatch 3): ", self.buttonStatusTwo)
-        # self.sd.putBoolean("Button 3 (Cargo 2): ", self.buttonStatusThree)
-        # self.sd.putBoolean("Button 4 (Hatch 2): ", self.buttonStatusFour)
-        # self.sd.putBoolean("Button 5 (Cargo 1): ", self.buttonStatusFive)
-        # self.sd.putBoolean("Button 6 (Hatch 1): ", self.buttonStatusSix)
-        # self.sd.putBoolean("Button 7 (Reset): ", self.buttonStatusSeven)
-
-        ''' Pneumatics Control '''
-        # compressor
-        if self.xbox.getRawButton(9):
-            self.Compressor.stop()
-        elif self.xbox.getRawButton(10):
-            self.Compressor.start()
-        elif self.rightStick.getRawButton(1):  # shift right
-            self.DoubleSolenoidOne.set(wpilib.DoubleSolenoid.Value.kForward)
-        elif self.leftStick.getRawButton(1):  # shift left
-            self.DoubleSolenoidOne.set(wpilib.DoubleSolenoid.Value.kReverse)
-        elif self.xbox.getRawButton(3):  # open claw
-            self.DoubleSolenoidTwo.set(wpilib.DoubleSolenoid.Value.kForward)
-        elif self.xbox.getRawButton(2):  # close claw
-            self.DoubleSolenoidTwo.set(wpilib.DoubleSolenoid.Value.kReverse)
-        elif self.xbox.getRawButton(4):  # eject
-            self.DoubleSolenoidThree.set(wpilib.DoubleSolenoid.Value.kForward)
-        elif self.xbox.getRawButton(1):  # retract
-            self.DoubleSolenoidThree.set(wpilib.DoubleSolenoid.Value.kReverse)
-
-        ''' Victor SPX (Lift, Lift Arm, Cargo) '''
-        # lift control
-        if True in self.buttonStatus:
-            if self.xbox.getRawAxis(3):  # up
-                self.lift.set(self.xbox.getRawAxis(3) / 1.5)
-            elif self.xbox.getRawAxis(2):  # down
-                self.lift.set(-self.xbox.getRawAxis(2) * 0.25)
-            elif self.xbox.getRawButton(5):  # hold
-                self.lift.set(0.05)
-            else:
-                self.lift.set(0)
-
-        # four-bar control
-        if self.xbox.getRawButton(6):
-           self.liftArm.set(0.05)
-        elif not self.xbox.getRawButton(6):
-            self.liftArm.set(-self.xbox.getRawAxis(1) / 4.0)
-        else:
-            self.liftArm.set(0)
-
-        # cargo intake control
-        if self.xbox.getRawButton(7):
-            self.cargo.set(0.12)
-        elif self.xbox.getRawAxis(5):  # take in
-            self.cargo.set(self.xbox.getRawAxis(5) * 0.75)
-
-        # controller mapping for tank steering
-        rightAxis = self.rightStick.getRawAxis(1)
-        leftAxis = self.leftStick.getRawAxis(1)
-
-        # drives drive system using tank steering
-        if self.DoubleSolenoidOne.get() == 1:  # if on high gear
-            self.divisor = 1.2  # 90% of high speed
-        elif self.DoubleSolenoidOne.get() == 2:  # if on low gear
-            self.divisor = 1.2  # normal slow speed
-        else:
-            self.divisor = 1.0
-
-        if leftAxis != 0:
-            self.leftSign = leftAxis / fabs(leftAxis)
-        else:
-            self.leftSign = 0
-        if rightAxis != 0:
-            self.rightSign = rightAxis / fabs(rightAxis)
-        else:
-            self.rightSign = 0
-
-        self.drive.tankDrive(-(self.leftSign)*(1 / self.divisor)*(leftAxis ** 2), -(self.rightSign)*(1 / self.divisor)*(rightAxis ** 2))
-        #self.drive.tankDrive(-leftAxis / self.divisor, -rightAxis/ self.divisor)  # drive divided by appropriate divisor
+        # self.telemetry.putBoolean("Button 1 (Cargo 3): ", self.buttonStatusOne)
+        # self.telemetry.putBoolean("Button 2 (Hatch 3): ", self.buttonStatusTwo)
+        # self.telemetry.putBoolean("Button 3 (Cargo 2): ", self.buttonStatusThree)
+        # self.telemetry.putBoolean("Button 4 (Hatch 2): ", self.buttonStatusFour)
+        # self.telemetry.putBoolean("Button 5 (Cargo 1): ", self.buttonStatusFive)
+        # self.telemetry.putBoolean("Button 6 (Hatch 1): ", self.buttonStatusSix)
+        # self.telemetry.putBoolean("Button 7 (Reset): ", self.buttonStatusSeven)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,36 @@
+'''
+Robot dimensions and calibration constants.
+
+Shared by the robot code and the offline tools (pathgen.py, simrunner.py,
+replay.py, fieldview.py), so this module must never import wpilib: the
+tools run on laptops without robotpy installed.
+'''
+
+# drive train Talon quadrature counts per wheel revolution and wheel circumference (in)
+COUNTS_PER_REV = 4096
+WHEEL_CIRCUMFERENCE = 18.84955
+
+# counts per inch in each gear (DoubleSolenoidOne value). The encoders sit on the
+# gearbox output, so both gears read the same; motor-side encoders would differ by the ratio.
+HIGH_GEAR, LOW_GEAR = 1, 2
+COUNTS_PER_INCH = {
+    HIGH_GEAR: COUNTS_PER_REV / WHEEL_CIRCUMFERENCE,
+    LOW_GEAR: COUNTS_PER_REV / WHEEL_CIRCUMFERENCE,
+}
+
+# wheel track width (in)
+TRACK_WIDTH = 24.0
+
+# raw drive encoder count direction when that side drives forward: the right side's encoder
+# is mounted mirrored and counts down (sensors.DriveEncoder makes both count up)
+LEFT_ENCODER_SIGN, RIGHT_ENCODER_SIGN = 1, -1
+
+# button box index -> (lift level, lift encoder count)
+LEVELS = (
+    ('Cargo 3', 415),   # button 1
+    ('Hatch 3', 378),   # button 2
+    ('Cargo 2', 270),   # button 3
+    ('Hatch 2', 237),   # button 4
+    ('Cargo 1', 133),   # button 5
+    ('Hatch 1', 96),    # button 6
+)
@@ -0,0 +1,111 @@
+'''
+Per-tick hardware read cache.
+
+Every sensor and actuator state the loop looks at is read once at the start
+of the tick into a SensorSnapshot. The rest of the loop reads from the
+snapshot, so a value never changes halfway through a tick and each HAL/CAN
+call happens once per loop instead of once per use.
+'''
+
+import wpilib
+
+
+class DriveEncoder(object):
+    ''' A drive Talon's quadrature encoder, counting up when its side of the robot drives forward. '''
+
+    def __init__(self, talon, sign):
+        '''
+            :param talon: Talon SRX the encoder is wired to
+            :param sign: raw count direction driving forward (robotmap.LEFT_ENCODER_SIGN / RIGHT_ENCODER_SIGN)
+        '''
+        self.talon = talon
+        self.sign = sign
+
+    def getPosition(self):
+        ''' Counts since the last reset, forward positive. '''
+        return self.sign * self.talon.getQuadraturePosition()
+
+    def getVelocity(self):
+        ''' Counts per 100 ms, forward positive. '''
+        return self.sign * self.talon.getQuadratureVelocity()
+
+    def reset(self):
+        self.talon.setQuadraturePosition(0, 0)
+
+
+class SensorSnapshot(object):
+    ''' Compact record of the robot's inputs for one loop. '''
+
+    __slots__ = (
+        'timestamp',
+
+        # drive train (Talon SRX quadrature, forward positive on both sides)
+        'rightPosition', 'leftPosition',
+        'rightVelocity', 'leftVelocity',
+        'rightCurrent', 'leftCurrent',
+
+        # lift / four-bar encoders
+        'liftCount', 'liftArmCount',
+
+        # Hall effect sensor (lift bottom)
+        'hall',
+
+        # pneumatics
+        'compressorEnabled',
+        'gear',         # DoubleSolenoidOne
+        'claw',         # DoubleSolenoidTwo
+        'ejector',      # DoubleSolenoidThree
+
+        # ultrasonics, averaged by the FPGA
+        'ultrasonicVoltage', 'cargoUltrasonicVoltage',
+
+        # gyro (deg, clockwise positive)
+        'gyroAngle',
+    )
+
+    def __init__(self):
+        self.timestamp = 0.0
+        self.rightPosition = 0
+        self.leftPosition = 0
+        self.rightVelocity = 0
+        self.leftVelocity = 0
+        self.rightCurrent = 0.0
+        self.leftCurrent = 0.0
+        self.liftCount = 0
+        self.liftArmCount = 0
+        self.hall = False
+        self.compressorEnabled = False
+        self.gear = 0
+        self.claw = 0
+        self.ejector = 0
+        self.ultrasonicVoltage = 0.0
+        self.cargoUltrasonicVoltage = 0.0
+        self.gyroAngle = 0.0
+
+    def read(self, robot):
+        ''' Reads every input of the robot once. '''
+        self.timestamp = wpilib.Timer.getFPGATimestamp()
+
+        self.rightPosition = robot.rightEncoder.getPosition()
+        self.leftPosition = robot.leftEncoder.getPosition()
+        self.rightVelocity = robot.rightEncoder.getVelocity()
+        self.leftVelocity = robot.leftEncoder.getVelocity()
+        self.rightCurrent = robot.frontRightMotor.getOutputCurrent()
+        self.leftCurrent = robot.frontLeftMotor.getOutputCurrent()
+
+        self.liftCount = robot.liftEncoder.get()
+        self.liftArmCount = robot.liftArmEncoder.get()
+
+        self.hall = robot.Hall.get()
+
+        self.compressorEnabled = robot.Compressor.enabled()
+        self.gear = robot.DoubleSolenoidOne.get()
+        self.claw = robot.DoubleSolenoidTwo.get()
+        self.ejector = robot.DoubleSolenoidThree.get()
+
+        self.ultrasonicVoltage = robot.ultrasonic.getAverageVoltage()
+        self.cargoUltrasonicVoltage = robot.cargoUltrasonic.getAverageVoltage()
+
+        # None while the gyro is still calibrating at startup
+        if robot.gyro is not None:
+            self.gyroAngle = robot.gyro.getAngle()
@@ -0,0 +1,82 @@
+'''
+Automatic gear shifting.
+
+Picks the drive train gear from the wheel speed measured by the Talon
+quadrature encoders (forward positive on both sides, sensors.DriveEncoder)
+and the drive motor current.
+It shifts up once the robot is moving fast enough for high gear to pull
+harder than low gear, and back down when it slows again or is pushing
+against something at low speed. Separate up and down speeds give
+hysteresis, and a minimum interval between shifts keeps it from hunting.
+A manual shift counts as a shift, so the drivers can always override.
+'''
+
+from robotmap import COUNTS_PER_INCH, HIGH_GEAR, LOW_GEAR
+
+# shift up above / down below this wheel speed (in/s)
+UPSHIFT_SPEED = 60.0
+DOWNSHIFT_SPEED = 40.0
+
+# pushing: shift down early when a side draws this much (A) while slower than PUSH_SPEED (in/s)
+PUSH_CURRENT = 40.0
+PUSH_SPEED = 50.0
+
+# minimum time between two shifts (s)
+MIN_SHIFT_INTERVAL = 0.5
+
+# wheel speed filter constant
+SPEED_FILTER = 0.5
+
+
+class AutoShifter(object):
+    ''' Gear choice from wheel speed and motor current, with hysteresis. '''
+
+    def __init__(self):
+        self.speed = 0.0
+        self.lastShift = None
+        self.reason = ''
+
+    def update(self, now, gear, leftVelocity, rightVelocity, leftCurrent, rightCurrent):
+        '''
+            :param gear: current DoubleSolenoidOne value, 0 if it was never set
+            :param leftVelocity: drive encoder velocity (counts per 100 ms, forward positive)
+            :param rightVelocity: drive encoder velocity (counts per 100 ms, forward positive)
+            :param leftCurrent: drive motor output current (A)
+            :param rightCurrent: drive motor output current (A)
+            :returns: the gear to shift to, or None to stay
+        '''
+        # forward speed: turning in place is slow, that's what low gear is for
+        countsPerInch = COUNTS_PER_INCH.get(gear, COUNTS_PER_INCH[LOW_GEAR])
+        speed = abs(leftVelocity + rightVelocity) * 5.0 / countsPerInch
+        self.speed += SPEED_FILTER * (speed - self.speed)
+
+        if self.lastShift is not None and now - self.lastShift < MIN_SHIFT_INTERVAL:
+            return None
+
+        if gear == HIGH_GEAR:
+            if max(leftCurrent, rightCurrent) > PUSH_CURRENT and self.speed < PUSH_SPEED:
+                return self._shift(now, LOW_GEAR, 'Pushing')
+            if self.speed < DOWNSHIFT_SPEED:
+                return self._shift(now, LOW_GEAR, 'Slow')
+        elif gear == LOW_GEAR:
+            if self.speed > UPSHIFT_SPEED:
+                return self._shift(now, HIGH_GEAR, 'Fast')
+        else:
+            # neutral, the solenoid was never set
+            return self._shift(now, HIGH_GEAR if self.speed > UPSHIFT_SPEED else LOW_GEAR, 'Start')
+        return None
+
+    def _shift(self, now, gear, reason):
+        self.lastShift = now
+        self.reason = reason
+        return gear
+
+    def shifted(self, now):
+        ''' Records a shift made by the drivers, auto-shifting waits the minimum interval after it. '''
+        self.lastShift = now
+        self.reason = 'Driver'
+
+    def reset(self):
+        self.speed = 0.0
+        self.lastShift = None
+        self.reason = ''
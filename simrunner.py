@@ -0,0 +1,253 @@
+'''
+Headless match simulator.
+
+Runs MyRobot and the PhysicsEngine from physics.py through full practice
+matches (15 s autonomous + 135 s teleop) on pyfrc's simulated clock, so a
+match takes a few seconds instead of two and a half minutes. Each scenario
+is a script of joystick / button box inputs; scenarios run in parallel, one
+fresh process per scenario since the simulated HAL is global state.
+
+    python simrunner.py                 # all built-in scenarios
+    python simrunner.py -j 4 --json results.json
+    python simrunner.py --scenarios my_scenarios.json
+
+A scenario file is a JSON list of {"name": ..., "events": [...]} where each
+event is [time, port, "axis"|"button", index, value].
+'''
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import multiprocessing
+
+from robotmap import LEVELS
+
+ROBOT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# joystick ports (see robot.py)
+LEFT_STICK, RIGHT_STICK, XBOX, BUTTON_BOX = 0, 1, 2, 3
+
+AUTO_LENGTH = 15.0
+MATCH_LENGTH = 150.0
+
+# counts from a level that count as having reached it
+REACH_TOLERANCE = 5
+
+
+def press(t, port, button, hold=0.1):
+    ''' Events for tapping a button. '''
+    return [[t, port, 'button', button, True], [t + hold, port, 'button', button, False]]
+
+
+def level_scenario(index):
+    ''' Select a button box level in teleop, then return to the bottom. '''
+    name, _ = LEVELS[index]
+    events = press(AUTO_LENGTH + 1.0, BUTTON_BOX, index + 1)
+    events += press(AUTO_LENGTH + 10.0, BUTTON_BOX, 7)
+    return {'name': 'lift ' + name, 'events': events}
+
+
+def drive_scenario():
+    ''' Full speed forward in both gears, then a turn in place. '''
+    events = []
+    for t, left, right in ((AUTO_LENGTH + 1.0, -1.0, -1.0), (AUTO_LENGTH + 4.0, 0.0, 0.0),
+                           (AUTO_LENGTH + 6.0, 1.0, -1.0), (AUTO_LENGTH + 8.0, 0.0, 0.0)):
+        events.append([t, LEFT_STICK, 'axis', 1, left])
+        events.append([t, RIGHT_STICK, 'axis', 1, right])
+    events += press(AUTO_LENGTH + 2.0, RIGHT_STICK, 1)    # shift to high gear mid-run
+    return {'name': 'drive', 'events': events}
+
+
+def builtin_scenarios():
+    scenarios = [level_scenario(index) for index in range(len(LEVELS))]
+    scenarios.append(drive_scenario())
+    return scenarios
+
+
+class MetricRecorder(object):
+    ''' Applies scripted inputs and collects metrics, one call per simulated loop. '''
+
+    def __init__(self, scenario, robot, hal_data):
+        self.robot = robot
+        self.hal_data = hal_data
+        self.events = sorted(scenario['events'], key=lambda event: event[0])
+        self.next = 0
+
+        self.target = None
+        self.direction = 1
+        self.pressTime = None
+        self.reached = None
+        self.overshoot = 0
+        self.liftMetrics = []
+        self.maxSpeed = 0
+
+    def __call__(self, tm):
+        # scripted driver input
+        while self.next < len(self.events) and self.events[self.next][0] <= tm:
+            _, port, kind, index, value = self.events[self.next]
+            joystick = self.hal_data['joysticks'][port]
+            if kind == 'axis':
+                joystick['axes'][index] = value
+            else:
+                joystick['buttons'][index] = value
+            self.next += 1
+
+        self._recordLift(tm)
+
+        speed = max(abs(self.robot.state.leftVelocity), abs(self.robot.state.rightVelocity))
+        self.maxSpeed = max(self.maxSpeed, speed)
+        return tm < MATCH_LENGTH
+
+    def _recordLift(self, tm):
+        goal = self.robot.liftSystem.goal
+        count = self.robot.liftEncoder.get()
+
+        if goal != self.target:
+            self._closeLift()
+            self.target = goal
+            self.pressTime = tm
+            self.reached = None
+            self.overshoot = 0
+            if goal is not None:
+                # overshoot is measured past the target in the direction of the move
+                self.direction = 1 if goal >= count else -1
+        if self.target is None:
+            return
+
+        if self.reached is None and abs(count - self.target) <= REACH_TOLERANCE:
+            self.reached = tm - self.pressTime
+        if self.reached is not None:
+            self.overshoot = max(self.overshoot, (count - self.target) * self.direction)
+
+    def _closeLift(self):
+        if self.target is not None:
+            self.liftMetrics.append({'target': self.target,
+                                     'reach_time': self.reached,
+                                     'overshoot': self.overshoot})
+
+    def result(self):
+        self._closeLift()
+        self.target = None
+        profiler = self.robot.profiler
+        loop = profiler.loop.stats()
+        return {
+            'lift': self.liftMetrics,
+            'max_encoder_speed': self.maxSpeed,
+            'loop_p50_ms': loop[0] * 1000,
+            'loop_p99_ms': loop[1] * 1000,
+            'loop_max_ms': loop[2] * 1000,
+            'overruns': profiler.overruns,
+            'loops': profiler.loops,
+            'log': self.robot.matchLog.path,
+        }
+
+
+def test_scenario(control, robot, hal_data):
+    ''' Entry point run by pytest inside a worker, see run_scenario(). '''
+    scenario = json.loads(os.environ['SIMRUNNER_PAYLOAD'])
+    recorder = MetricRecorder(scenario, robot, hal_data)
+
+    control.set_practice_match()
+    control.run_test(recorder)
+
+    with open(os.environ['SIMRUNNER_RESULT'], 'w') as fp:
+        json.dump(recorder.result(), fp)
+
+
+def run_harness(test_file, payload, robot_path=None):
+    '''
+        Runs the tests of test_file in this process under the pyfrc test
+        harness, the same one 'robot.py test' uses.
+
+        :param payload: JSON-able input, read by the test from $SIMRUNNER_PAYLOAD
+        :param robot_path: directory the harness loads physics.py from
+        :returns: (passed, dict the test wrote to $SIMRUNNER_RESULT)
+    '''
+    import pytest
+    from pyfrc.test_support.pytest_plugin import PyFrcPlugin
+    from robot import MyRobot
+
+    robot_file = os.path.join(ROBOT_PATH, 'robot.py')
+    if robot_path is None:
+        robot_path = ROBOT_PATH
+
+    fd, result_file = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    os.environ['SIMRUNNER_PAYLOAD'] = json.dumps(payload)
+    os.environ['SIMRUNNER_RESULT'] = result_file
+
+    try:
+        code = pytest.main([os.path.abspath(test_file), '-q', '-p', 'no:cacheprovider'],
+                           plugins=[PyFrcPlugin(MyRobot, robot_file, robot_path)])
+        with open(result_file) as fp:
+            content = fp.read()
+        result = json.loads(content) if content else {}
+    finally:
+        os.remove(result_file)
+
+    return code == 0, result
+
+
+def run_scenario(scenario):
+    ''' Runs one scenario in this process. '''
+    passed, result = run_harness(__file__, scenario)
+    result['name'] = scenario['name']
+    result['passed'] = passed
+    return result
+
+
+def run_pool(function, items, jobs=None):
+    ''' Maps function over items in a process pool, one fresh process per item. '''
+    pool = multiprocessing.Pool(processes=jobs, maxtasksperchild=1)
+    try:
+        return pool.map(function, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_all(scenarios, jobs=None):
+    ''' Runs every scenario across a process pool. '''
+    return run_pool(run_scenario, scenarios, jobs)
+
+
+def format_results(results):
+    lines = ['%-16s %6s %9s %9s %9s %8s' % ('scenario', 'ok', 'loop p99', 'loop max', 'overruns', 'lift')]
+    for result in results:
+        lift = ', '.join('%d:%s/%+d' % (m['target'],
+                                         '%.2fs' % m['reach_time'] if m['reach_time'] is not None else 'never',
+                                         m['overshoot'])
+                         for m in result.get('lift', []))
+        lines.append('%-16s %6s %9.3f %9.3f %9d  %s' % (result['name'], 'yes' if result['passed'] else 'NO',
+                                                     result.get('loop_p99_ms', 0), result.get('loop_max_ms', 0),
+                                                     result.get('overruns', 0), lift))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--scenarios', help='JSON file of scenarios instead of the built-in ones')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    if args.scenarios:
+        with open(args.scenarios) as fp:
+            scenarios = json.load(fp)
+    else:
+        scenarios = builtin_scenarios()
+
+    results = run_all(scenarios, args.jobs)
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+    return 0 if all(result['passed'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+'''
+Subsystems of the robot for the command scheduler.
+
+Each subsystem owns a mechanism the commands in commands.py drive; a
+command requires the subsystems it moves, so two commands never fight over
+the same motors or solenoid. The hardware itself is still created in
+robotInit, the subsystems wrap it.
+'''
+
+from wpilib.command import Subsystem
+
+from ranging import RangeFinder
+
+
+class Drivetrain(Subsystem):
+    ''' Tank drive train, with the pose and auto-align helpers it feeds. '''
+
+    def __init__(self, robot):
+        super().__init__('Drivetrain')
+        self.robot = robot
+        self.drive = robot.drive
+
+    def stop(self):
+        self.drive.tankDrive(0, 0, False)
+
+    def periodic(self):
+        # heading history for the vision latency compensation, every loop
+        robot = self.robot
+        robot.autoAlign.recordHeading(robot.state.timestamp, robot.odometry.getHeading())
+        robot.telemetry.putString("Auto Align: ", robot.autoAlign.status)
+
+
+class LiftSubsystem(Subsystem):
+    ''' The elevator, driven through the closed-loop lift controller (lift.py). '''
+
+    def __init__(self, liftSystem):
+        super().__init__('Lift')
+        self.liftSystem = liftSystem
+
+
+class FourBarSubsystem(Subsystem):
+    ''' The four-bar, driven through the closed-loop four-bar controller (fourbar.py). '''
+
+    def __init__(self, fourBarSystem):
+        super().__init__('FourBar')
+        self.fourBarSystem = fourBarSystem
+
+
+class Motor(Subsystem):
+    ''' A mechanism run open-loop by one speed controller (group). '''
+
+    def __init__(self, name, motor):
+        super().__init__(name)
+        self.motor = motor
+
+    def set(self, output):
+        self.motor.set(output)
+
+
+class Ranging(Subsystem):
+    ''' The two ultrasonics, filtered every loop (ranging.py). '''
+
+    def __init__(self, robot):
+        super().__init__('Ranging')
+        self.robot = robot
+        self.playerStation = RangeFinder('Player Station', robot.ultrasonic)
+        self.cargo = RangeFinder('Cargo', robot.cargoUltrasonic)
+
+    def periodic(self):
+        robot = self.robot
+        self.playerStation.update(robot.state.ultrasonicVoltage)
+        self.cargo.update(robot.state.cargoUltrasonicVoltage)
+        self.playerStation.publish(robot.telemetry)
+        self.cargo.publish(robot.telemetry)
+
+
+class Pneumatic(Subsystem):
+    ''' A mechanism moved by one double solenoid. '''
+
+    def __init__(self, name, solenoid):
+        super().__init__(name)
+        self.solenoid = solenoid
+
+    def set(self, value):
+        self.solenoid.set(value)
@@ -0,0 +1,94 @@
+'''
+Change-only SmartDashboard publisher.
+
+Values are cached per key and only written to NetworkTables when they
+change, at most once per key's minimum period. Everything queued during a
+loop goes out in a single flush() at the end of the loop.
+'''
+
+import wpilib
+from networktables import NetworkTables
+
+
+class Telemetry(object):
+    ''' Caches dashboard values and batches the writes that actually change something. '''
+
+    def __init__(self, table, defaultPeriod=0.0):
+        '''
+            :param table: NetworkTable to publish to (usually SmartDashboard)
+            :param defaultPeriod: minimum seconds between writes of one key
+        '''
+        self.table = table
+        self.defaultPeriod = defaultPeriod
+
+        # per key state
+        self.lastValue = {}
+        self.lastSent = {}
+        self.periods = {}
+        self.putters = {}
+        self.pending = {}
+
+        # bandwidth counters
+        self.requested = 0
+        self.sent = 0
+
+    def setMaxRate(self, key, hz):
+        ''' Limits how often a single key may be written, in writes per second. '''
+        self.periods[key] = 1.0 / hz if hz > 0 else 0.0
+
+    def putString(self, key, value):
+        self._put(key, value, self.table.putString)
+
+    def putNumber(self, key, value):
+        self._put(key, value, self.table.putNumber)
+
+    def putBoolean(self, key, value):
+        self._put(key, value, self.table.putBoolean)
+
+    def _put(self, key, value, putter):
+        ''' Queues a value for the next flush unless it is already on the dashboard. '''
+        self.requested += 1
+        self.putters[key] = putter
+        if key in self.lastValue and self.lastValue[key] == value:
+            # back to what the dashboard already shows
+            self.pending.pop(key, None)
+        else:
+            self.pending[key] = value
+
+    def flush(self, now=None):
+        ''' Writes all queued changes whose rate limit has elapsed, then flushes NetworkTables. '''
+        if not self.pending:
+            return 0
+
+        if now is None:
+            now = wpilib.Timer.getFPGATimestamp()
+
+        written = 0
+        for key in list(self.pending):
+            period = self.periods.get(key, self.defaultPeriod)
+            if key in self.lastSent and now - self.lastSent[key] < period:
+                continue    # keep it queued until the key may be sent again
+
+            value = self.pending.pop(key)
+            self.putters[key](key, value)
+            self.lastValue[key] = value
+            self.lastSent[key] = now
+            written += 1
+
+        if written:
+            self.sent += written
+            NetworkTables.flush()
+        return written
+
+    def getSent(self):
+        ''' Number of writes that went out to NetworkTables. '''
+        return self.sent
+
+    def getSkipped(self):
+        ''' Number of put calls that never had to be written. '''
+        return self.requested - self.sent - len(self.pending)
+
+    def reset(self):
+        ''' Forgets the cached values so everything is re-sent on the next flush. '''
+        self.lastValue.clear()
+        self.lastSent.clear()
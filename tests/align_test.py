@@ -0,0 +1,98 @@
+'''
+    Tests of vision auto-align: the heading history and the vision latency compensation.
+'''
+
+import pytest
+
+from align import MAX_AGE, AutoAlign
+
+
+class FakeTable(object):
+    ''' Vision table stand-in, keeps the entry listener. '''
+
+    def __init__(self):
+        self.listener = None
+
+    def addEntryListener(self, listener, key=None):
+        self.listener = listener
+
+
+class FakeDrive(object):
+
+    def __init__(self):
+        self.outputs = None
+
+    def tankDrive(self, left, right, squareInputs):
+        self.outputs = left, right
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _align(historySize=64):
+    return AutoAlign(FakeDrive(), FakeTable(), Clock(), historySize=historySize)
+
+
+def test_heading_is_interpolated_between_samples():
+    align = _align()
+    align.recordHeading(1.00, 10.0)
+    align.recordHeading(1.02, 20.0)
+    align.recordHeading(1.04, 20.0)
+
+    assert align.headingAt(1.00) == 10.0
+    assert align.headingAt(1.01) == pytest.approx(15.0)
+    assert align.headingAt(1.03) == pytest.approx(20.0)
+    assert align.headingAt(2.00) == 20.0    # newer than the history: the latest heading
+    assert align.headingAt(0.50) == 10.0    # older: the oldest one
+
+
+def test_history_wraps_around():
+    align = _align(historySize=4)
+    for i in range(10):
+        align.recordHeading(i * 0.02, float(i))
+    assert align.headingAt(0.13) == pytest.approx(6.5)
+    assert align.headingAt(0.0) == 6.0      # samples 0-5 are gone
+
+
+def test_empty_history():
+    assert _align().headingAt(1.0) == 0.0
+
+
+def _turning(align):
+    ''' Robot turning clockwise at 100 deg/s from 0.9 s to 1.1 s. '''
+    for i in range(11):
+        t = 0.9 + i * 0.02
+        align.recordHeading(t, 100.0 * (t - 0.9))
+
+
+def test_vision_angle_applies_to_the_heading_at_capture():
+    align = _align()
+    _turning(align)
+
+    # arrives at 1.1 s, taken 100 ms earlier when the heading was 10 deg
+    align.clock.now = 1.1
+    align.visionTable.listener(None, 'target', (1.0, 5.0, 60.0, 0.0, 0.1), False)
+    align.update(1.1, 20.0, 2.0, (0.7, 1.56))
+    assert align.targetHeading == pytest.approx(15.0)
+    assert align.lastSample == pytest.approx(1.0)
+
+    # already 5 deg past the target: turns back counter-clockwise
+    left, right = align.drive.outputs
+    assert left < right
+    assert align.status == "Aligning"
+
+
+def test_old_samples_are_ignored():
+    align = _align()
+    _turning(align)
+    align.clock.now = 1.1
+    align.visionTable.listener(None, 'target', (1.0, 5.0, 60.0, 0.0, MAX_AGE + 0.1), False)
+    assert not align.update(1.1, 20.0, 2.0, (0.7, 1.56))
+    assert align.status == "No Target"
+    assert align.drive.outputs == (0, 0)
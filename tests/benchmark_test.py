@@ -0,0 +1,123 @@
+'''
+    Benchmarks of the periodic control loop against the simulated HAL.
+
+    Each benchmark times thousands of loop iterations with typical driver
+    input and compares the per-iteration cost against a saved baseline in
+    benchmark_baseline.json. Baselines are kept per CPU architecture, so
+    laptop and roboRIO numbers don't mix. A benchmark without a baseline
+    for this architecture passes with a warning that shows its timing; a
+    baseline is only ever saved on request.
+
+    Save new baselines with:    BENCH_SAVE=1 python robot.py test -- -k benchmark
+    Allowed regression:         BENCH_THRESHOLD=0.25 (default, 25% slower)
+'''
+
+import os
+import json
+import time
+import platform
+import warnings
+
+import pytest
+
+from driveshaping import DriveShaper
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+ITERATIONS = 2000
+THRESHOLD = float(os.environ.get('BENCH_THRESHOLD', '0.25'))
+
+# (left stick y, right stick y, xbox buttons held, xbox lift axis) cycled through every iteration
+INPUT_PATTERNS = (
+    (0.0, 0.0, (), 0.0),            # idle
+    (-1.0, -1.0, (), 0.0),          # full forward
+    (-0.6, 0.4, (), 0.0),           # turning
+    (-0.3, -0.3, (3,), 0.5),        # driving while lifting and opening the claw
+    (0.0, 0.0, (5, 6), 0.0),        # holding lift and four-bar
+)
+
+
+def _load_baselines():
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE) as fp:
+        return json.load(fp)
+
+
+def _check(name, perIteration):
+    ''' Compares a per-iteration cost (s) with the saved baseline, or saves it with BENCH_SAVE. '''
+    baselines = _load_baselines()
+    arch = baselines.setdefault(platform.machine(), {})
+
+    if os.environ.get('BENCH_SAVE'):
+        arch[name] = perIteration
+        with open(BASELINE_FILE, 'w') as fp:
+            json.dump(baselines, fp, indent=2, sort_keys=True)
+        return
+
+    if name not in arch:
+        warnings.warn('no %s baseline for %s, nothing to compare %.1f us per loop with; '
+                      'save one with BENCH_SAVE=1' % (name, platform.machine(), perIteration * 1e6))
+        return
+
+    limit = arch[name] * (1 + THRESHOLD)
+    assert perIteration <= limit, '%s: %.1f us per loop, baseline %.1f us (+%d%% allowed)' % (
+        name, perIteration * 1e6, arch[name] * 1e6, THRESHOLD * 100)
+
+
+def _apply(hal_data, pattern):
+    left, right, buttons, liftAxis = pattern
+    hal_data['joysticks'][0]['axes'][1] = left
+    hal_data['joysticks'][1]['axes'][1] = right
+    xbox = hal_data['joysticks'][2]
+    for button in range(1, 11):
+        xbox['buttons'][button] = button in buttons
+    xbox['axes'][3] = liftAxis
+
+
+def _time_loop(robot, hal_data, periodic):
+    patterns = len(INPUT_PATTERNS)
+    elapsed = 0.0
+    for i in range(ITERATIONS):
+        _apply(hal_data, INPUT_PATTERNS[i % patterns])
+        start = time.perf_counter()
+        periodic()
+        robot.robotPeriodic()
+        elapsed += time.perf_counter() - start
+    return elapsed / ITERATIONS
+
+
+@pytest.fixture
+def initialized(robot, fake_time):
+    robot.robotInit()
+    yield robot
+
+    for notifier in (robot.liftSystem.notifier, robot.fourBarSystem.notifier, robot.odometry.notifier,
+                     robot.power.notifier):
+        notifier.stop()
+    robot.matchLog.stop()
+
+    # the gyro calibrates on the simulated clock: run it to the end
+    for _ in range(100):
+        if not robot.gyroThread.is_alive():
+            break
+        fake_time.increment_time_by(0.1)
+
+
+def test_benchmark_teleop(initialized, hal_data):
+    initialized.teleopInit()
+    _check('teleopPeriodic', _time_loop(initialized, hal_data, initialized.teleopPeriodic))
+
+
+def test_benchmark_autonomous(initialized, hal_data):
+    initialized.autonomousInit()
+    _check('autonomousPeriodic', _time_loop(initialized, hal_data, initialized.autonomousPeriodic))
+
+
+def test_benchmark_drive_shaping():
+    shaper = DriveShaper()
+    axes = [i / 50.0 - 1.0 for i in range(101)]
+    start = time.perf_counter()
+    for _ in range(ITERATIONS // 10):
+        for axis in axes:
+            shaper.tank(axis, -axis, 1, 0.0)
+    _check('driveShaping', (time.perf_counter() - start) / (ITERATIONS // 10 * len(axes)))
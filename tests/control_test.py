@@ -0,0 +1,119 @@
+'''
+    Tests of the profiled controllers: subclassing, and a faulted lift or four-bar handing control back to the driver.
+'''
+
+import pytest
+
+from control import FAULT_TIME, ProfiledController
+from fourbar import FourBar
+from lift import Lift, LiftGains
+from robotmap import LEVELS
+
+
+class FakeMotor(object):
+
+    def __init__(self):
+        self.output = None
+
+    def set(self, output):
+        self.output = output
+
+
+class FakeEncoder(object):
+
+    def __init__(self, count=0):
+        self.count = count
+
+    def get(self):
+        return self.count
+
+    def reset(self):
+        self.count = 0
+
+
+class FakeState(object):
+    liftCount = 0
+    hall = False
+
+
+def _fault(controller):
+    ''' Falls far behind the profile without getting closer for FAULT_TIME. '''
+    error = controller.gains.maxFollowingError * 2
+    controller._watch(0.0, 0.0, error)
+    controller._watch(FAULT_TIME, 0.0, error)
+    assert controller.faulted
+
+
+def _buttons(index):
+    buttonStatus = [False] * (len(LEVELS) + 1)
+    buttonStatus[index] = True
+    return buttonStatus
+
+
+def _lift():
+    # closed-loop, but without starting the Notifier: the test runs the steps
+    lift = Lift(FakeMotor(), FakeEncoder(), closedLoop=False)
+    lift.closedLoop = True
+    return lift
+
+
+def test_lift_fault_hands_control_back():
+    lift = _lift()
+    buttonStatus = _buttons(3)
+    assert lift.step(buttonStatus, FakeState())
+    assert lift.goal == lift.getTarget(3)
+
+    _fault(lift)
+    assert lift.motor.output == 0
+    assert not lift.step(buttonStatus, FakeState())
+    assert True not in buttonStatus
+
+    # LiftControl runs manual control once no level is selected
+    lift.manual(0.4)
+    assert lift.motor.output == 0.4
+
+    # a level pressed again is dropped until the robot is disabled
+    buttonStatus[1] = True
+    assert not lift.step(buttonStatus, FakeState())
+    assert not buttonStatus[1]
+
+    lift.reset()
+    buttonStatus[1] = True
+    assert lift.step(buttonStatus, FakeState())
+    assert lift.goal == lift.getTarget(1)
+
+
+def test_four_bar_presets_are_off_by_default():
+    fourBar = FourBar(FakeMotor(), FakeEncoder())
+    fourBar.notifier.stop()
+    buttonStatus = _buttons(0)
+    assert not fourBar.step(buttonStatus)
+    assert fourBar.goal is None
+
+    fourBar.setPresetsEnabled(True)
+    assert fourBar.step(buttonStatus)
+    assert fourBar.goal == fourBar.presets[0]
+
+
+def test_four_bar_fault_hands_control_back():
+    fourBar = FourBar(FakeMotor(), FakeEncoder())
+    fourBar.notifier.stop()
+    fourBar.setPresetsEnabled(True)
+    buttonStatus = _buttons(0)
+    assert fourBar.step(buttonStatus)
+
+    _fault(fourBar)
+    assert not fourBar.step(buttonStatus)
+    assert buttonStatus[0]      # still the lift's to clear
+
+    fourBar.manual(0.2)
+    assert fourBar.motor.output > 0
+
+
+def test_incomplete_controller_cannot_be_built():
+    class NoOutput(ProfiledController):
+        def measure(self):
+            return 0.0
+
+    with pytest.raises(TypeError):
+        NoOutput('test', FakeMotor(), LiftGains(), 0.005, start=False)
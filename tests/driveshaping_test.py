@@ -0,0 +1,64 @@
+'''
+    Tests of driver input shaping: the lookup table against the original tank drive curve.
+'''
+
+import pytest
+
+from driveshaping import DriveShaper, TABLE_SIZE, curve
+
+
+def _original(axis):
+    ''' The original tank drive: the axis squared and divided by 1.2, squared again by squareInputs. '''
+    value = (axis * axis / 1.2) ** 2
+    return value if axis >= 0 else -value
+
+
+AXES = [i / 500.0 - 1.0 for i in range(1001)]
+
+
+@pytest.mark.parametrize('gear', (1, 2))
+def test_defaults_match_the_original_curve(gear):
+    shaper = DriveShaper()
+    for axis in AXES:
+        left, right = shaper.tank(axis, -axis, gear, 0.0)
+        assert left == pytest.approx(_original(axis), abs=1e-4)
+        assert right == pytest.approx(_original(-axis), abs=1e-4)
+
+
+def test_table_matches_the_curve():
+    # interpolating across the corner at the deadband is off by up to one table step
+    shaper = DriveShaper(deadband=0.1, exponent=3.0, weight=0.5)
+    for axis in AXES:
+        expected = curve(abs(axis), 0.1, 3.0, 0.0, 0.5)
+        assert abs(shaper.shape(axis)) == pytest.approx(expected, abs=1.0 / (TABLE_SIZE - 1))
+
+
+def test_deadband_and_saturation():
+    shaper = DriveShaper(deadband=0.1)
+    assert shaper.shape(0.05) == 0.0
+    assert shaper.shape(-0.09) == 0.0
+    assert shaper.shape(1.0) == 1.0
+    assert shaper.shape(-1.5) == -1.0
+
+
+def test_neutral_gear_is_unscaled():
+    shaper = DriveShaper()
+    assert shaper.tank(1.0, 1.0, 0, 0.0) == (1.0, 1.0)
+
+
+def test_invalid_parameters_keep_the_old_table():
+    shaper = DriveShaper()
+    table = shaper.table
+    with pytest.raises(ValueError):
+        shaper.configure(deadband=1.0)
+    assert shaper.table is table
+    assert shaper.params['deadband'] == 0.0
+
+
+def test_slew_rate():
+    shaper = DriveShaper(slewRate=2.0, highGearScale=1.0)
+    assert shaper.tank(1.0, 1.0, 1, 0.0) == (0.0, 0.0)     # starts from rest
+    left, _ = shaper.tank(1.0, 1.0, 1, 0.1)
+    assert left == pytest.approx(0.2)
+    shaper.reset()
+    assert shaper.tank(1.0, 1.0, 1, 5.0) == (0.0, 0.0)
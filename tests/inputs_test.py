@@ -0,0 +1,135 @@
+'''
+    Tests of the driver station input layer: debouncing and event dispatch.
+'''
+
+from inputs import Inputs, LEFT_STICK, XBOX, PRESSED, RELEASED, HELD
+
+
+class FakeDS(object):
+    ''' DriverStation stand-in, buttons as one bitmask per port. '''
+
+    def __init__(self, ports=4):
+        self.masks = [0] * ports
+        self.axisValues = [[0.0] * 6 for _ in range(ports)]
+
+    def getStickButtons(self, port):
+        return self.masks[port]
+
+    def getStickAxis(self, port, axis):
+        return self.axisValues[port][axis]
+
+    def press(self, port, *buttons):
+        for button in buttons:
+            self.masks[port] |= 1 << (button - 1)
+
+    def release(self, port, *buttons):
+        for button in buttons:
+            self.masks[port] &= ~(1 << (button - 1))
+
+
+def _recorder(inputs, port, button, event):
+    calls = []
+    inputs.bind(port, button, event, lambda: calls.append(1))
+    return calls
+
+
+def test_press_and_release_dispatch_once():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0))
+    pressed = _recorder(inputs, XBOX, 3, PRESSED)
+    released = _recorder(inputs, XBOX, 3, RELEASED)
+
+    ds.press(XBOX, 3)
+    for _ in range(3):
+        inputs.update()
+    assert len(pressed) == 1
+    assert not released
+    assert inputs.button(XBOX, 3)
+
+    ds.release(XBOX, 3)
+    inputs.update()
+    inputs.update()
+    assert len(pressed) == 1
+    assert len(released) == 1
+    assert not inputs.button(XBOX, 3)
+
+
+def test_held_fires_every_loop():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0))
+    held = _recorder(inputs, XBOX, 5, HELD)
+
+    ds.press(XBOX, 5)
+    for _ in range(4):
+        inputs.update()
+    ds.release(XBOX, 5)
+    inputs.update()
+    assert len(held) == 4
+
+
+def test_simultaneous_presses_dispatch_in_the_same_loop():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0))
+    calls = []
+    for button in (1, 4, 10):
+        inputs.bind(XBOX, button, PRESSED, lambda button=button: calls.append(button))
+
+    ds.press(XBOX, 1, 4, 10)
+    inputs.update()
+    assert sorted(calls) == [1, 4, 10]
+
+
+def test_unbound_and_other_port_buttons_are_ignored():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0))
+    pressed = _recorder(inputs, XBOX, 2, PRESSED)
+
+    ds.press(LEFT_STICK, 2)
+    ds.press(XBOX, 7)
+    inputs.update()
+    assert not pressed
+    assert inputs.button(LEFT_STICK, 2)
+
+
+def test_debounce_waits_for_a_stable_press():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0), debounce={XBOX: 3})
+    pressed = _recorder(inputs, XBOX, 1, PRESSED)
+
+    ds.press(XBOX, 1)
+    inputs.update()
+    inputs.update()
+    assert not pressed
+    assert not inputs.button(XBOX, 1)
+    inputs.update()
+    assert len(pressed) == 1
+    assert inputs.button(XBOX, 1)
+
+
+def test_debounce_restarts_after_a_bounce():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0), debounce={XBOX: 3})
+    pressed = _recorder(inputs, XBOX, 1, PRESSED)
+
+    ds.press(XBOX, 1)
+    inputs.update()
+    inputs.update()
+    ds.release(XBOX, 1)     # bounced back before it counted
+    inputs.update()
+    ds.press(XBOX, 1)
+    inputs.update()
+    inputs.update()
+    assert not pressed
+    inputs.update()
+    assert len(pressed) == 1
+
+
+def test_raw_buttons_and_axes():
+    ds = FakeDS()
+    inputs = Inputs(ds, (3, 3, 6, 0), debounce={XBOX: 3})
+    ds.press(XBOX, 2)
+    ds.axisValues[XBOX][3] = 0.5
+    inputs.update()
+    assert inputs.buttons(XBOX) == 0b10     # before debouncing
+    assert not inputs.button(XBOX, 2)
+    assert inputs.axis(XBOX, 3) == 0.5
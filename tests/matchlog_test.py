@@ -0,0 +1,180 @@
+'''
+    Tests of the match logger: records written on the robot read back by the offline tools.
+'''
+
+import time
+import struct
+
+import pytest
+
+from inputs import Inputs
+from matchlog import MAGIC, MatchLogger, readHeader, readLog, VERSION, FIELD_NAMES
+from sensors import SensorSnapshot
+
+
+class FakeDS(object):
+    ''' DriverStation stand-in: xbox buttons 3 and 5 held, left stick half forward. '''
+
+    def getStickButtons(self, port):
+        return 0b10100 if port == 2 else 0
+
+    def getStickAxis(self, port, axis):
+        return -0.5 if (port, axis) == (0, 1) else 0.0
+
+
+class Value(object):
+    ''' Speed controller / chooser stand-in. '''
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def getSelected(self):
+        return self.value
+
+
+class FakeRobot(object):
+    ''' Just the robot attributes MatchLogger.record reads. '''
+
+    def __init__(self):
+        self.inputs = Inputs(FakeDS(), (3, 3, 6, 0))
+        self.inputs.update()
+        self.buttonStatus = [False, True, False, False, False, False, True]
+
+        state = self.state = SensorSnapshot()
+        state.timestamp = 12.5
+        state.leftPosition, state.rightPosition = 1000, 1010
+        state.leftVelocity, state.rightVelocity = 50, 52
+        state.leftCurrent, state.rightCurrent = 31.5, 30.0
+        state.liftCount, state.liftArmCount = 237, -512
+        state.hall = True
+        state.compressorEnabled = True
+        state.gear = 1
+        state.gyroAngle = 45.25
+
+        self.frontLeftMotor = self.rearLeftMotor = Value(0.25)
+        self.frontRightMotor = self.rearRightMotor = Value(-0.25)
+        self.liftOne, self.liftArmOne, self.cargo = Value(0.3), Value(0.1), Value(0.0)
+        self.driveModeChooser = Value('Curvature')
+        self.shiftModeChooser = Value(None)
+
+        self.DS = self
+        self.odometry = self
+        self.profiler = self
+        self.loop = self
+        self.power = self
+        self.batteryVoltage = 11.75
+        self.current = 120.0
+        self.currents = [float(channel) for channel in range(16)]
+
+    def isAutonomous(self):
+        return False
+
+    def isOperatorControl(self):
+        return True
+
+    def isTest(self):
+        return False
+
+    def getGameSpecificMessage(self):
+        return 'LRL'
+
+    def getPose(self):
+        return 12.0, -3.0, 0.5
+
+    def last(self):
+        return 0.02
+
+
+def _written(logger, robot, records):
+    for _ in range(records):
+        logger.record(robot)
+    path, fp = logger.path, logger.file
+    logger.close()
+    deadline = time.time() + 5.0
+    while not fp.closed and time.time() < deadline:
+        time.sleep(0.01)
+    assert fp.closed
+    return path
+
+
+def test_round_trip(tmp_path):
+    pytest.importorskip('numpy')
+    robot = FakeRobot()
+    logger = MatchLogger(str(tmp_path), recordsPerBuffer=4)
+    logger.open(robot)
+    path = _written(logger, robot, 10)     # two full buffers and a partial one
+
+    with open(path, 'rb') as fp:
+        version, _, names = readHeader(fp)
+    assert version == VERSION
+    assert tuple(names) == FIELD_NAMES
+
+    log = readLog(path)
+    assert len(log) == 10
+    record = log[-1]
+    assert record['timestamp'] == 12.5
+    assert record['mode'] == 2
+    assert record['leftY'] == -0.5
+    assert record['xboxButtons'] == 0b10100
+    assert record['buttonStatus'] == 0b1000010
+    assert record['gameMessage'] == b'LRL'
+    assert record['driveMode'] == b'Curvature'
+    assert record['shiftMode'] == b''
+    assert record['frontRight'] == -0.25
+    assert record['rightPosition'] == 1010
+    assert record['leftCurrent'] == 31.5
+    assert record['liftArmCount'] == -512
+    assert record['hall'] == 1
+    assert record['gyroAngle'] == 45.25
+    assert record['poseTheta'] == 0.5
+    assert record['batteryVoltage'] == 11.75
+    assert record['totalCurrent'] == 120.0
+    assert record['pdp15'] == 15.0
+
+
+def test_logs_are_never_overwritten(tmp_path):
+    robot = FakeRobot()
+    logger = MatchLogger(str(tmp_path))
+    paths = set()
+    for _ in range(3):
+        logger.open(robot)
+        paths.add(_written(logger, robot, 1))
+    assert len(paths) == 3
+
+
+def test_records_are_dropped_rather_than_blocking(tmp_path):
+    robot = FakeRobot()
+    logger = MatchLogger(str(tmp_path), recordsPerBuffer=1, buffers=1)
+    logger.open(robot)
+    logger.free.get()   # the only buffer is busy
+    logger.record(robot)
+    assert logger.dropped == 1
+    logger.free.put(bytearray(logger.bufferSize))
+    logger.close()
+
+
+def test_other_versions_are_rejected(tmp_path):
+    pytest.importorskip('numpy')
+    robot = FakeRobot()
+    logger = MatchLogger(str(tmp_path))
+    logger.open(robot)
+    path = _written(logger, robot, 1)
+
+    with open(path, 'r+b') as fp:
+        fp.seek(len(MAGIC))
+        fp.write(struct.pack('<H', VERSION + 1))
+    with pytest.raises(ValueError):
+        readLog(path)
+
+
+def test_stop_closes_an_empty_log(tmp_path):
+    robot = FakeRobot()
+    logger = MatchLogger(str(tmp_path))
+    logger.open(robot)
+    fp = logger.file
+    logger.stop()
+    assert fp.closed
+    assert not logger.thread.is_alive()
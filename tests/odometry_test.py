@@ -0,0 +1,108 @@
+'''
+    Tests of the drive train odometry: integration along the heading and the encoder reset guard.
+'''
+
+from math import pi, sqrt
+
+import pytest
+
+from odometry import MAX_STEP, Odometry
+from robotmap import COUNTS_PER_INCH, HIGH_GEAR, TRACK_WIDTH
+
+COUNTS = COUNTS_PER_INCH[HIGH_GEAR]
+
+
+class FakeEncoder(object):
+
+    def __init__(self):
+        self.position = 0
+
+    def getPosition(self):
+        return self.position
+
+
+class FakeGyro(object):
+
+    def __init__(self, angle=0.0):
+        self.angle = angle
+
+    def getAngle(self):
+        return self.angle
+
+
+def _odometry(gyro=None):
+    odometry = Odometry(FakeEncoder(), FakeEncoder(), gyro, start=False)
+    odometry.update()   # takes the encoder baselines
+    return odometry
+
+
+def _drive(odometry, left, right, steps=10):
+    ''' Moves each side the given inches, in equal steps. '''
+    leftStart, rightStart = odometry.leftEncoder.position, odometry.rightEncoder.position
+    for step in range(1, steps + 1):
+        odometry.leftEncoder.position = leftStart + int(round(left * step / steps * COUNTS))
+        odometry.rightEncoder.position = rightStart + int(round(right * step / steps * COUNTS))
+        odometry.update()
+
+
+def test_straight_along_the_heading():
+    odometry = _odometry(FakeGyro())
+    _drive(odometry, 20.0, 20.0)
+    x, y, theta = odometry.getPose()
+    assert x == pytest.approx(20.0, abs=0.01)
+    assert y == pytest.approx(0.0, abs=1e-9)
+    assert theta == 0.0
+
+    # gyro counter-clockwise a quarter turn: forward is now +y
+    odometry.gyro.angle = -90.0
+    _drive(odometry, 10.0, 10.0)
+    x, y, theta = odometry.getPose()
+    assert theta == pytest.approx(pi / 2)
+    assert odometry.getHeading() == pytest.approx(-90.0)
+    # the first 1 in step turned the whole quarter, so it went along the mean heading, 45 deg
+    assert y == pytest.approx(9.0 + sqrt(0.5), abs=0.01)
+    assert x == pytest.approx(20.0 + sqrt(0.5), abs=0.01)
+
+
+def test_encoder_heading_without_gyro():
+    odometry = _odometry()
+    quarterTurn = TRACK_WIDTH * pi / 4      # each side's arc for a quarter turn in place
+    _drive(odometry, -quarterTurn, quarterTurn, steps=40)
+    x, y, theta = odometry.getPose()
+    assert theta == pytest.approx(pi / 2, abs=0.01)
+    assert x == pytest.approx(0.0, abs=0.01)
+    assert y == pytest.approx(0.0, abs=0.01)
+
+
+def test_encoder_reset_is_not_motion():
+    odometry = _odometry(FakeGyro())
+    _drive(odometry, 10.0, 10.0)
+    before = odometry.getPose()
+
+    # the Talons were zeroed (or one glitched): far more than a physical step
+    odometry.leftEncoder.position = odometry.rightEncoder.position = 0
+    odometry.update()
+    assert odometry.getPose() == before
+    odometry.leftEncoder.position += int((MAX_STEP + 1) * COUNTS)
+    odometry.update()
+    assert odometry.getPose() == before
+
+    # motion continues from the new baselines
+    odometry.rightEncoder.position = odometry.leftEncoder.position
+    odometry.update()
+    _drive(odometry, 5.0, 5.0)
+    assert odometry.getPose()[0] == pytest.approx(before[0] + 5.0, abs=0.01)
+
+
+def test_reset_and_late_gyro_keep_the_pose():
+    odometry = _odometry()
+    odometry.reset(100.0, 50.0, pi)
+    odometry.update()
+    _drive(odometry, 10.0, 10.0)
+    x, y, theta = odometry.getPose()
+    assert (x, y) == (pytest.approx(90.0, abs=0.01), pytest.approx(50.0, abs=1e-6))
+
+    # a gyro that finished calibrating mid-match doesn't jump the heading
+    odometry.setGyro(FakeGyro(37.0))
+    _drive(odometry, 1.0, 1.0, steps=1)
+    assert odometry.getPose()[2] == pytest.approx(theta)
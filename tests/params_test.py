@@ -0,0 +1,119 @@
+'''
+    Tests of the parameter registry: type coercion, saved values and rejected changes.
+'''
+
+import json
+
+import pytest
+
+from params import Parameters, SAVE_DELAY, _coerce
+
+
+@pytest.mark.parametrize('value, default, expected', (
+    (True, False, True),
+    (3.0, 1, 3),
+    (2, 0.5, 2.0),
+    ('Tank', 'Arcade', 'Tank'),
+    ([1, 2.5], (0, 0.0), (1, 2.5)),
+))
+def test_coerce(value, default, expected):
+    result = _coerce(value, default)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+@pytest.mark.parametrize('value, default', (
+    (1, False),             # not a bool
+    (2.5, 1),               # not a whole number
+    (True, 1),
+    (True, 0.5),
+    (3, 'Tank'),
+    ((1, 2, 3), (0, 0)),    # wrong length
+    (('a', 2), (0, 0)),
+))
+def test_coerce_rejects(value, default):
+    with pytest.raises((TypeError, ValueError)):
+        _coerce(value, default)
+
+
+def _registry(tmp_path, saved=None):
+    path = tmp_path / 'params.json'
+    if saved is not None:
+        path.write_text(json.dumps(saved))
+    return Parameters(str(path))
+
+
+def test_defaults_and_saved_values(tmp_path):
+    params = _registry(tmp_path, {'divisor': 3, 'levels': [1, 2], 'broken': 'x'})
+    params.define((('divisor', 2.0), ('levels', (0, 0)), ('enabled', True), ('broken', 1)))
+    assert params.divisor == 3.0
+    assert params.levels == (1, 2)
+    assert params.enabled is True
+    assert params.broken == 1       # invalid saved value falls back to the default
+
+
+def test_define_twice_is_an_error(tmp_path):
+    params = _registry(tmp_path)
+    params.define((('divisor', 2.0),))
+    with pytest.raises(ValueError):
+        params.define((('divisor', 3.0),))
+    with pytest.raises(TypeError):
+        params.define((('mapping', {}),))
+
+
+def test_set_calls_back_and_marks_dirty(tmp_path):
+    params = _registry(tmp_path)
+    params.define((('divisor', 2.0),))
+    seen = []
+    params.onChange('divisor', seen.append)
+
+    params.set('divisor', 4)
+    assert params.divisor == 4.0
+    assert seen == [4.0]
+    assert params.dirty
+
+
+def test_rejected_change_keeps_the_old_value(tmp_path):
+    params = _registry(tmp_path)
+    params.define((('limits', (-35.0, 95.0)),))
+    seen = []
+
+    def check(limits):
+        if limits[0] >= limits[1]:
+            raise ValueError('bad limits')
+        seen.append(limits)
+
+    params.onChange('limits', check)
+    with pytest.raises(ValueError):
+        params.set('limits', (10, 0))
+    assert params.limits == (-35.0, 95.0)
+    assert seen == [(-35.0, 95.0)]      # the callback was given the old value back
+    assert not params.dirty
+
+    with pytest.raises(TypeError):
+        params.set('limits', (True, 1.0))
+    assert params.limits == (-35.0, 95.0)
+
+
+def test_save_keeps_unknown_saved_values(tmp_path):
+    params = _registry(tmp_path, {'oldParameter': 7})
+    params.define((('divisor', 2.0),))
+    params.set('divisor', 5.0)
+    assert params.save()
+    saved = json.loads((tmp_path / 'params.json').read_text())
+    assert saved == {'divisor': 5.0, 'oldParameter': 7}
+
+
+def test_save_waits_for_changes_to_settle(tmp_path):
+    params = _registry(tmp_path)
+    params.define((('divisor', 2.0),))
+    assert not params.saveSettled()             # nothing changed
+
+    params.set('divisor', 5.0)
+    changed = params.changedAt
+    assert not params.saveSettled(changed + SAVE_DELAY / 2)
+    assert not (tmp_path / 'params.json').exists()
+
+    assert params.saveSettled(changed + SAVE_DELAY)
+    assert not params.dirty
+    assert json.loads((tmp_path / 'params.json').read_text()) == {'divisor': 5.0}
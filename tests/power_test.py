@@ -0,0 +1,157 @@
+'''
+    Tests of the power manager: brownout prediction, load shedding stages and recovery.
+'''
+
+import pytest
+
+from power import COMPRESSOR, DRIVE, MECHANISM_LIMIT, MECHANISMS, NORMAL, PDP_SAMPLES, PERIOD, \
+    DRIVE_RECOVERY, PowerManager
+
+
+class FakePDP(object):
+
+    def __init__(self):
+        self.reads = 0
+
+    def getTotalCurrent(self):
+        self.reads += 1
+        return 0.0
+
+    def getCurrent(self, channel):
+        return float(channel)
+
+
+class FakeCompressor(object):
+
+    def __init__(self):
+        self.closedLoop = True
+
+    def getClosedLoopControl(self):
+        return self.closedLoop
+
+    def setClosedLoopControl(self, enabled):
+        self.closedLoop = enabled
+
+
+class FakeDrive(object):
+
+    def __init__(self):
+        self.maxOutputs = []
+
+    def setMaxOutput(self, maxOutput):
+        self.maxOutputs.append(maxOutput)
+
+
+class FakeMechanism(object):
+
+    def __init__(self):
+        self.limit = 1.0
+
+    def setOutputLimit(self, limit):
+        self.limit = limit
+
+
+def _manager():
+    return PowerManager(FakePDP(), FakeCompressor(), FakeDrive(), FakeMechanism(), FakeMechanism(), start=False)
+
+
+def _run(power, seconds, voltage, current=20.0):
+    ''' Feeds samples the way the Notifier does; voltage and current may be functions of the time. '''
+    start = power.samples * PERIOD
+    for _ in range(int(round(seconds / PERIOD))):
+        now = power.samples * PERIOD
+        v = voltage(now - start) if callable(voltage) else voltage
+        i = current(now - start) if callable(current) else current
+        power.sample(now, v, i if power.samples % PDP_SAMPLES == 0 else None)
+        power.samples += 1
+
+
+def test_steady_battery_sheds_nothing():
+    power = _manager()
+    _run(power, 1.0, 12.5)
+    assert power.stage == NORMAL
+    assert power.predicted == pytest.approx(12.5)
+    assert power.compressor.closedLoop
+    assert power.lift.limit == power.fourBar.limit == 1.0
+    assert power.drive.maxOutputs[-1] == 1.0
+
+
+def test_falling_voltage_is_predicted_ahead():
+    power = _manager()
+    _run(power, 0.5, 12.0)
+    _run(power, 0.2, lambda t: 12.0 - 10.0 * t)     # 10 V/s sag
+    assert power.predicted < power.voltage
+
+
+def test_rising_current_is_predicted_before_the_voltage_sags():
+    power = _manager()
+    _run(power, 0.5, 11.0, 20.0)
+    _run(power, 0.15, 11.0, lambda t: 20.0 + 1500.0 * t)    # stall ramp, the battery hasn't sagged yet
+    assert power.voltage == pytest.approx(11.0)
+    assert power.predicted < 10.8
+
+
+@pytest.mark.parametrize('voltage, stage', ((9.3, COMPRESSOR), (8.3, MECHANISMS), (7.5, DRIVE)))
+def test_shedding_stages(voltage, stage):
+    power = _manager()
+    _run(power, 0.5, voltage)
+    assert power.stage == stage
+
+    assert not power.compressor.closedLoop
+    limit = MECHANISM_LIMIT if stage >= MECHANISMS else 1.0
+    assert power.lift.limit == power.fourBar.limit == limit
+    if stage >= DRIVE:
+        assert power.drive.maxOutputs[-1] < 1.0
+    else:
+        assert power.drive.maxOutputs[-1] == 1.0
+
+
+def test_compressor_comes_back_after_a_pause():
+    power = _manager()
+    _run(power, 0.5, 9.3)
+    assert power.stage == COMPRESSOR and not power.compressor.closedLoop
+
+    _run(power, 2.0, 12.5)
+    assert power.stage == NORMAL
+    assert power.compressor.closedLoop
+
+
+def test_compressor_stop_during_a_pause_is_kept():
+    power = _manager()
+    _run(power, 0.5, 9.3)
+    power.setCompressor(False)
+    power.setCompressor(True)   # a start while paused is deferred too
+    assert not power.compressor.closedLoop
+    power.setCompressor(False)
+
+    _run(power, 2.0, 12.5)
+    assert power.stage == NORMAL
+    assert not power.compressor.closedLoop
+
+
+def test_drive_output_recovers_gradually():
+    power = _manager()
+    _run(power, 0.5, 7.5)
+    scaled = power.drive.maxOutputs[-1]
+    assert scaled < 1.0
+
+    del power.drive.maxOutputs[:]
+    _run(power, 4.0, 12.5)
+    assert power.stage == NORMAL
+    outputs = power.drive.maxOutputs
+    assert outputs[-1] == 1.0
+    for previous, output in zip([scaled] + outputs, outputs):
+        assert previous <= output <= previous + DRIVE_RECOVERY * PERIOD + 1e-9
+
+
+def test_total_current_is_polled_at_the_status_frame_rate():
+    power = _manager()
+    for _ in range(PDP_SAMPLES * 3):
+        power.update()
+    assert power.pdp.reads == 3
+
+
+def test_channels_are_read_for_the_log():
+    power = _manager()
+    power.readChannels()
+    assert power.currents == [float(channel) for channel in range(16)]
@@ -0,0 +1,75 @@
+'''
+    Tests of the trapezoidal motion profile the lift and four-bar controllers follow.
+'''
+
+import pytest
+
+from control import TrapezoidProfile
+from fourbar import FourBarGains, PRESETS, START_ANGLE
+from lift import LiftGains
+from robotmap import LEVELS
+
+STEP = 0.001
+
+# (gains, start, goal): lift level moves in counts, four-bar moves in degrees
+MOVES = (
+    [(LiftGains(), 0.0, count) for _, count in LEVELS]
+    + [(LiftGains(), LEVELS[0][1], LEVELS[5][1]), (LiftGains(), 0.0, 20.0)]
+    + [(FourBarGains(), START_ANGLE, preset) for preset in set(PRESETS)]
+    + [(FourBarGains(), -30.0, 30.0), (FourBarGains(), 0.0, 5.0)]
+)
+
+
+def _samples(profile):
+    steps = int(profile.totalTime() / STEP) + 2
+    return [profile.sample(i * STEP) for i in range(steps)]
+
+
+@pytest.mark.parametrize('gains, start, goal', MOVES)
+def test_profile_reaches_the_goal_within_limits(gains, start, goal):
+    profile = TrapezoidProfile(gains.maxVelocity, gains.maxAcceleration)
+    profile.start(start, 0.0, goal)
+    samples = _samples(profile)
+
+    assert samples[0][0] == pytest.approx(start)
+    assert profile.isFinished(profile.totalTime())
+    assert profile.sample(profile.totalTime() + 1.0) == (goal, 0.0)
+
+    direction = 1.0 if goal >= start else -1.0
+    previous = samples[0]
+    for position, velocity in samples:
+        assert abs(velocity) <= gains.maxVelocity + 1e-9
+        assert velocity * direction >= -1e-9            # never backs up
+        assert abs(velocity - previous[1]) <= gains.maxAcceleration * STEP + 1e-6
+        assert abs(position - previous[0]) <= gains.maxVelocity * STEP + 1e-6
+        previous = position, velocity
+
+
+def test_short_move_is_a_triangle():
+    gains = FourBarGains()
+    profile = TrapezoidProfile(gains.maxVelocity, gains.maxAcceleration)
+    profile.start(0.0, 0.0, 5.0)
+    assert profile.endAccel == pytest.approx(profile.endFullSpeed)
+    peak = max(velocity for _, velocity in _samples(profile))
+    assert peak < gains.maxVelocity
+
+
+def test_long_move_cruises_at_max_velocity():
+    gains = LiftGains()
+    profile = TrapezoidProfile(gains.maxVelocity, gains.maxAcceleration)
+    profile.start(0.0, 0.0, 415.0)
+    accelerationTime = gains.maxVelocity / gains.maxAcceleration
+    assert profile.endAccel == pytest.approx(accelerationTime)
+    assert profile.totalTime() == pytest.approx(415.0 / gains.maxVelocity + accelerationTime)
+    assert profile.sample(profile.endAccel + 0.01)[1] == gains.maxVelocity
+
+
+def test_replanning_mid_move_continues_smoothly():
+    gains = LiftGains()
+    profile = TrapezoidProfile(gains.maxVelocity, gains.maxAcceleration)
+    profile.start(0.0, 0.0, 415.0)
+    position, velocity = profile.sample(0.5)
+
+    profile.start(position, velocity, 96.0)
+    assert profile.sample(0.0) == pytest.approx((position, velocity))
+    assert profile.sample(profile.totalTime() + 0.1) == (96.0, 0.0)
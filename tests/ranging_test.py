@@ -0,0 +1,91 @@
+'''
+    Tests of the filtered ultrasonic range finder: median spike rejection, smoothing and confidence.
+'''
+
+import pytest
+
+from ranging import FILTER, INCHES_PER_VOLT, MEDIAN_WINDOW, MIN_CONFIDENCE, RangeFinder
+
+
+class FakeAnalogInput(object):
+
+    def __init__(self):
+        self.averageBits = self.oversampleBits = None
+
+    def setAverageBits(self, bits):
+        self.averageBits = bits
+
+    def setOversampleBits(self, bits):
+        self.oversampleBits = bits
+
+
+def _finder():
+    return RangeFinder('Cargo', FakeAnalogInput())
+
+
+def test_configures_fpga_averaging():
+    analogInput = FakeAnalogInput()
+    RangeFinder('Cargo', analogInput)
+    assert analogInput.averageBits is not None
+    assert analogInput.oversampleBits is not None
+
+
+def test_steady_reading():
+    finder = _finder()
+    for _ in range(MEDIAN_WINDOW):
+        finder.update(0.5)
+    assert finder.voltage == pytest.approx(0.5)
+    assert finder.distance == pytest.approx(0.5 * INCHES_PER_VOLT)
+    assert finder.confidence == pytest.approx(1.0)
+    assert finder.inRange((0.4, 0.6))
+    assert not finder.inRange((0.6, 0.8))
+
+
+def test_single_spike_is_rejected():
+    finder = _finder()
+    for _ in range(MEDIAN_WINDOW):
+        finder.update(0.5)
+    finder.update(2.0)      # echo
+    assert finder.voltage == pytest.approx(0.5)
+    assert finder.confidence == pytest.approx(1.0)
+
+
+def test_step_is_followed_by_the_exponential_filter():
+    finder = _finder()
+    for _ in range(MEDIAN_WINDOW):
+        finder.update(0.5)
+    voltages = []
+    for _ in range(MEDIAN_WINDOW + 10):
+        finder.update(1.0)
+        voltages.append(finder.voltage)
+
+    # the median moves once most of the window has the new value, then the filter closes in
+    half = MEDIAN_WINDOW // 2
+    assert voltages[half - 1] == pytest.approx(0.5)
+    assert voltages[half] == pytest.approx(0.5 + FILTER * 0.5)
+    assert voltages == sorted(voltages)
+    assert voltages[-1] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_confidence_builds_up_and_needs_agreement():
+    finder = _finder()
+    finder.update(0.5)
+    assert finder.confidence == pytest.approx(1.0 / MEDIAN_WINDOW)
+    assert not finder.inRange((0.4, 0.6))
+
+    # readings that disagree by inches lose confidence
+    for voltage in (0.50, 0.53, 0.47, 0.52, 0.48):
+        finder.update(voltage)
+    assert finder.confidence < MIN_CONFIDENCE
+
+
+def test_out_of_range_has_no_confidence():
+    finder = _finder()
+    for _ in range(MEDIAN_WINDOW):
+        finder.update(0.02)     # closer than the sensor can measure
+    assert finder.confidence == 0.0
+
+    finder.reset()
+    assert finder.confidence == 0.0
+    finder.update(0.5)
+    assert finder.voltage == 0.5    # starts over from the first reading
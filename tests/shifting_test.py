@@ -0,0 +1,76 @@
+'''
+    Tests of automatic gear shifting: hysteresis, pushing and the minimum time between shifts.
+'''
+
+from robotmap import COUNTS_PER_INCH, HIGH_GEAR, LOW_GEAR
+from shifting import AutoShifter, DOWNSHIFT_SPEED, MIN_SHIFT_INTERVAL, PUSH_CURRENT, PUSH_SPEED, UPSHIFT_SPEED
+
+
+def _velocity(speed, gear=LOW_GEAR):
+    ''' Encoder velocity (counts per 100 ms) of both sides at a forward speed (in/s). '''
+    return speed * COUNTS_PER_INCH[gear] / 10.0
+
+
+def _settle(shifter, gear, speed, now=0.0, current=0.0):
+    ''' Runs the speed filter in without shifting; returns what the shifter then asks for. '''
+    velocity = _velocity(speed, gear)
+    shifter.shifted(now - MIN_SHIFT_INTERVAL / 2)    # holds off shifting while the filter settles
+    for _ in range(20):
+        shifter.update(now, gear, velocity, velocity, current, current)
+    shifter.lastShift = None
+    return shifter.update(now, gear, velocity, velocity, current, current)
+
+
+def test_shifts_up_when_fast_and_down_when_slow():
+    assert _settle(AutoShifter(), LOW_GEAR, UPSHIFT_SPEED + 5) == HIGH_GEAR
+    assert _settle(AutoShifter(), HIGH_GEAR, DOWNSHIFT_SPEED - 5) == LOW_GEAR
+
+
+def test_hysteresis_band_keeps_the_gear():
+    between = (UPSHIFT_SPEED + DOWNSHIFT_SPEED) / 2.0
+    assert _settle(AutoShifter(), LOW_GEAR, between) is None
+    assert _settle(AutoShifter(), HIGH_GEAR, between) is None
+
+
+def test_pushing_shifts_down_early():
+    speed = (DOWNSHIFT_SPEED + PUSH_SPEED) / 2.0
+    assert _settle(AutoShifter(), HIGH_GEAR, speed) is None
+    shifter = AutoShifter()
+    assert _settle(shifter, HIGH_GEAR, speed, current=PUSH_CURRENT + 10) == LOW_GEAR
+    assert shifter.reason == 'Pushing'
+
+
+def test_minimum_interval_between_shifts():
+    shifter = AutoShifter()
+    assert _settle(shifter, LOW_GEAR, UPSHIFT_SPEED + 20, now=10.0) == HIGH_GEAR
+
+    # slowed right down, but the last shift was too recent
+    slow = _velocity(0.0)
+    for _ in range(10):
+        assert shifter.update(10.0 + MIN_SHIFT_INTERVAL / 2, HIGH_GEAR, slow, slow, 0.0, 0.0) is None
+    assert shifter.update(10.0 + MIN_SHIFT_INTERVAL, HIGH_GEAR, slow, slow, 0.0, 0.0) == LOW_GEAR
+
+
+def test_driver_shift_holds_off_auto_shifting():
+    shifter = AutoShifter()
+    fast = _velocity(UPSHIFT_SPEED + 20)
+    shifter.shifted(5.0)
+    assert shifter.reason == 'Driver'
+    for _ in range(10):
+        assert shifter.update(5.1, LOW_GEAR, fast, fast, 0.0, 0.0) is None
+    assert shifter.update(5.0 + MIN_SHIFT_INTERVAL, LOW_GEAR, fast, fast, 0.0, 0.0) == HIGH_GEAR
+
+
+def test_turning_in_place_is_not_speed():
+    shifter = AutoShifter()
+    velocity = _velocity(UPSHIFT_SPEED + 20)
+    for _ in range(20):
+        gear = shifter.update(0.0, LOW_GEAR, velocity, -velocity, 0.0, 0.0)
+    assert gear is None
+    assert shifter.speed == 0.0
+
+
+def test_neutral_picks_a_gear():
+    shifter = AutoShifter()
+    assert shifter.update(0.0, 0, 0.0, 0.0, 0.0, 0.0) == LOW_GEAR
+    assert shifter.reason == 'Start'
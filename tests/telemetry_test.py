@@ -0,0 +1,88 @@
+'''
+    Tests of the change-only dashboard publisher and its bandwidth counters.
+'''
+
+from telemetry import Telemetry
+
+
+class FakeTable(object):
+    ''' Records the writes that reach NetworkTables. '''
+
+    def __init__(self):
+        self.writes = []
+
+    def putNumber(self, key, value):
+        self.writes.append((key, value))
+
+    putString = putBoolean = putNumber
+
+
+def test_only_changes_are_written():
+    table = FakeTable()
+    telemetry = Telemetry(table)
+
+    telemetry.putNumber('Speed', 1.0)
+    telemetry.putString('Mode', 'Tank')
+    assert telemetry.flush(now=0.0) == 2
+
+    telemetry.putNumber('Speed', 1.0)
+    telemetry.putString('Mode', 'Tank')
+    assert telemetry.flush(now=0.02) == 0
+
+    telemetry.putNumber('Speed', 2.0)
+    telemetry.putString('Mode', 'Tank')
+    assert telemetry.flush(now=0.04) == 1
+
+    assert table.writes == [('Speed', 1.0), ('Mode', 'Tank'), ('Speed', 2.0)]
+    assert telemetry.getSent() == 3
+    assert telemetry.getSkipped() == 3
+
+
+def test_last_value_of_a_loop_wins():
+    table = FakeTable()
+    telemetry = Telemetry(table)
+    telemetry.putBoolean('Aligned', False)
+    telemetry.flush(now=0.0)
+
+    # changed and changed back before the flush: nothing to send
+    telemetry.putBoolean('Aligned', True)
+    telemetry.putBoolean('Aligned', False)
+    assert telemetry.flush(now=0.02) == 0
+
+    telemetry.putBoolean('Aligned', True)
+    telemetry.putBoolean('Aligned', True)
+    assert telemetry.flush(now=0.04) == 1
+    assert table.writes == [('Aligned', False), ('Aligned', True)]
+
+
+def test_rate_limit_delays_but_never_loses_a_change():
+    table = FakeTable()
+    telemetry = Telemetry(table)
+    telemetry.setMaxRate('Pose X', 10)
+
+    telemetry.putNumber('Pose X', 1.0)
+    assert telemetry.flush(now=0.0) == 1
+    telemetry.putNumber('Pose X', 2.0)
+    assert telemetry.flush(now=0.02) == 0
+    telemetry.putNumber('Pose X', 3.0)
+    assert telemetry.flush(now=0.06) == 0
+    assert telemetry.flush(now=0.1) == 1
+    assert table.writes == [('Pose X', 1.0), ('Pose X', 3.0)]
+
+    # still pending values are neither sent nor skipped
+    telemetry.putNumber('Pose X', 4.0)
+    telemetry.flush(now=0.12)
+    assert telemetry.getSent() == 2
+    assert telemetry.getSkipped() == 1
+
+
+def test_default_period_and_reset():
+    table = FakeTable()
+    telemetry = Telemetry(table, defaultPeriod=0.5)
+    telemetry.putNumber('Voltage', 12.0)
+    telemetry.flush(now=0.0)
+
+    telemetry.reset()
+    telemetry.putNumber('Voltage', 12.0)
+    assert telemetry.flush(now=0.1) == 1    # forgotten, so re-sent at once
+    assert table.writes == [('Voltage', 12.0), ('Voltage', 12.0)]
@@ -0,0 +1,85 @@
+'''
+    Tests of the precomputed trajectory library format and loader.
+'''
+
+import os
+import json
+import struct
+
+import pytest
+
+import trajectory
+from trajectory import DEFAULT_PATH, HEADING, LEFT_VELOCITY, WIDTH, X, load, write
+
+
+def _samples(count, offset=0.0):
+    return [[offset + i + field / 10.0 for field in range(WIDTH)] for i in range(count)]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'trajectories.bin')
+    write(path, [('Forward', False, _samples(5)), ('Back', True, _samples(3, 100.0))], dt=0.02)
+
+    library = load(path)
+    assert sorted(library) == ['Back', 'Forward']
+
+    forward, back = library['Forward'], library['Back']
+    assert forward.length == 5 and not forward.reversed
+    assert back.length == 3 and back.reversed
+    assert forward.dt == pytest.approx(0.02)
+    assert forward.duration() == pytest.approx(0.08)
+    assert forward.get(4, LEFT_VELOCITY) == pytest.approx(4.4)
+    assert back.start() == pytest.approx((100.0, 100.1, 100.2))
+    assert back.get(2, X) == pytest.approx(102.0)
+
+
+def test_index_is_clamped_and_rounded(tmp_path):
+    path = str(tmp_path / 'trajectories.bin')
+    write(path, [('Forward', False, _samples(5))])
+    forward = load(path)['Forward']
+    assert forward.index(-1.0) == 0
+    assert forward.index(0.029) == 1
+    assert forward.index(0.031) == 2
+    assert forward.index(10.0) == 4
+
+
+def _rewrite_header(path, version=None, fields=None):
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    start = len(trajectory.MAGIC)
+    oldVersion, size = struct.unpack('<HI', data[start:start + 6])
+    meta = json.loads(data[start + 6:start + 6 + size].decode())
+    if fields is not None:
+        meta['fields'] = fields
+    encoded = json.dumps(meta).encode()
+    header = trajectory.MAGIC + struct.pack('<HI', version if version is not None else oldVersion, len(encoded))
+    with open(path, 'wb') as fp:
+        fp.write(header + encoded + data[start + 6 + size:])
+
+
+def test_rejects_mismatched_files(tmp_path):
+    path = str(tmp_path / 'trajectories.bin')
+
+    with open(path, 'wb') as fp:
+        fp.write(b'NOTTRJ')
+    with pytest.raises(ValueError):
+        load(path)
+
+    write(path, [('Forward', False, _samples(2))])
+    _rewrite_header(path, version=trajectory.VERSION + 1)
+    with pytest.raises(ValueError):
+        load(path)
+
+    write(path, [('Forward', False, _samples(2))])
+    _rewrite_header(path, fields=['x', 'y'])
+    with pytest.raises(ValueError):
+        load(path)
+
+
+@pytest.mark.skipif(not os.path.exists(DEFAULT_PATH), reason='no trajectories.bin, run pathgen.py')
+def test_shipped_library_loads():
+    library = load()
+    assert library
+    for path in library.values():
+        assert path.length > 1
+        assert path.data[HEADING] == path.start()[2]
@@ -0,0 +1,111 @@
+'''
+Precomputed drive trajectories.
+
+Trajectories are generated offline by pathgen.py and stored in one file as
+fixed-rate samples of float32 values, so the robot only ever loads arrays
+and indexes them by time; no spline math runs on the roboRIO.
+
+A file is a short header (magic, version, JSON with the sample period,
+field names and the trajectory table) followed by the samples of every
+trajectory, back to back, little-endian.
+'''
+
+import os
+import sys
+import json
+import struct
+from array import array
+
+MAGIC = b'GEMTRJ'
+VERSION = 1
+
+# fields of one sample: pose (in, in, rad counter-clockwise) and per-side
+# wheel distance from the start (in), velocity (in/s) and acceleration (in/s^2)
+FIELDS = ('x', 'y', 'heading',
+          'leftPosition', 'leftVelocity', 'leftAcceleration',
+          'rightPosition', 'rightVelocity', 'rightAcceleration')
+X, Y, HEADING, LEFT_POSITION, LEFT_VELOCITY, LEFT_ACCELERATION, \
+    RIGHT_POSITION, RIGHT_VELOCITY, RIGHT_ACCELERATION = range(len(FIELDS))
+WIDTH = len(FIELDS)
+
+# sample period, one sample per robot loop (s)
+DT = 0.02
+
+# library shipped with the robot code, built by pathgen.py
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trajectories.bin')
+
+
+class Trajectory(object):
+    ''' Samples of one trajectory, WIDTH floats per sample. '''
+
+    __slots__ = ('name', 'dt', 'data', 'length', 'reversed')
+
+    def __init__(self, name, data, dt=DT, reversed=False):
+        self.name = name
+        self.dt = dt
+        self.data = data
+        self.length = len(data) // WIDTH
+        self.reversed = reversed
+
+    def duration(self):
+        return (self.length - 1) * self.dt
+
+    def index(self, t):
+        ''' Sample index at time t from the start, clamped to the trajectory. '''
+        if t <= 0:
+            return 0
+        return min(int(t / self.dt + 0.5), self.length - 1)
+
+    def get(self, index, field):
+        return self.data[index * WIDTH + field]
+
+    def start(self):
+        ''' Starting pose (x, y, heading). '''
+        return self.data[X], self.data[Y], self.data[HEADING]
+
+
+def write(path, trajectories, dt=DT):
+    '''
+        Writes a trajectory library.
+
+        :param trajectories: list of (name, reversed, samples), samples being rows of WIDTH values
+    '''
+    table = []
+    body = bytearray()
+    pack = struct.Struct('<%df' % WIDTH).pack
+    for name, reversed, samples in trajectories:
+        table.append({'name': name, 'samples': len(samples), 'reversed': reversed})
+        for sample in samples:
+            body += pack(*sample)
+
+    meta = json.dumps({'dt': dt, 'fields': list(FIELDS), 'trajectories': table}).encode()
+    with open(path, 'wb') as fp:
+        fp.write(MAGIC + struct.pack('<HI', VERSION, len(meta)) + meta)
+        fp.write(body)
+
+
+def load(path=DEFAULT_PATH):
+    ''' Loads a trajectory library. Returns a dict of name -> Trajectory. '''
+    with open(path, 'rb') as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError('not a trajectory library')
+        version, size = struct.unpack('<HI', fp.read(6))
+        if version != VERSION:
+            raise ValueError('trajectory library version %d, expected %d' % (version, VERSION))
+        meta = json.loads(fp.read(size).decode())
+        body = fp.read()
+
+    if meta['fields'] != list(FIELDS):
+        raise ValueError('trajectory library fields do not match, rebuild it with pathgen.py')
+
+    trajectories = {}
+    offset = 0
+    for entry in meta['trajectories']:
+        count = entry['samples'] * WIDTH
+        data = array('f')
+        data.frombytes(body[offset:offset + count * 4])
+        if sys.byteorder == 'big':
+            data.byteswap()
+        offset += count * 4
+        trajectories[entry['name']] = Trajectory(entry['name'], data, meta['dt'], entry['reversed'])
+    return trajectories
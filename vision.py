@@ -1,11 +1,222 @@
+'''
+Vision process, launched by robot.py through CameraServer.launch.
+
+Both USB cameras are streamed to the driver station, at a quality set by
+the CameraManager (cameras.py). Frames from the vision camera are grabbed
+with a CvSink straight into preallocated shared-memory buffers; a worker
+process finds the retroreflective tape pair in them (HSV threshold, contour filtering, left/right pairing) and the
+result is published to the 'Vision' NetworkTable. Capture, detection and
+streaming run at the same time: cscore streams in its own threads, this
+process captures, and the worker process detects.
+
+Vision/target is [found, angle (deg), distance (in), capture time (s), latency (s)]
+so the robot always gets one consistent sample. The capture time is the
+frame time cscore stamped the frame with when it came off the camera,
+converted to this process's monotonic clock, and the latency runs from there
+to publishing. The robot adds the NetworkTables transit itself, by timing
+when the sample arrives (align.py).
+'''
+
+import time
+import ctypes
+import threading
+import multiprocessing
+from math import atan, atan2, degrees, hypot, radians, tan
+
 from cscore import CameraServer
+from networktables import NetworkTables
+
+from cameras import CameraManager
+
+# dashboard names of the cameras, by USB device
+CAMERA_NAMES = ('Top Camera', 'Bottom Camera')
+
+# camera used for target detection and its processing resolution
+VISION_CAMERA = 0
+WIDTH, HEIGHT = 320, 240
+VISION_FPS = 20
+HORIZONTAL_FOV = 61.0           # Lifecam HD-3000 (deg)
+FOCAL_LENGTH = (WIDTH / 2.0) / tan(radians(HORIZONTAL_FOV / 2.0))
+
+# HSV range of the lit tape (green ring light)
+HSV_LOWER = (55, 100, 80)
+HSV_UPPER = (95, 255, 255)
+
+# contour filtering
+MIN_AREA = 30.0                 # px
+MIN_FILL = 0.6                  # contour area / rotated rect area
+MIN_ASPECT, MAX_ASPECT = 1.5, 5.0   # long side / short side of a tape strip (2 x 5.5 in)
+
+# Deep Space tape pair: distance between strip centers (in)
+TARGET_WIDTH = 11.06
+
+# frame buffers shared with the worker
+SLOTS = 3
+FRAME_BYTES = WIDTH * HEIGHT * 3
+
+# how fast the cscore clock offset estimate may follow drift (s per s)
+CLOCK_DRIFT = 1e-4
+
+
+class FrameClock(object):
+    '''
+        Converts cscore frame times (us, in cscore's clock) to time.monotonic().
+
+        A frame is always grabbed after its frame time, so the smallest
+        (grab time - frame time) seen is the best estimate of the offset
+        between the clocks. It may creep up by CLOCK_DRIFT, so a drifting
+        clock is followed too.
+    '''
+
+    def __init__(self):
+        self.offset = None
+        self.lastGrab = None
+
+    def toMonotonic(self, frameTime, grabTime):
+        '''
+            :param frameTime: frame time from CvSink.grabFrame (us)
+            :param grabTime: time.monotonic() when grabFrame returned
+            :returns: the frame time in monotonic time (s)
+        '''
+        frameTime *= 1e-6
+        observed = grabTime - frameTime
+        if self.offset is None or observed < self.offset:
+            self.offset = observed
+        else:
+            self.offset += min(observed - self.offset, CLOCK_DRIFT * (grabTime - self.lastGrab))
+        self.lastGrab = grabTime
+        return frameTime + self.offset
+
+
+def frame(shared, slot):
+    ''' NumPy view (no copy) of one shared frame buffer. '''
+    import numpy as np
+    return np.frombuffer(shared, dtype=np.uint8, count=FRAME_BYTES,
+                         offset=slot * FRAME_BYTES).reshape((HEIGHT, WIDTH, 3))
+
+
+def find_strips(cv2, contours):
+    ''' Tape strips as (center x, center y, tilt), tilt > 0 leaning right. '''
+    strips = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < MIN_AREA:
+            continue
+        rect = cv2.minAreaRect(contour)
+        (cx, cy), (w, h), _ = rect
+        if w == 0 or h == 0:
+            continue
+        if area / (w * h) < MIN_FILL:
+            continue
+        long_side, short_side = max(w, h), min(w, h)
+        if not MIN_ASPECT <= long_side / short_side <= MAX_ASPECT:
+            continue
+
+        # tilt of the long side from vertical, measured at its top end
+        box = cv2.boxPoints(rect)
+        first, second = box[1] - box[0], box[2] - box[1]
+        dx, dy = first if hypot(*first) > hypot(*second) else second
+        if dy > 0:
+            dx, dy = -dx, -dy   # image y grows downward, make the edge point up
+        tilt = degrees(atan2(dx, -dy))
+        strips.append((cx, cy, tilt))
+    strips.sort()
+    return strips
+
+
+def pair_strips(strips):
+    '''
+        Pairs strips into targets. The left strip of a target leans right and
+        the right strip leans left, so they point at each other at the top.
+        Returns the pair closest to the image center as (center x, separation), or None.
+    '''
+    best = None
+    for i in range(len(strips) - 1):
+        left, right = strips[i], strips[i + 1]
+        if left[2] > 0 and right[2] < 0:
+            center = (left[0] + right[0]) / 2.0
+            if best is None or abs(center - WIDTH / 2.0) < abs(best[0] - WIDTH / 2.0):
+                best = (center, right[0] - left[0])
+    return best
+
+
+def detect(shared, ready, free, results):
+    ''' Worker process: finds the target in every frame handed to it. '''
+    import cv2
+    import numpy as np
+
+    hsv = np.empty((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    mask = np.empty((HEIGHT, WIDTH), dtype=np.uint8)
+    lower = np.array(HSV_LOWER, dtype=np.uint8)
+    upper = np.array(HSV_UPPER, dtype=np.uint8)
+
+    while True:
+        slot, captureTime = ready.get()
+        cv2.cvtColor(frame(shared, slot), cv2.COLOR_BGR2HSV, dst=hsv)
+        free.put(slot)  # the frame is no longer needed once converted
+
+        cv2.inRange(hsv, lower, upper, dst=mask)
+        contours = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        target = pair_strips(find_strips(cv2, contours))
+
+        if target is None:
+            results.put((0.0, 0.0, 0.0, captureTime))
+        else:
+            center, separation = target
+            angle = degrees(atan((center - WIDTH / 2.0) / FOCAL_LENGTH))
+            distance = TARGET_WIDTH * FOCAL_LENGTH / separation
+            results.put((1.0, angle, distance, captureTime))
+
+
+def publish(results, table):
+    ''' Thread: sends detection results to NetworkTables as they come in. '''
+    while True:
+        found, angle, distance, captureTime = results.get()
+        latency = time.monotonic() - captureTime
+        table.putNumberArray('target', [found, angle, distance, captureTime, latency])
+        NetworkTables.flush()
+
 
 def main():
+    # start the worker before cscore starts its threads
+    shared = multiprocessing.RawArray(ctypes.c_uint8, FRAME_BYTES * SLOTS)
+    ready = multiprocessing.Queue()
+    free = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    for slot in range(SLOTS):
+        free.put(slot)
+    worker = multiprocessing.Process(target=detect, args=(shared, ready, free, results), daemon=True)
+    worker.start()
+
     cs = CameraServer.getInstance()
     cs.enableLogging()
 
     usb1 = cs.startAutomaticCapture(dev=0)
     usb2 = cs.startAutomaticCapture(dev=1)
+    camera = (usb1, usb2)[VISION_CAMERA]
+    camera.setResolution(WIDTH, HEIGHT)
+    camera.setFPS(VISION_FPS)
+
+    NetworkTables.initialize(server='127.0.0.1')
+    table = NetworkTables.getTable('Vision')
+
+    # stream bandwidth follows the driver's camera selection
+    manager = CameraManager(cs, {CAMERA_NAMES[0]: usb1, CAMERA_NAMES[1]: usb2},
+                            keepOpen=(CAMERA_NAMES[VISION_CAMERA],))
+    manager.start()
+    threading.Thread(target=publish, args=(results, table), daemon=True).start()
 
-    cs.waitForever()
+    # capture straight into the shared buffers
+    sink = cs.getVideo(camera=camera)
+    buffers = [frame(shared, slot) for slot in range(SLOTS)]
+    clock = FrameClock()
+    while True:
+        slot = free.get()
+        frameTime, _ = sink.grabFrame(buffers[slot])
+        if frameTime == 0:
+            free.put(slot)
+            table.putString('error', sink.getError())
+            continue
 
+        # frameTime is in cscore's clock; the worker and publisher use monotonic time
+        ready.put((slot, clock.toMonotonic(frameTime, time.monotonic())))